@@ -4,3 +4,5 @@ from django.apps import AppConfig
 class AdminConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "admin"
+    # "admin" is taken by django.contrib.admin
+    label = "admin_panel"
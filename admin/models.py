@@ -1 +1,31 @@
+from common.base_models import DataBaseModels
 from django.db import models
+
+
+class DailyMetrics(DataBaseModels):
+    """
+    Activity of a single day, rolled up by the `rollup_daily_metrics` task so the
+    admin dashboard reads a few small rows instead of counting every table.
+
+    Attributes:
+        date (date): The day the row covers.
+        players (int): Players who signed up that day.
+        academies (int): Academies who signed up that day.
+        trials (int): Active trials created that day.
+        posts (int): Posts created that day.
+        registrations (int): Players registered to a trial that day.
+        revenue (int): Registration fees of the registrations of that day.
+    """
+    date = models.DateField(unique=True)
+    players = models.PositiveIntegerField(default=0)
+    academies = models.PositiveIntegerField(default=0)
+    trials = models.PositiveIntegerField(default=0)
+    posts = models.PositiveIntegerField(default=0)
+    registrations = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["date"]
+
+    def __str__(self) -> str:
+        return str(self.date)
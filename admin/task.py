@@ -1,5 +1,18 @@
+from datetime import datetime, time, timedelta
+
 from celery import shared_task
 from django.core.mail import send_mail
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from post.models import Post
+from selection_trial.models import PlayersInTrial, Trial
+from users.models import Users
+
+from .models import DailyMetrics
+
+# days before the latest rollup that are counted again on every run
+ROLLUP_OVERLAP_DAYS = 1
 
 
 # Task to notify the academy of admin approval via email.
@@ -20,3 +33,111 @@ def send_alert(self, subject, message, email_from, email_to):
         send_mail(subject, message, email_from, email_to)
     except Exception as e:
         print(f"Error sending OTP: {e}")
+
+
+def start_of_day(day):
+    """
+    Return the aware datetime `day` starts at, so `created_at` is compared
+    as is and its index can be used.
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def daily_counts(queryset, **aggregates):
+    """
+    Group `queryset` by the day it was created on.
+
+    Returns:
+        dict: date -> values of `aggregates` (a Count() by default).
+    """
+    aggregates = aggregates or {"total": Count("id")}
+    rows = (
+        queryset.annotate(day=TruncDate("created_at"))
+        .values("day")
+        .annotate(**aggregates)
+        .order_by()
+    )
+    return {row.pop("day"): row for row in rows}
+
+
+@shared_task
+def rollup_daily_metrics(full=False):
+    """
+    Refresh the DailyMetrics rows from the day before the latest rollup to today.
+
+    Only the last `ROLLUP_OVERLAP_DAYS` already stored days are counted again (to
+    catch rows written after the previous run), so every run reads the same small
+    slice of the tables however large they grow. The first run fills in the
+    whole history.
+
+    Older days change too when users or posts are deleted or trials deactivated,
+    so the nightly run (`full`) counts the whole history again.
+    """
+    today = timezone.localdate()
+    latest = DailyMetrics.objects.order_by("-date").values_list("date", flat=True).first()
+    if latest is not None and not full:
+        start = min(latest, today) - timedelta(days=ROLLUP_OVERLAP_DAYS)
+    else:
+        first_user = Users.objects.order_by("created_at").values_list(
+            "created_at", flat=True
+        ).first()
+        start = timezone.localdate(first_user) if first_user else today
+        # days whose rows were all deleted since are counted again, as zeros
+        first_day = DailyMetrics.objects.order_by("date").values_list(
+            "date", flat=True
+        ).first()
+        if first_day is not None:
+            start = min(start, first_day)
+
+    since = start_of_day(start)
+    users = Users.objects.filter(is_staff=False, created_at__gte=since)
+    players = daily_counts(users.filter(is_academy=False))
+    academies = daily_counts(users.filter(is_academy=True))
+    trials = daily_counts(Trial.objects.filter(is_active=True, created_at__gte=since))
+    posts = daily_counts(Post.objects.filter(created_at__gte=since))
+    registrations = daily_counts(
+        PlayersInTrial.objects.filter(created_at__gte=since),
+        total=Count("id"),
+        # only checkouts Stripe confirmed, abandoned ones stay "pending"
+        revenue=Sum(
+            "trial__registration_fee",
+            filter=Q(
+                payment_status="confirmed",
+                trial__is_registration_fee=True,
+                trial__is_active=True,
+            ),
+            default=0,
+        ),
+    )
+
+    rows = []
+    day = start
+    while day <= today:
+        rows.append(
+            DailyMetrics(
+                date=day,
+                players=players.get(day, {}).get("total", 0),
+                academies=academies.get(day, {}).get("total", 0),
+                trials=trials.get(day, {}).get("total", 0),
+                posts=posts.get(day, {}).get("total", 0),
+                registrations=registrations.get(day, {}).get("total", 0),
+                revenue=registrations.get(day, {}).get("revenue", 0),
+            )
+        )
+        day += timedelta(days=1)
+
+    DailyMetrics.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=[
+            "players",
+            "academies",
+            "trials",
+            "posts",
+            "registrations",
+            "revenue",
+            "updated_at",
+        ],
+    )
+    return len(rows)
@@ -1,3 +1,197 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from post.models import Post
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from selection_trial.models import PlayersInTrial, Trial
+from users.models import Academy, Sport, UserProfile, Users
+
+from .models import DailyMetrics
+from .task import rollup_daily_metrics
+
+
+class AdminTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = Users.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="testpass123",
+            is_staff=True,
+        )
+        token = RefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.player = Users.objects.create_user(
+            email="player@example.com", username="player", password="testpass123"
+        )
+        self.academy = Users.objects.create_user(
+            email="academy@example.com",
+            username="academy",
+            password="testpass123",
+            is_academy=True,
+        )
+        self.trial = Trial.objects.create(
+            academy=self.academy, name="Trial", registration_fee=100
+        )
+        PlayersInTrial.objects.create(
+            player=self.player, trial=self.trial, name="p", payment_status="confirmed"
+        )
+        Post.objects.create(user=self.player, content="post")
+
+
+class DailyMetricsTest(AdminTestCase):
+    def test_rollup_counts_the_day(self):
+        # a checkout that never completed is a registration without revenue
+        PlayersInTrial.objects.create(
+            player=self.player, trial=self.trial, name="q", payment_status="pending"
+        )
+        rollup_daily_metrics()
+        metrics = DailyMetrics.objects.get(date=timezone.localdate())
+        self.assertEqual(metrics.players, 1)
+        self.assertEqual(metrics.academies, 1)
+        self.assertEqual(metrics.trials, 1)
+        self.assertEqual(metrics.posts, 1)
+        self.assertEqual(metrics.registrations, 2)
+        self.assertEqual(metrics.revenue, 100)
+
+    def test_rollup_is_incremental(self):
+        rollup_daily_metrics()
+        old_day = timezone.localdate() - timedelta(days=5)
+        DailyMetrics.objects.create(date=old_day, players=7)
+        Post.objects.create(user=self.player, content="another")
+        rollup_daily_metrics()
+
+        self.assertEqual(DailyMetrics.objects.get(date=old_day).players, 7)
+        self.assertEqual(
+            DailyMetrics.objects.get(date=timezone.localdate()).posts, 2
+        )
+
+    def test_full_recount_catches_deleted_rows(self):
+        rollup_daily_metrics()
+        # a day counted before its players were deleted
+        old_day = timezone.localdate() - timedelta(days=5)
+        DailyMetrics.objects.create(date=old_day, players=7)
+        Post.objects.all().delete()
+        rollup_daily_metrics(full=True)
+        self.assertEqual(DailyMetrics.objects.get(date=old_day).players, 0)
+        self.assertEqual(
+            DailyMetrics.objects.get(date=timezone.localdate()).posts, 0
+        )
+
+    def test_dashboard_reads_rollup(self):
+        rollup_daily_metrics()
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["stats"]["totalPlayers"], 1)
+        self.assertEqual(response.data["stats"]["totalPosts"], 1)
+        self.assertEqual(response.data["weekly_data"][1]["this_week"], 1)
+
+    def test_time_series_fills_missing_days(self):
+        rollup_daily_metrics()
+        today = timezone.localdate()
+        response = self.client.get(
+            reverse("dashboard_metrics"),
+            {"start": str(today - timedelta(days=2)), "end": str(today)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["metrics"]), 3)
+        self.assertEqual(response.data["metrics"][0]["posts"], 0)
+        self.assertEqual(response.data["totals"]["revenue"], 100)
+
+    def test_time_series_rejects_reversed_range(self):
+        response = self.client.get(
+            reverse("dashboard_metrics"), {"start": "2024-02-01", "end": "2024-01-01"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AccountsViewTest(AdminTestCase):
+    def test_payments_are_summed_per_academy(self):
+        other = Users.objects.create_user(
+            email="other@example.com", username="other", password="testpass123"
+        )
+        PlayersInTrial.objects.create(
+            player=other, trial=self.trial, name="o", payment_status="confirmed"
+        )
+        # an abandoned checkout is not a payment
+        PlayersInTrial.objects.create(
+            player=other, trial=self.trial, name="o", payment_status="pending"
+        )
+
+        with self.assertNumQueries(3):  # auth, count, page
+            response = self.client.get(reverse("payment_details"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        summary = response.data["results"][0]
+        self.assertEqual(summary["academy_id"], self.academy.id)
+        self.assertEqual(summary["total_amount"], 200)
+        self.assertEqual(summary["registrations"], 2)
+
+    def test_date_range_filters_payments(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        response = self.client.get(reverse("payment_details"), {"start": str(tomorrow)})
+        self.assertEqual(response.data["count"], 0)
+
+        today = str(timezone.localdate())
+        response = self.client.get(
+            reverse("payment_details"), {"start": today, "end": today}
+        )
+        self.assertEqual(response.data["count"], 1)
+
+        response = self.client.get(reverse("payment_details"), {"start": "not-a-date"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_academy_drill_down_groups_by_trial(self):
+        response = self.client.get(
+            reverse("academy_payment_details", args=[self.academy.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["trial_id"], self.trial.id)
+        self.assertEqual(response.data["results"][0]["total_amount"], 100)
+
+
+class UserManageTest(AdminTestCase):
+    def setUp(self):
+        super().setUp()
+        Academy.objects.create(user=self.academy, is_certified=True)
+        for index in range(3):
+            player = Users.objects.create_user(
+                email=f"runner{index}@example.com",
+                username=f"runner{index}",
+                password="testpass123",
+                is_verified=index == 0,
+            )
+            UserProfile.objects.create(user=player, state="Kerala")
+            Sport.objects.create(user=player, sport_name="Football")
+
+    def test_player_list_query_count_does_not_grow(self):
+        # auth, count, page, sports
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("list_player"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual(response.data["player"][0]["sport"][0]["sport_name"], "Football")
+
+    def test_player_list_search_filter_and_ordering(self):
+        response = self.client.get(
+            reverse("list_player"), {"search": "runner", "ordering": "username"}
+        )
+        self.assertEqual(
+            [player["username"] for player in response.data["player"]],
+            ["runner0", "runner1", "runner2"],
+        )
+        response = self.client.get(reverse("list_player"), {"is_verified": "true"})
+        self.assertEqual(response.data["count"], 1)
+
+    def test_academy_list_filters_certified(self):
+        response = self.client.get(reverse("list_academy"), {"is_certified": "true"})
+        self.assertEqual(response.data["count"], 1)
+        self.assertTrue(response.data["academy"][0]["academy_data"]["is_certified"])
 
-# Create your tests here.
+        response = self.client.get(reverse("list_academy"), {"is_certified": "false"})
+        self.assertEqual(response.data["count"], 0)
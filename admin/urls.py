@@ -1,7 +1,8 @@
 from django.urls import path
 
-from .views import (AcademyManage, AccountsView, DashboardViewSet,
-                    PlayerManage, ToggleActive, ToggleIsCertified)
+from .views import (AcademyAccountsView, AcademyManage, AccountsView,
+                    DailyMetricsView, DashboardViewSet, PlayerManage,
+                    ToggleActive, ToggleIsCertified)
 
 urlpatterns = [
     path("list_academy", AcademyManage.as_view(), name="list_academy"),
@@ -17,5 +18,11 @@ urlpatterns = [
             name="toggleIsactive"
     ),
     path("dashboard", DashboardViewSet.as_view(), name="dashboard"),
+    path("dashboard/metrics", DailyMetricsView.as_view(), name="dashboard_metrics"),
     path("payment_details", AccountsView.as_view(), name="payment_details"),
+    path(
+        "payment_details/<int:academy_id>",
+        AcademyAccountsView.as_view(),
+        name="academy_payment_details",
+    ),
 ]
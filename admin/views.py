@@ -1,27 +1,98 @@
 from datetime import timedelta
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from common.custom_pagination_class import StandardResultsSetPagination
 from common.custom_permission_classes import IsAdmin, IsPlayer
-from post.models import Post
 from selection_trial.models import PlayersInTrial, Trial
-from users.models import Academy, Sport, UserProfile, Users
+from users.models import Academy, Users
 from users.serializers.user_serializer import (Academyserializer,
                                                SportSerializer,
                                                UserProfileSerializer)
 
-from .task import send_alert
+from .models import DailyMetrics
+from .task import send_alert, start_of_day
+
+
+class AdminListPagination(StandardResultsSetPagination):
+    page_size = 20
+
+
+USER_ORDERING = ["id", "username", "email", "created_at"]
+
+
+def parse_bool(value):
+    """
+    Parse a "true"/"false" query param, None when it is missing or unknown.
+    """
+    return {"true": True, "false": False}.get((value or "").lower())
+
+
+def filter_users(request, users):
+    """
+    Apply the search, filter and sorting query params of the admin user lists.
+
+    Query params:
+    - search: Part of the username or email.
+    - is_verified, is_active, is_certified: "true" or "false".
+    - ordering: One of USER_ORDERING, prefixed with "-" for descending (default "-id").
+    """
+    search = request.query_params.get("search", "").strip()
+    if search:
+        users = users.filter(Q(username__icontains=search) | Q(email__icontains=search))
+
+    for field in ["is_verified", "is_active"]:
+        value = parse_bool(request.query_params.get(field))
+        if value is not None:
+            users = users.filter(**{field: value})
+
+    is_certified = parse_bool(request.query_params.get("is_certified"))
+    if is_certified is not None:
+        certified = Exists(
+            Academy.objects.filter(user=OuterRef("pk"), is_certified=True)
+        )
+        users = users.filter(certified if is_certified else ~certified)
+
+    ordering = request.query_params.get("ordering", "-id")
+    if ordering.lstrip("-") not in USER_ORDERING:
+        ordering = "-id"
+    if ordering.lstrip("-") == "id":
+        return users.order_by(ordering)
+    return users.order_by(ordering, "-id")
+
+
+def paginated_users(request, view, users, key, serialize):
+    """
+    Paginate `users` and return them under `key` with the page links.
+    """
+    paginator = AdminListPagination()
+    page = paginator.paginate_queryset(users, request, view=view)
+    return Response(
+        {
+            "count": paginator.page.paginator.count,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            key: [serialize(user) for user in page],
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def user_sports(user):
+    return [SportSerializer(sport).data for sport in user.sport_set.all()]
 
 
 class AcademyManage(APIView):
     """
     API view to manage academy users.
 
-    - GET: Retrieves and returns a list of academy users with their profile, sport, and academy data.
+    - GET: Retrieves a page of academy users with their profile, sport, and
+      academy data, see `filter_users` for the search, filters and sorting.
     """
     permission_classes = [IsAuthenticated, IsAdmin | IsPlayer]
 
@@ -29,50 +100,36 @@ class AcademyManage(APIView):
         """
         Handles GET requests to retrieve a list of academy users.
 
+        Profiles, sports and academy details are loaded with the page in three
+        queries, whatever the page size.
+
         Returns:
             Response: A JSON response containing the academy users data and HTTP status.
         """
-        users = Users.objects.filter(is_academy=True).order_by("-id")
-        user_data = []
-        for user in users:
-            user_profile = None
-            sport_data = []
-            academy_data = []
-
-            # Fetch user profile data if it exists
-            if UserProfile.objects.filter(user=user).exists():
-                user_profile = UserProfile.objects.get(user=user)
-
-            # Fetch sports associated with the user if they exist
-            if Sport.objects.filter(user=user).exists():
-                sports = Sport.objects.filter(user=user)
-                sport_data = []
-                for sport in sports:
-                    sport_data.append(SportSerializer(sport).data)
-            
-            # Fetch Academy data if it exists
-            if Academy.objects.filter(user=user).exists():
-                academy_data = Academy.objects.get(user=user)
-            
-            # Compile user data
-            user_data.append(
-                {
-                    "id": user.id,
-                    "username": user.username,
-                    "email": user.email,
-                    "dob": user.dob,
-                    "profile": UserProfileSerializer(user_profile).data,
-                    "sport": sport_data,
-                    "academy_data": Academyserializer(academy_data).data,
-                }
-            )
+        users = filter_users(
+            request,
+            Users.objects.filter(is_academy=True)
+            .select_related("userprofile")
+            .prefetch_related("sport_set", "academy_user"),
+        )
 
-        # Return response with appropriate status
-        if not user_data:
-            return Response(
-                {"academy": user_data},status.HTTP_204_NO_CONTENT
-            )
-        return Response({"academy": user_data},status.HTTP_200_OK)
+        def serialize(user):
+            academies = user.academy_user.all()
+            return {
+                "id": user.id,
+                "username": user.username,
+                "email": user.email,
+                "dob": user.dob,
+                "profile": UserProfileSerializer(
+                    getattr(user, "userprofile", None)
+                ).data,
+                "sport": user_sports(user),
+                "academy_data": Academyserializer(
+                    academies[0] if academies else []
+                ).data,
+            }
+
+        return paginated_users(request, self, users, "academy", serialize)
 
 
 class ToggleIsCertified(APIView):
@@ -128,7 +185,8 @@ class PlayerManage(APIView):
     """
     API view to manage player users.
 
-    - GET: Retrieves and returns a list of players with their profile and sport data.
+    - GET: Retrieves a page of players with their profile and sport data, see
+      `filter_users` for the search, filters and sorting.
     """
 
     def get(self, request):
@@ -138,46 +196,29 @@ class PlayerManage(APIView):
         Returns:
             Response: A JSON response containing the player users data and HTTP status.
         """
-
-        players = Users.objects.filter(
-            Q(is_academy=False) & Q(is_staff=False) & Q(is_superuser=False)
-        ).order_by("-id")
-        player_data = []
-        for user in players:
-            user_profile = None
-            sport_data = []
-
-            # Fetch user profile if it exists
-            if UserProfile.objects.filter(user=user).exists():
-                user_profile = UserProfile.objects.get(user=user)
-
-            # Fetch sports associated with the userif they exist
-            if Sport.objects.filter(user=user).exists():
-                sports = Sport.objects.filter(user=user)
-                sport_data = []
-                for sport in sports:
-                    sport_data.append(SportSerializer(sport).data)
-
-            # Compile player data 
-            player_data.append(
-                {
-                    "id": user.id,
-                    "username": user.username,
-                    "email": user.email,
-                    "dob": user.dob,
-                    "is_active": user.is_active,
-                    "profile": UserProfileSerializer(user_profile).data,
-                    "sport": sport_data,
-                }
-            )
-        
-        # Return  response with appropriate status
-        if not player_data:
-            return Response(
-                {"player": player_data, "status": status.HTTP_204_NO_CONTENT}
+        users = filter_users(
+            request,
+            Users.objects.filter(
+                Q(is_academy=False) & Q(is_staff=False) & Q(is_superuser=False)
             )
+            .select_related("userprofile")
+            .prefetch_related("sport_set"),
+        )
+
+        def serialize(user):
+            return {
+                "id": user.id,
+                "username": user.username,
+                "email": user.email,
+                "dob": user.dob,
+                "is_active": user.is_active,
+                "profile": UserProfileSerializer(
+                    getattr(user, "userprofile", None)
+                ).data,
+                "sport": user_sports(user),
+            }
 
-        return Response({"player": player_data, "status": status.HTTP_200_OK})
+        return paginated_users(request, self, users, "player", serialize)
 
 
 class ToggleActive(APIView):
@@ -236,71 +277,42 @@ class DashboardViewSet(APIView):
         Returns:
             Response: A JSON response containing dashboard data and HTTP status.
         """
-        today = timezone.now()
+        today = timezone.localdate()
         start_of_the_week = today - timedelta(days=today.weekday())
 
-        # Calculate weekly percentage increase of new players
-        total_players = Users.objects.filter(is_academy=False, is_staff=False).count()
-        players_joined_this_week = Users.objects.filter(
-            is_academy=False, is_staff=False, created_at__gte=start_of_the_week
-        ).count()
-
-        if total_players > 0:
-            player_percentage_joined_this_week = (
-                players_joined_this_week / total_players
-            ) * 100
-        else:
-            player_percentage_joined_this_week = 0
-
-        #  Calculate weekly percentage increase of new academies
-        total_academies = Users.objects.filter(is_academy=True, is_staff=False).count()
-        academies_joined_this_week = Users.objects.filter(
-            is_academy=True, is_staff=False, created_at__gte=start_of_the_week
-        ).count()
-        if total_academies > 0:
-            academy_percentage_joined_this_week = (
-                players_joined_this_week / total_players
-            ) * 100
-        else:
-            academy_percentage_joined_this_week = 0
-
-        # Calculate weekly percentage increase of new trials 
-        total_trials = Trial.objects.filter(is_active=True).count()
-        trials_created_this_week = Trial.objects.filter(
-            is_active=True, created_at__gte=start_of_the_week
-        ).count()
-        if total_trials > 0:
-            trial_percentage_this_week = (trials_created_this_week / total_trials) * 100
-        else:
-            trial_percentage_this_week = 0
+        # Totals and this week's numbers come from the daily rollup, see
+        # admin.task.rollup_daily_metrics: they lag the tables by up to 15
+        # minutes, and deletions of older rows by up to a day (nightly recount)
+        fields = ["players", "academies", "trials", "posts"]
+        aggregates = {}
+        for field in fields:
+            aggregates[f"total_{field}"] = Sum(field, default=0)
+            aggregates[f"week_{field}"] = Sum(
+                field, filter=Q(date__gte=start_of_the_week), default=0
+            )
+        totals = DailyMetrics.objects.aggregate(**aggregates)
+
+        def weekly(field, text):
+            total = totals[f"total_{field}"]
+            this_week = totals[f"week_{field}"]
+            return {
+                "total": total,
+                "this_week": this_week,
+                "percentage_this_week": (this_week / total) * 100 if total > 0 else 0,
+                "text": text,
+            }
 
         weekly_data = [
-            {
-                "total": total_players,
-                "this_week": players_joined_this_week,
-                "percentage_this_week": player_percentage_joined_this_week,
-                "text": "Players Joined this Week",
-            },
-            {
-                "total": total_academies,
-                "this_week": academies_joined_this_week,
-                "percentage_this_week": academy_percentage_joined_this_week,
-                "text": "Academies Joined this Week",
-            },
-            {
-                "total": total_trials,
-                "this_week": trials_created_this_week,
-                "percentage_this_week": trial_percentage_this_week,
-                "text": "Trials created this Week ",
-            },
+            weekly("players", "Players Joined this Week"),
+            weekly("academies", "Academies Joined this Week"),
+            weekly("trials", "Trials created this Week "),
         ]
 
-        total_posts = Post.objects.count()
         stats = {
-            "totalAcademies": total_academies,
-            "totalPlayers": total_players,
-            "totalTrials": total_trials,
-            "totalPosts": total_posts,
+            "totalAcademies": totals["total_academies"],
+            "totalPlayers": totals["total_players"],
+            "totalTrials": totals["total_trials"],
+            "totalPosts": totals["total_posts"],
         }
 
         # Get recent players
@@ -357,36 +369,150 @@ class DashboardViewSet(APIView):
         )
 
 
+def paid_registrations(request):
+    """
+    Confirmed registrations to active trials with a registration fee, filtered
+    by the optional `start` and `end` (YYYY-MM-DD) query params on the
+    registration date.
+
+    Raises:
+        ValueError: If a date is invalid.
+    """
+    registrations = PlayersInTrial.objects.filter(
+        payment_status="confirmed",
+        trial__is_registration_fee=True,
+        trial__is_active=True,
+    )
+    start = request.query_params.get("start", None)
+    end = request.query_params.get("end", None)
+    if start:
+        start = parse_date(start)
+        if start is None:
+            raise ValueError("Invalid start date")
+        registrations = registrations.filter(created_at__gte=start_of_day(start))
+    if end:
+        end = parse_date(end)
+        if end is None:
+            raise ValueError("Invalid end date")
+        registrations = registrations.filter(
+            created_at__lt=start_of_day(end + timedelta(days=1))
+        )
+    return registrations
+
+
 class AccountsView(APIView):
     """
     API view to retrieve payment detials for each academies.
     
-    - GET: Retrieves and returns academy data and payment detials. 
+    - GET: Retrieves and returns academy data and payment detials, summed by the
+      database and paginated, optionally within a `start` / `end` date range.
     """
     permission_classes = [IsAdmin]
 
     def get(self, request):
+        try:
+            registrations = paid_registrations(request)
+        except ValueError as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        payment_summary = (
+            registrations.values(
+                academy_id=F("trial__academy_id"),
+                academy_name=F("trial__academy__username"),
+            )
+            .annotate(
+                total_amount=Sum("trial__registration_fee", default=0),
+                registrations=Count("id"),
+            )
+            .order_by("-total_amount", "academy_id")
+        )
 
-        payments = PlayersInTrial.objects.filter(
-            trial__is_registration_fee=True, trial__is_active=True
+        paginator = AdminListPagination()
+        page = paginator.paginate_queryset(payment_summary, request, view=self)
+        return paginator.get_paginated_response(page)
+
+
+class AcademyAccountsView(APIView):
+    """
+    API view to drill down into the payments of one academy.
+
+    - GET: Returns the payments of the academy summed per trial, paginated and
+      optionally within a `start` / `end` date range.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request, academy_id):
+        try:
+            registrations = paid_registrations(request)
+        except ValueError as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        trials = (
+            registrations.filter(trial__academy_id=academy_id)
+            .values(
+                "trial_id",
+                trial_name=F("trial__name"),
+                trial_date=F("trial__trial_date"),
+                registration_fee=F("trial__registration_fee"),
+            )
+            .annotate(
+                total_amount=Sum("trial__registration_fee", default=0),
+                registrations=Count("id"),
+            )
+            .order_by("-trial_date", "-trial_id")
         )
-        payment_summary = []
 
-        academy_payments = {}
+        paginator = AdminListPagination()
+        page = paginator.paginate_queryset(trials, request, view=self)
+        return paginator.get_paginated_response(page)
 
-        for payment in payments:
-            academy = payment.trial.academy
-            fee = payment.trial.registration_fee
 
-            if academy.id in academy_payments:
-                academy_payments[academy.id]["total_amount"] += fee
-            else:
-                academy_payments[academy.id] = {
-                    "academy_id": academy.id,
-                    "academy_name": academy.username, 
-                    "total_amount": fee,
-                }
+class DailyMetricsView(APIView):
+    """
+    API view to retrieve the daily metrics of a date range for the dashboard charts.
 
-        payment_summary = list(academy_payments.values())
+    - GET: Returns one entry per day between `start` and `end` (YYYY-MM-DD,
+      defaults to the last 30 days) and the totals of the range.
+    """
+    permission_classes = [IsAdmin]
+    DEFAULT_DAYS = 30
+    FIELDS = ["players", "academies", "trials", "posts", "registrations", "revenue"]
 
-        return Response(payment_summary)
+    def get(self, request):
+        today = timezone.localdate()
+        try:
+            end = parse_date(request.query_params.get("end", "")) or today
+            start = parse_date(request.query_params.get("start", "")) or (
+                end - timedelta(days=self.DEFAULT_DAYS - 1)
+            )
+        except ValueError:
+            return Response(
+                {"message": "Invalid date"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if start > end:
+            return Response(
+                {"message": "start must be before end"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = {
+            row["date"]: row
+            for row in DailyMetrics.objects.filter(
+                date__gte=start, date__lte=end
+            ).values("date", *self.FIELDS)
+        }
+        empty = dict.fromkeys(self.FIELDS, 0)
+        metrics = []
+        totals = dict(empty)
+        day = start
+        while day <= end:
+            row = rows.get(day, {"date": day, **empty})
+            metrics.append(row)
+            for field in self.FIELDS:
+                totals[field] += row[field]
+            day += timedelta(days=1)
+
+        return Response(
+            {"start": start, "end": end, "metrics": metrics, "totals": totals},
+            status=status.HTTP_200_OK,
+        )
@@ -1,3 +1,8 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
 from rest_framework.pagination import PageNumberPagination
 
 
@@ -13,3 +18,29 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size = 4
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+def encode_cursor(created_at, pk):
+    """
+    Build an opaque keyset cursor from the position of the last returned row.
+
+    Args:
+    - created_at: Creation time of the last row on the page.
+    - pk: Primary key of the last row, used to break ties on created_at.
+    """
+    raw = json.dumps([created_at.isoformat(), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor built by `encode_cursor` into a (created_at, pk) tuple.
+
+    Raises:
+    - ValueError: If the cursor is malformed.
+    """
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
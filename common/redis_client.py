@@ -0,0 +1,15 @@
+from django_redis import get_redis_connection
+
+
+def get_redis_client():
+    """
+    Return the raw Redis client behind the default cache.
+
+    The cache, Celery and Channels all point at the same Redis instance, so
+    subsystems that need real Redis structures (sorted sets, sets, hashes)
+    reuse the connection pool of the default cache instead of opening their own.
+
+    Raises:
+    - NotImplementedError: If the default cache is not backed by django-redis.
+    """
+    return get_redis_connection("default")
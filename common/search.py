@@ -0,0 +1,111 @@
+import hashlib
+import json
+import time
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                           SearchVector, TrigramWordSimilarity)
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+
+# Full text search over `search_vector` columns (users and trials), kept current
+# by the post_save signals of the searched models. Every search also matches
+# names by trigram word similarity, so partial words ("sach") and typos
+# ("sachn") still find "sachin", above pg_trgm.word_similarity_threshold (0.6).
+# Every condition is served by a GIN index, see the models' Meta.indexes.
+
+SEARCH_CONFIG = "english"
+
+# Search results are cached for a short time, keyed on the normalized query and
+# filters. Every key also contains the current version of its tags ("users",
+# "trials"), and saving a user, profile or trial sets a new version of its tag,
+# so the cached results that could include it are never read again.
+SEARCH_CACHE_TTL = 60
+SEARCH_TAG_KEY = "search_tag:{tag}"
+
+
+def weighted_vector(*parts):
+    """
+    Build a search vector from (text, weight) pairs. `text` is a field name, or a
+    Value() for text that lives in another table.
+    """
+    vector = None
+    for text, weight in parts:
+        part = SearchVector(text, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def search(queryset, query, name_field):
+    """
+    Filter `queryset` by `query` and annotate it with a `rank`, best first.
+
+    Rows match when their `search_vector` matches the words of the query
+    (web search syntax, so "quoted phrases" and -excluded words work) or when
+    `name_field` is similar to or contains the query.
+    """
+    search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+    return (
+        queryset.annotate(
+            rank=Coalesce(SearchRank(F("search_vector"), search_query), 0.0)
+            + TrigramWordSimilarity(Value(query), name_field)
+        )
+        .filter(
+            Q(search_vector=search_query)
+            | Q(**{f"{name_field}__trigram_word_similar": query})
+            | Q(**{f"{name_field}__icontains": query})
+        )
+        .order_by("-rank", "-pk")
+    )
+
+
+def normalize_query(query):
+    return " ".join((query or "").lower().split())
+
+
+def search_tag_versions(tags):
+    keys = [SEARCH_TAG_KEY.format(tag=tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [str(versions[key]) for key in keys]
+
+
+def invalidate_search(*tags):
+    """
+    Drop the cached search results of `tags` once the current transaction is
+    committed, so a search running meanwhile cannot cache the old rows again.
+    """
+    def bump():
+        cache.set_many(
+            {SEARCH_TAG_KEY.format(tag=tag): time.time_ns() for tag in tags},
+            timeout=None,
+        )
+
+    transaction.on_commit(bump)
+
+
+def cached_search(namespace, tags, params, compute):
+    """
+    Return the cached result of a search, or compute and cache it.
+
+    Args:
+        namespace (str): Name of the search, part of the key.
+        tags (list): Kinds of rows the result is built from.
+        params (dict): Everything the result depends on (normalized query,
+            filters, page, scope), must be JSON serializable.
+        compute (callable): Builds the result on a cache miss.
+    """
+    digest = hashlib.sha1(
+        json.dumps(params, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    versions = "-".join(search_tag_versions(tags))
+    key = f"search:{namespace}:{versions}:{digest}"
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, SEARCH_CACHE_TTL)
+    return result
@@ -0,0 +1,205 @@
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+# Single statement writes for rows guarded by a unique constraint (likes, follows,
+# friend requests). They replace the exists() check followed by create() or
+# delete(), which costs extra round trips and lets a double tap through between
+# the check and the write. These use PostgreSQL's ON CONFLICT and RETURNING.
+# They send post_save (created) and post_delete for the rows they write like the
+# ORM does, with an instance holding the values passed in, so receivers keeping
+# caches current see every write.
+
+
+def _is_timestamp(field):
+    return getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+
+
+def _field_values(model, values):
+    """
+    Map the concrete fields of the row to insert to their Python value.
+
+    Fields that are not passed in get the current time if they are automatic
+    timestamps, or their default, which Django only applies in Python.
+    """
+    now = timezone.now()
+    field_values = {}
+    for field in model._meta.concrete_fields:
+        if field.name in values:
+            field_values[field] = values[field.name]
+        elif _is_timestamp(field):
+            field_values[field] = now
+        elif field.has_default():
+            field_values[field] = field.get_default()
+    return field_values
+
+
+def _prepare(field_values):
+    """
+    Map fields to (column, database value) pairs, related objects are replaced
+    by their primary key.
+    """
+    columns = {}
+    for field, value in field_values.items():
+        if hasattr(value, "pk"):
+            value = value.pk
+        columns[field.column] = field.get_db_prep_save(value, connection)
+    return columns
+
+
+def _columns(model, values):
+    """
+    Map model field names to (column, database value) pairs, with the fields
+    that are not passed in filled as `_field_values` does.
+    """
+    return _prepare(_field_values(model, values))
+
+
+def _instance(model, field_values, pk):
+    """
+    Build the instance of a row written by these functions, for the signals.
+    """
+    instance = model()
+    for field, value in field_values.items():
+        # keep related objects that were passed in, ids go to the raw column
+        if hasattr(value, "pk"):
+            setattr(instance, field.name, value)
+        else:
+            setattr(instance, field.attname, value)
+    instance.pk = pk
+    instance._state.adding = False
+    return instance
+
+
+def _send_saved(model, instance):
+    post_save.send(
+        sender=model,
+        instance=instance,
+        created=True,
+        update_fields=None,
+        raw=False,
+        using=connection.alias,
+    )
+
+
+def _send_deleted(model, instance):
+    post_delete.send(
+        sender=model, instance=instance, using=connection.alias, origin=instance
+    )
+
+
+def _where(columns, lookup):
+    quote = connection.ops.quote_name
+    conditions, params = [], []
+    for column in lookup:
+        if columns[column] is None:
+            conditions.append(f"{quote(column)} IS NULL")
+        else:
+            conditions.append(f"{quote(column)} = %s")
+            params.append(columns[column])
+    return " AND ".join(conditions), params
+
+
+def insert_ignore(model, **values):
+    """
+    Insert a row unless it conflicts with a unique constraint.
+
+    Runs `INSERT ... ON CONFLICT DO NOTHING RETURNING` and sends post_save for
+    the new row.
+
+    Returns:
+        The new model instance, or None if the row already existed.
+    """
+    quote = connection.ops.quote_name
+    field_values = _field_values(model, values)
+    columns = _prepare(field_values)
+    pk_column = model._meta.pk.column
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} "
+        f"({', '.join(quote(column) for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT DO NOTHING RETURNING {quote(pk_column)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(columns.values()))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+
+    instance = _instance(model, field_values, row[0])
+    _send_saved(model, instance)
+    return instance
+
+
+def delete_returning(model, **filters):
+    """
+    Delete the rows matching `filters` with a single `DELETE ... RETURNING` and
+    send post_delete for each of them.
+
+    Cascades of the Django ORM are skipped, so only use it for rows nothing else
+    points to.
+
+    Returns:
+        list: The primary keys of the deleted rows.
+    """
+    quote = connection.ops.quote_name
+    columns = _columns(model, filters)
+    where, params = _where(
+        columns, [model._meta.get_field(name).column for name in filters]
+    )
+    sql = (
+        f"DELETE FROM {quote(model._meta.db_table)} WHERE {where} "
+        f"RETURNING {quote(model._meta.pk.column)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        pks = [row[0] for row in cursor.fetchall()]
+
+    field_values = {
+        model._meta.get_field(name): value for name, value in filters.items()
+    }
+    for pk in pks:
+        _send_deleted(model, _instance(model, field_values, pk))
+    return pks
+
+
+def toggle(model, **values):
+    """
+    Delete the row matching `values` if it exists, otherwise insert it, in one
+    statement, and send post_delete or post_save for it.
+
+    Returns:
+        tuple: (exists, changed) where `exists` tells if the row exists after the
+        statement and `changed` if this statement inserted or deleted it. A row
+        inserted concurrently by another request is reported as existing and
+        unchanged.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    pk_column = quote(model._meta.pk.column)
+    field_values = _field_values(model, values)
+    columns = _prepare(field_values)
+    where, where_params = _where(
+        columns, [model._meta.get_field(name).column for name in values]
+    )
+    sql = (
+        f"WITH deleted AS (DELETE FROM {table} WHERE {where} "
+        f"RETURNING {pk_column} AS pk), "
+        f"inserted AS ("
+        f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+        f"SELECT {', '.join(['%s'] * len(columns))} "
+        f"WHERE NOT EXISTS (SELECT 1 FROM deleted) "
+        f"ON CONFLICT DO NOTHING RETURNING {pk_column} AS pk) "
+        f"SELECT (SELECT pk FROM deleted LIMIT 1), (SELECT pk FROM inserted)"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, where_params + list(columns.values()))
+        deleted_pk, inserted_pk = cursor.fetchone()
+
+    if deleted_pk is not None:
+        _send_deleted(model, _instance(model, field_values, deleted_pk))
+        return False, True
+    if inserted_pk is not None:
+        _send_saved(model, _instance(model, field_values, inserted_pk))
+        return True, True
+    return True, False
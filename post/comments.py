@@ -0,0 +1,102 @@
+from collections import defaultdict
+
+from common.custom_pagination_class import decode_cursor, encode_cursor
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+
+COMMENT_PREVIEW = 3  # top level comments embedded per post
+REPLY_PREVIEW = 2  # direct replies embedded per previewed comment
+COMMENTS_PER_PAGE = 20
+
+
+def first_comments(comments, partition, limit):
+    """
+    Return the first `limit` comments (oldest first) of every `partition` value,
+    cut in SQL with ROW_NUMBER() so the other comments are never read, each
+    annotated with its number of direct replies.
+    """
+    return (
+        comments.select_related("user__userprofile")
+        .annotate(
+            reply_count=Count("replies"),
+            position=Window(
+                RowNumber(),
+                partition_by=F(partition),
+                order_by=[F("created_at").asc(), F("id").asc()],
+            ),
+        )
+        .filter(position__lte=limit)
+        .order_by("created_at", "id")
+    )
+
+
+def load_comment_previews(post_ids, preview=COMMENT_PREVIEW, replies=REPLY_PREVIEW):
+    """
+    Load the comment preview of a batch of posts with two queries: the first
+    `preview` top level comments of each post, and the first `replies` direct
+    replies of each of them. Deeper replies are left to the replies endpoint.
+
+    Every returned comment gets two attributes read by CommentSerializer:
+    - loaded_replies: its embedded replies, empty for the replies themselves
+    - reply_count: the number of direct replies, including the ones not embedded
+
+    Returns:
+        dict: post id -> list of top level comments, oldest first.
+    """
+    top_level = list(
+        first_comments(
+            Comment.objects.filter(post__in=post_ids, parent=None), "post_id", preview
+        )
+    )
+    children = defaultdict(list)
+    parent_ids = [comment.id for comment in top_level if comment.reply_count]
+    if parent_ids:
+        for reply in first_comments(
+            Comment.objects.filter(parent__in=parent_ids), "parent_id", replies
+        ):
+            reply.loaded_replies = []
+            children[reply.parent_id].append(reply)
+
+    previews = defaultdict(list)
+    for comment in top_level:
+        comment.loaded_replies = children[comment.id]
+        previews[comment.post_id].append(comment)
+    return previews
+
+
+def comment_page(comments, cursor=None, limit=COMMENTS_PER_PAGE):
+    """
+    Return one page of `comments`, oldest first, without their replies.
+
+    Every comment carries its `reply_count` so the client can page the replies
+    on demand.
+
+    Args:
+        comments (QuerySet): The comments to paginate.
+        cursor (str, optional): `next_cursor` of the previous page.
+        limit (int): Page size.
+
+    Returns:
+        tuple: (list of comments, cursor of the next page or None)
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    comments = (
+        comments.select_related("user__userprofile")
+        .annotate(reply_count=Count("replies"))
+        .order_by("created_at", "id")
+    )
+    if cursor:
+        created_at, comment_id = decode_cursor(cursor)
+        comments = comments.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=comment_id)
+        )
+
+    page = list(comments[: limit + 1])
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_cursor(page[-1].created_at, page[-1].id)
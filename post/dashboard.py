@@ -0,0 +1,21 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+# The academy dashboard (see post.views.AcademyDashBoard) is cached per academy
+# and dropped by post.signals when a trial, registration or follow of the
+# academy changes.
+DASHBOARD_CACHE_KEY = "academy_dashboard_{academy_id}"
+DASHBOARD_CACHE_TIMEOUT = 60 * 5  # the trial counts depend on the current time
+
+
+def invalidate_dashboard(academy_id):
+    """
+    Drop the cached dashboard of an academy once the current transaction is
+    committed, so a dashboard read meanwhile cannot cache the old numbers again.
+    """
+    if academy_id:
+        transaction.on_commit(
+            partial(cache.delete, DASHBOARD_CACHE_KEY.format(academy_id=academy_id))
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0002_post_like_count_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sport', models.CharField(blank=True, max_length=255, null=True)),
+                ('state', models.CharField(blank=True, max_length=255, null=True)),
+                ('district', models.CharField(blank=True, max_length=255, null=True)),
+                ('score', models.FloatField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_entries', to='post.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sport', '-score'], name='post_trendi_sport_4c1e9a_idx'), models.Index(fields=['district', '-score'], name='post_trendi_distric_704160_idx'), models.Index(fields=['state', '-score'], name='post_trendi_state_461843_idx')],
+            },
+        ),
+    ]
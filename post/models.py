@@ -12,11 +12,20 @@ class Post(DataBaseModels):
     - content: Text field for the content of the post.
     - image: ImageField for uploading images associated with the post.
     - video: FileField for uploading videos associated with the post.
+    - image_variants: Resized copies of the image, filled in by the uploads app.
+    - like_count: Denormalized number of likes, kept current by the like action.
+    - comment_count: Denormalized number of comments and replies, kept current by the comment action.
     """
     user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name="posts")
     content = models.TextField(null=True)
     image = models.ImageField(upload_to="post_images/", null=True, blank=True)
     video = models.FileField(upload_to="post_vidoes/", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["created_at"])]
 
     def __str__(self) -> str:
         return f"{self.user.username} - posts"
@@ -62,3 +71,37 @@ class Like(DataBaseModels):
 
     def __str__(self) -> str:
         return f"Like by {self.user.username} on {self.post.content[:10]} post"
+
+
+class TrendingPost(DataBaseModels):
+    """
+    Model representing a recent post in the precomputed trending index.
+
+    The index is rebuilt periodically by a Celery task. Each post gets one row per
+    sport of its author, so recommendations can be read per sport and location
+    without joining the author's sports and profile.
+
+    Fields:
+    - post: Foreign key to the trending Post.
+    - sport: One of the sports of the post author.
+    - state: State of the post author.
+    - district: District of the post author.
+    - score: Engagement score of the post decayed by its age.
+    """
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="trending_entries"
+    )
+    sport = models.CharField(max_length=255, null=True, blank=True)
+    state = models.CharField(max_length=255, null=True, blank=True)
+    district = models.CharField(max_length=255, null=True, blank=True)
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["sport", "-score"]),
+            models.Index(fields=["district", "-score"]),
+            models.Index(fields=["state", "-score"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.post_id} trending in {self.sport} - {self.score}"
@@ -1,8 +1,34 @@
+from django.db import models, transaction
 from real_time.task import send_notification
 from rest_framework import serializers
-from user_profile.models import Follow, FriendRequest
+from uploads.fields import (DirectUploadFileField, DirectUploadSerializerMixin,
+                            VariantImageField)
+from user_profile import graph
+from user_profile.relationships import RelationshipContext
 
+from .comments import load_comment_previews
 from .models import Comment, Like, Post
+from .tasks import fan_out_post
+
+
+def announce_post(post):
+    """
+    Push a new post to the timelines of its audience and notify the author's
+    followers (academies) or friends (players).
+    """
+    user = post.user
+    fan_out_post.delay(post.id)
+
+    notification_type = "new_post"
+    text = f"{user.username} added a new post"
+    link = f"/view_post_details/{post.id}"
+
+    if user.is_academy:
+        receivers_list = list(graph.followers_of(user.id))
+    else:
+        receivers_list = list(graph.friends_of(user.id))
+
+    send_notification.delay(notification_type, text, link, user.id, receivers_list)
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -10,10 +36,12 @@ class CommentSerializer(serializers.ModelSerializer):
     Serializer for Comment model.
 
     Includes fields for user details, replies, and other comment-specific attributes.
+    Embedded replies are read from the previews built by `load_comment_previews`.
     """
     replies = serializers.SerializerMethodField()
+    reply_count = serializers.SerializerMethodField()
     user = serializers.ReadOnlyField(source="user.username")
-    profile_photo = serializers.ImageField(
+    profile_photo = VariantImageField(
         source="user.userprofile.profile_photo", read_only=True
     )
     user_id = serializers.ReadOnlyField(source="user.id")
@@ -26,6 +54,7 @@ class CommentSerializer(serializers.ModelSerializer):
             "user",
             "created_at",
             "replies",
+            "reply_count",
             "content",
             "parent",
             "profile_photo",
@@ -35,29 +64,66 @@ class CommentSerializer(serializers.ModelSerializer):
 
     def get_replies(self, obj):
         """
-        Return a list of replies for the comment.
+        Return the loaded replies of the comment.
+
+        Comments that were not loaded as part of a tree (e.g. a new comment)
+        have no replies yet, so an empty list is returned.
+        """
+        replies = getattr(obj, "loaded_replies", [])
+        return CommentSerializer(replies, many=True).data
 
-        If there are no replies, return an empty list.
+    def get_reply_count(self, obj):
         """
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True).data
-        return []
+        Return the number of direct replies of the comment.
+        """
+        return getattr(obj, "reply_count", 0)
+
 
+class PostListSerializer(serializers.ListSerializer):
+    """
+    List serializer for posts.
 
-class PostSerializer(serializers.ModelSerializer):
+    Loads the relationships between the current user and every author on the page
+    and the comment preview of every post once, so the per-post fields do
+    not query the database for each post.
+    """
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        request = self.context.get("request")
+        if request and "relationships" not in self.context:
+            self.context["relationships"] = RelationshipContext(
+                request.user,
+                {post.user_id for post in posts},
+                [post.id for post in posts],
+            )
+        if "comments" not in self.context:
+            self.context["comments"] = load_comment_previews(
+                [post.id for post in posts]
+            )
+        return super().to_representation(posts)
+
+
+class PostSerializer(DirectUploadSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Post model.
 
     Includes fields for user details, post content, and additional computed fields like likes count,
-    comments, and relationship status.
+    comments, and relationship status. Images are returned as their resized variants.
     """
     user = serializers.ReadOnlyField(source="user.username")
     bio = serializers.ReadOnlyField(source="user.userprofile.bio", read_only=True)
-    profile_photo = serializers.ImageField(
+    image = VariantImageField(
+        variant="medium", target="post_image", required=False, allow_null=True
+    )
+    video = DirectUploadFileField(
+        target="post_video", required=False, allow_null=True
+    )
+    profile_photo = VariantImageField(
         source="user.userprofile.profile_photo", read_only=True
     )
     comments = serializers.SerializerMethodField()
-    likes_count = serializers.SerializerMethodField()
+    likes_count = serializers.ReadOnlyField(source="like_count")
+    comment_count = serializers.ReadOnlyField()
     is_liked_by_current_user = serializers.SerializerMethodField()
     is_own_post = serializers.SerializerMethodField()
     is_academy = serializers.ReadOnlyField(source="user.is_academy")
@@ -66,6 +132,7 @@ class PostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
+        list_serializer_class = PostListSerializer
         fields = [
             "id",
             "user",
@@ -80,6 +147,7 @@ class PostSerializer(serializers.ModelSerializer):
             "updated_at",
             "comments",
             "likes_count",
+            "comment_count",
             "profile_photo",
             "is_liked_by_current_user",
             "user_id",
@@ -87,51 +155,46 @@ class PostSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """
-        Create a new Post and send a notification to relevant users.
-
-        Determines the recipients based on whether the user is an academy or player and sends a notification
-        about the new post.
+        Create a new Post, push it to the timelines of its audience and send a
+        notification to relevant users.
         """
         user = self.context["request"].user
-        post = Post.objects.create(user=user, **validated_data)
-
-        notification_type = "new_post"
-        text = f"{user.username} added a new post"
-        link = f"/view_post_details/{post.id}"
-
-        if user.is_academy:
-            receivers_list = list(
-                Follow.objects.filter(
-                    academy=user,
-                ).values_list("player__id", flat=True)
-            )
-        else:
-            receivers_list = list(user.friends.all().values_list("id", flat=True))
-
-        send_notification.delay(notification_type, text, link, user.id, receivers_list)
-
+        with transaction.atomic():
+            self.claim_direct_uploads(validated_data)
+            post = Post.objects.create(user=user, **validated_data)
+        announce_post(post)
         return post
 
-    def get_likes_count(self, obj):
+    def relationship_context(self, obj):
         """
-        Return the count of likes for the post.
+        Return the relationship context of the current user.
+
+        List serializations load it for the whole page, a single post builds its own.
         """
-        return obj.likes.count()
+        if "relationships" not in self.context:
+            self.context["relationships"] = RelationshipContext(
+                self.context["request"].user, [obj.user_id], [obj.id]
+            )
+        return self.context["relationships"]
 
     def get_is_liked_by_current_user(self, obj):
         """
         Check if the current user has liked the post.
         """
-        user = self.context["request"].user
-        return obj.likes.filter(user=user).exists()
+        return self.relationship_context(obj).is_liked(obj.id)
 
     def get_comments(self, obj):
         """
-        Return a list of comments for the post, excluding replies to other comments.
+        Return the first top level comments of the post with their first replies.
+
+        Only a preview of the comments is embedded, the rest are paged through
+        the comments and replies endpoints.
         """
+        if "comments" not in self.context:
+            self.context["comments"] = load_comment_previews([obj.id])
         return CommentSerializer(
-            obj.comments.filter(parent=None), many=True
-        ).data  
+            self.context["comments"].get(obj.id, []), many=True
+        ).data
 
     def get_is_own_post(self, obj):
         """
@@ -155,40 +218,7 @@ class PostSerializer(serializers.ModelSerializer):
         - "friends" if the users are friends
         - "none" if none of the above
         """
-        current_user = self.context["request"].user
-        post_author = obj.user
-
-        if current_user == post_author:
-            return "self"
-
-        if post_author.is_academy:
-            following = Follow.objects.filter(
-                player=current_user, academy=post_author
-            ).exists()
-            return "following" if following else "follow"
-
-        if current_user.is_academy:
-            following = Follow.objects.filter(
-                player=post_author, academy=current_user
-            ).exists()
-            return "follower" if following else "notfollower"
-
-        friend_request = FriendRequest.objects.filter(
-            from_user=post_author, to_user=current_user
-        ).first()
-        if friend_request:
-            return "received"
-
-        friend_request = FriendRequest.objects.filter(
-            from_user=current_user, to_user=post_author
-        ).first()
-        if friend_request:
-            return "sent"
-
-        if current_user.friends.filter(id=post_author.id).exists():
-            return "friends"
-
-        return "none"
+        return self.relationship_context(obj).relationship_status(obj.user)
 
 
 class LikeSerializer(serializers.ModelSerializer):
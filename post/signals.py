@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from selection_trial.models import PlayersInTrial, Trial
+from user_profile.models import Follow
+
+from .dashboard import invalidate_dashboard
+
+
+def registration_academy_id(registration):
+    """
+    Return the academy of the trial of a registration, without loading the trial
+    when it is not loaded yet.
+    """
+    if PlayersInTrial._meta.get_field("trial").is_cached(registration):
+        return registration.trial.academy_id
+    return (
+        Trial.objects.filter(pk=registration.trial_id)
+        .values_list("academy_id", flat=True)
+        .first()
+    )
+
+
+@receiver([post_save, post_delete], sender=Trial)
+def trial_changed(sender, instance, **kwargs):
+    invalidate_dashboard(instance.academy_id)
+
+
+@receiver([post_save, post_delete], sender=PlayersInTrial)
+def registration_changed(sender, instance, **kwargs):
+    if instance.trial_id:
+        invalidate_dashboard(registration_academy_id(instance))
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    invalidate_dashboard(instance.academy_id)
@@ -0,0 +1,209 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from celery import shared_task
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from users.models import Sport
+
+from . import timeline
+from .models import Comment, Like, Post, TrendingPost
+
+COUNTER_BATCH_SIZE = 1000
+TRENDING_WINDOW = timedelta(days=7)  # posts older than this never trend
+TRENDING_GRAVITY = 1.5  # how fast the score of a post decays with its age
+
+
+@shared_task(bind=True)
+def fan_out_post(self, post_id):
+    """
+    Push a newly created post into the timelines of the author, the author's
+    friends and the players following the author.
+
+    Args:
+        post_id (int): The ID of the new post.
+    """
+    try:
+        post = Post.objects.select_related("user").get(id=post_id)
+        timeline.push_post(
+            post.id, post.created_at, timeline.audience_ids(post.user)
+        )
+    except Post.DoesNotExist:
+        print(f"post {post_id} deleted before fan out")
+    except Exception as e:
+        print(e, "error in fan out post")
+        self.retry(exc=e, countdown=30, max_retries=3)
+
+
+@shared_task(bind=True)
+def remove_post_from_timelines(self, post_id, user_ids):
+    """
+    Remove a deleted post from the timelines it was pushed to.
+
+    Args:
+        post_id (int): The ID of the deleted post.
+        user_ids (list): IDs of the users whose timeline may contain the post.
+    """
+    try:
+        timeline.remove_post(post_id, user_ids)
+    except Exception as e:
+        print(e, "error removing post from timelines")
+        self.retry(exc=e, countdown=30, max_retries=3)
+
+
+@shared_task(bind=True)
+def remove_author_from_timeline(self, user_id, author_id):
+    """
+    Trim the posts of `author_id` out of the timeline of `user_id`
+    after an unfollow or an unfriend.
+    """
+    try:
+        timeline.remove_author(user_id, author_id)
+    except Exception as e:
+        print(e, "error trimming timeline")
+        self.retry(exc=e, countdown=30, max_retries=3)
+
+
+@shared_task(bind=True)
+def merge_author_into_timeline(self, user_id, author_id):
+    """
+    Add the recent posts of `author_id` to the timeline of `user_id`
+    after a follow or an accepted friend request.
+    """
+    try:
+        timeline.merge_author(user_id, author_id)
+    except Exception as e:
+        print(e, "error merging into timeline")
+        self.retry(exc=e, countdown=30, max_retries=3)
+
+
+@shared_task
+def reconcile_post_counters(batch_size=COUNTER_BATCH_SIZE):
+    """
+    Periodic task that recomputes the like and comment counters of every post
+    and fixes the ones that drifted from the Like and Comment tables.
+
+    Posts are scanned in primary key batches so the job never loads the whole
+    table at once.
+
+    Args:
+        batch_size (int): Number of posts checked per query.
+
+    Returns:
+        int: The number of posts whose counters were corrected.
+    """
+    likes = (
+        Like.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    comments = (
+        Comment.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+
+    fixed = 0
+    last_id = 0
+    while True:
+        batch_ids = list(
+            Post.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not batch_ids:
+            break
+        last_id = batch_ids[-1]
+
+        drifted = (
+            Post.objects.filter(id__in=batch_ids)
+            .annotate(
+                actual_likes=Coalesce(Subquery(likes), 0),
+                actual_comments=Coalesce(Subquery(comments), 0),
+            )
+            .filter(
+                ~Q(like_count=F("actual_likes"))
+                | ~Q(comment_count=F("actual_comments"))
+            )
+        )
+        posts = []
+        for post in drifted:
+            post.like_count = post.actual_likes
+            post.comment_count = post.actual_comments
+            posts.append(post)
+        if posts:
+            Post.objects.bulk_update(posts, ["like_count", "comment_count"])
+            fixed += len(posts)
+
+    print(f"reconciled counters of {fixed} posts")
+    return fixed
+
+
+def trending_score(like_count, comment_count, created_at, now):
+    """
+    Engagement of a post decayed by its age in hours, so a fresh post with a few
+    likes can outrank an older one with more.
+    """
+    age_hours = max((now - created_at).total_seconds(), 0) / 3600
+    return (like_count + comment_count + 1) / (age_hours + 2) ** TRENDING_GRAVITY
+
+
+@shared_task
+def rebuild_trending_posts():
+    """
+    Periodic task that rebuilds the TrendingPost index from the posts of the
+    last TRENDING_WINDOW.
+
+    Every post gets one row per sport of its author (or a single row without
+    sport) carrying the author's state and district, so the home feed reads the
+    top recommendations of a partition without scanning the week of posts.
+
+    Returns:
+        int: The number of rows in the new index.
+    """
+    now = timezone.now()
+    posts = Post.objects.filter(created_at__gte=now - TRENDING_WINDOW).values(
+        "id",
+        "user_id",
+        "like_count",
+        "comment_count",
+        "created_at",
+        "user__userprofile__state",
+        "user__userprofile__district",
+    )
+
+    posts = list(posts)
+    author_sports = defaultdict(set)
+    for user_id, sport_name in Sport.objects.filter(
+        user__in={post["user_id"] for post in posts}
+    ).values_list("user_id", "sport_name"):
+        author_sports[user_id].add(sport_name)
+
+    entries = []
+    for post in posts:
+        score = trending_score(
+            post["like_count"], post["comment_count"], post["created_at"], now
+        )
+        for sport in author_sports[post["user_id"]] or {None}:
+            entries.append(
+                TrendingPost(
+                    post_id=post["id"],
+                    sport=sport,
+                    state=post["user__userprofile__state"],
+                    district=post["user__userprofile__district"],
+                    score=score,
+                )
+            )
+
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(entries, batch_size=COUNTER_BATCH_SIZE)
+
+    print(f"rebuilt trending index with {len(entries)} entries")
+    return len(entries)
@@ -1,3 +1,372 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from selection_trial.models import PlayersInTrial, Trial
+from user_profile.models import Follow
+from users.models import Sport, UserProfile, Users
+
+from . import timeline
+from .comments import load_comment_previews
+from .dashboard import DASHBOARD_CACHE_KEY
+from .models import Comment, Like, Post, TrendingPost
+from .tasks import rebuild_trending_posts, reconcile_post_counters
+
+
+class PostTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = Users.objects.create_user(
+            email="player@example.com",
+            username="player",
+            password="testpass123",
+            is_verified=True,
+        )
+        UserProfile.objects.create(user=self.user, state="Kerala", district="Kochi")
+        self.authenticate(self.user)
+
+    def authenticate(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+class TimelineTest(PostTestCase):
+    def test_push_post_only_updates_existing_timelines(self):
+        pipe = MagicMock()
+        pipe.execute.side_effect = [[1, 0], []]
+        client = MagicMock()
+        client.pipeline.return_value = pipe
+        post = Post.objects.create(user=self.user, content="first post")
+
+        with patch("post.timeline.get_redis_client", return_value=client):
+            timeline.push_post(post.id, post.created_at, [1, 2])
+
+        pipe.zadd.assert_called_once_with(
+            timeline.timeline_key(1),
+            {timeline.timeline_member(post.id): post.created_at.timestamp()},
+        )
+
+    def test_cursor_pages_through_posts_with_the_same_time(self):
+        created_at = timezone.now()
+        for post_id in [9, 10, 11]:
+            Post.objects.create(
+                id=post_id, user=self.user, content="post", created_at=created_at
+            )
+        Post.objects.filter(user=self.user).update(created_at=created_at)
+
+        pages, after = [], None
+        with patch(
+            "post.timeline.get_redis_client", return_value=fakeredis.FakeRedis()
+        ):
+            for _ in range(3):
+                post_ids, size = timeline.read_timeline(self.user, 1, after)
+                pages.append(post_ids[0])
+                after = (created_at, post_ids[0])
+        self.assertEqual(pages, [11, 10, 9])
+        self.assertEqual(size, 3)
+
+    def test_audience_contains_author_friends_and_followers(self):
+        friend = Users.objects.create_user(
+            email="friend@example.com", username="friend", password="testpass123"
+        )
+        self.user.friends.add(friend)
+        self.assertCountEqual(
+            timeline.audience_ids(self.user), [self.user.id, friend.id]
+        )
+
+    @patch("post.views.timeline.read_timeline", side_effect=ConnectionError)
+    def test_home_falls_back_to_database_without_timeline(self, mock_read):
+        Post.objects.create(user=self.user, content="first post")
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["posts"]), 1)
+        self.assertFalse(response.data["has_more"])
+
+
+@patch("post.views.timeline.read_timeline", side_effect=ConnectionError)
+class HomeFeedPaginationTest(PostTestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(12):
+            Post.objects.create(user=self.user, content=f"post {number}")
+
+    def test_cursor_returns_next_slice_only(self, mock_read):
+        response = self.client.get(reverse("home"))
+        self.assertEqual(len(response.data["posts"]), 10)
+        self.assertTrue(response.data["has_more"])
+        # the first page also serves clients that still page by number
+        self.assertEqual(response.data["page"], 2)
+
+        response = self.client.get(
+            reverse("home"), {"cursor": response.data["next_cursor"]}
+        )
+        self.assertNotIn("page", response.data)
+        self.assertEqual(
+            [post["content"] for post in response.data["posts"]], ["post 1", "post 0"]
+        )
+        self.assertFalse(response.data["has_more"])
+        self.assertIsNone(response.data["next_cursor"])
+
+    def test_invalid_cursor(self, mock_read):
+        response = self.client.get(reverse("home"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_legacy_page_parameter_is_cumulative(self, mock_read):
+        response = self.client.get(reverse("home"), {"page": 2})
+        self.assertEqual(len(response.data["posts"]), 12)
+        self.assertFalse(response.data["has_more"])
+        self.assertEqual(response.data["page"], 3)
+
+
+class PostCounterTest(PostTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post = Post.objects.create(user=self.user, content="post")
+
+    def test_like_and_comment_update_counters(self):
+        self.client.post(reverse("like", args=[self.post.id]))
+        self.client.post(
+            reverse("add_comment", args=[self.post.id]), {"content": "nice"}
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.post.comment_count, 1)
+
+        self.client.post(reverse("like", args=[self.post.id]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_like_missing_post(self):
+        response = self.client.post(reverse("like", args=[9999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_state(self):
+        other = Post.objects.create(user=self.user, content="other", comment_count=2)
+        Like.objects.create(user=self.user, post=self.post)
+        Post.objects.filter(id=self.post.id).update(like_count=1)
+
+        # authentication, likes and counters
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                reverse("posts_state"),
+                {"post_ids": [self.post.id, other.id, 9999]},
+                format="json",
+            )
+        states = {post["id"]: post for post in response.data["posts"]}
+        self.assertEqual(len(states), 2)
+        self.assertTrue(states[self.post.id]["is_liked_by_current_user"])
+        self.assertEqual(states[self.post.id]["likes_count"], 1)
+        self.assertFalse(states[other.id]["is_liked_by_current_user"])
+        self.assertEqual(states[other.id]["comment_count"], 2)
+
+        response = self.client.post(
+            reverse("posts_state"), {"post_ids": list(range(201))}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reconcile_fixes_drifted_counters(self):
+        Like.objects.create(user=self.user, post=self.post)
+        Post.objects.filter(id=self.post.id).update(like_count=5, comment_count=2)
+
+        self.assertEqual(reconcile_post_counters(batch_size=1), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.post.comment_count, 0)
+
+
+class TrendingPostTest(PostTestCase):
+    def setUp(self):
+        super().setUp()
+        Sport.objects.create(user=self.user, sport_name="Football")
+        self.other = Users.objects.create_user(
+            email="other@example.com", username="other", password="testpass123"
+        )
+        UserProfile.objects.create(user=self.other, state="Goa", district="Panaji")
+        Sport.objects.create(user=self.other, sport_name="Football")
+        Sport.objects.create(user=self.other, sport_name="Cricket")
+
+    def test_rebuild_creates_one_entry_per_author_sport(self):
+        quiet = Post.objects.create(user=self.other, content="quiet")
+        popular = Post.objects.create(user=self.other, content="popular", like_count=9)
+
+        self.assertEqual(rebuild_trending_posts(), 4)
+        self.assertCountEqual(
+            TrendingPost.objects.filter(post=popular).values_list("sport", flat=True),
+            ["Football", "Cricket"],
+        )
+        self.assertGreater(
+            TrendingPost.objects.filter(post=popular).first().score,
+            TrendingPost.objects.filter(post=quiet).first().score,
+        )
+
+    @patch("post.views.timeline.read_timeline", side_effect=ConnectionError)
+    def test_home_mixes_in_trending_posts(self, mock_read):
+        Post.objects.create(user=self.other, content="trending")
+        rebuild_trending_posts()
+        Post.objects.create(user=self.other, content="not indexed yet")
+
+        response = self.client.get(reverse("home"))
+        self.assertEqual(
+            [post["content"] for post in response.data["posts"]], ["trending"]
+        )
+
+
+class CommentTreeTest(PostTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post = Post.objects.create(user=self.user, content="post")
+        self.comments = [
+            Comment.objects.create(user=self.user, post=self.post, content=f"c{n}")
+            for n in range(4)
+        ]
+        reply = Comment.objects.create(
+            user=self.user, post=self.post, parent=self.comments[0], content="r1"
+        )
+        Comment.objects.create(
+            user=self.user, post=self.post, parent=reply, content="r2"
+        )
+
+    def test_previews_are_capped_in_sql(self):
+        other_post = Post.objects.create(user=self.user, content="other post")
+        Comment.objects.create(user=self.user, post=other_post, content="o1")
+        for n in range(3):
+            Comment.objects.create(
+                user=self.user,
+                post=self.post,
+                parent=self.comments[0],
+                content=f"extra reply {n}",
+            )
+
+        with self.assertNumQueries(2):
+            previews = load_comment_previews([self.post.id, other_post.id])
+        self.assertEqual(
+            [comment.content for comment in previews[self.post.id]], ["c0", "c1", "c2"]
+        )
+        self.assertEqual(len(previews[other_post.id]), 1)
+        first = previews[self.post.id][0]
+        self.assertEqual(first.reply_count, 4)
+        self.assertEqual(
+            [reply.content for reply in first.loaded_replies],
+            ["r1", "extra reply 0"],
+        )
+        # deeper replies are only counted, the replies endpoint pages them
+        self.assertEqual(first.loaded_replies[0].reply_count, 1)
+        self.assertEqual(first.loaded_replies[0].loaded_replies, [])
+
+    @patch("post.views.timeline.read_timeline", side_effect=ConnectionError)
+    def test_feed_embeds_comment_preview(self, mock_read):
+        # the comments above were created without the endpoint's counter update
+        reconcile_post_counters()
+
+        response = self.client.get(reverse("home"))
+        post = response.data["posts"][0]
+        self.assertEqual(len(post["comments"]), 3)
+        reply = post["comments"][0]["replies"][0]
+        self.assertEqual(reply["content"], "r1")
+        self.assertEqual(reply["reply_count"], 1)
+        self.assertEqual(reply["replies"], [])
+
+        response = self.client.get(reverse("posts", args=[self.post.id]))
+        self.assertEqual(len(response.data["comments"]), 3)
+        self.assertEqual(response.data["comment_count"], 6)
+
+    def test_comments_endpoint_pages_top_level_comments(self):
+        for n in range(4, 21):
+            Comment.objects.create(user=self.user, post=self.post, content=f"c{n}")
+        url = reverse("post_comments", args=[self.post.id])
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["comments"]), 20)
+        self.assertEqual(response.data["comments"][0]["reply_count"], 1)
+        self.assertEqual(response.data["comments"][0]["replies"], [])
+        self.assertTrue(response.data["has_more"])
+
+        response = self.client.get(url, {"cursor": response.data["next_cursor"]})
+        self.assertEqual(
+            [comment["content"] for comment in response.data["comments"]], ["c20"]
+        )
+        self.assertIsNone(response.data["next_cursor"])
+
+    def test_replies_endpoint(self):
+        response = self.client.get(
+            reverse("comment_replies", args=[self.comments[0].id])
+        )
+        self.assertEqual(response.data["replies"][0]["content"], "r1")
+        self.assertEqual(response.data["replies"][0]["reply_count"], 1)
+
+        response = self.client.get(reverse("comment_replies", args=[9999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AcademyDashBoardTest(PostTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.academy = Users.objects.create_user(
+            email="academy@example.com",
+            username="academy",
+            password="testpass123",
+            is_academy=True,
+        )
+        past = timezone.now().date() - timedelta(days=3)
+        future = timezone.now().date() + timedelta(days=3)
+        self.trial = Trial.objects.create(
+            academy=self.academy, name="open", trial_date=future, registration_fee=100
+        )
+        Trial.objects.create(academy=self.academy, name="done", trial_date=past)
+        Trial.objects.create(
+            academy=self.academy, name="off", trial_date=future, is_active=False
+        )
+        PlayersInTrial.objects.create(
+            trial=self.trial,
+            player=self.user,
+            name="player",
+            payment_status="confirmed",
+        )
+        self.authenticate(self.academy)
+
+    def test_dashboard_is_cached_until_data_changes(self):
+        response = self.client.get(reverse("academy_dashboard"))
+        self.assertEqual(
+            response.data["stats"],
+            {
+                "totalTrials": 3,
+                "completedTrials": 1,
+                "upcomingTrials": 1,
+                "cancelledTrials": 1,
+            },
+        )
+        self.assertEqual(response.data["payments"]["totalReceived"], 100)
+        self.assertEqual(response.data["playerEngagement"]["trialParticipants"], 1)
+
+        # authentication only
+        with self.assertNumQueries(1):
+            self.client.get(reverse("academy_dashboard"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(player=self.user, academy=self.academy)
+        response = self.client.get(reverse("academy_dashboard"))
+        self.assertEqual(response.data["playerEngagement"]["followers"], 1)
+
+    def test_registration_changes_drop_the_cache_on_commit(self):
+        self.client.get(reverse("academy_dashboard"))
+        registration = PlayersInTrial.objects.get(trial=self.trial)
+        registration.payment_status = "pending"
+
+        # the save and the academy id of its trial, not the whole trial
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertNumQueries(2):
+                registration.save()
+        key = DASHBOARD_CACHE_KEY.format(academy_id=self.academy.id)
+        self.assertIsNotNone(cache.get(key))
 
-# Create your tests here.
+        for callback in callbacks:
+            callback()
+        response = self.client.get(reverse("academy_dashboard"))
+        self.assertEqual(response.data["payments"]["totalReceived"], 0)
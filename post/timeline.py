@@ -0,0 +1,193 @@
+from common.redis_client import get_redis_client
+from django.db.models import Q
+from user_profile import graph
+
+from .models import Post
+
+# Precomputed home timelines (fan-out on write).
+#
+# Every user has a Redis sorted set of post ids scored by creation time. New posts
+# are pushed into the timelines of the author's audience by a Celery task, so the
+# home feed reads one page of ids instead of scanning the Post table per request.
+# A built timeline always contains TIMELINE_MARKER, which tells an empty timeline
+# apart from one that was never built or has expired.
+# Redis orders the posts sharing a score by member, byte by byte, so post ids are
+# stored zero padded to keep that order numeric like the cursor's tie-breaker
+# ("000000000009" < "000000000010", while "9" > "10").
+TIMELINE_KEY = "timeline:v2:{user_id}"
+TIMELINE_LENGTH = 500  # number of post ids kept per user
+TIMELINE_TTL = 60 * 60 * 24 * 7  # drop timelines of users inactive for a week
+TIMELINE_MARKER = "0"  # post ids start at 1, so "0" is never a real post
+MEMBER_WIDTH = 12
+
+
+def timeline_key(user_id):
+    return TIMELINE_KEY.format(user_id=user_id)
+
+
+def timeline_member(post_id):
+    return str(post_id).zfill(MEMBER_WIDTH)
+
+
+def post_score(created_at):
+    """
+    Score used to order a post inside a timeline.
+    """
+    return created_at.timestamp()
+
+
+def audience_ids(user):
+    """
+    Return the ids of every user whose timeline should contain `user`'s posts.
+
+    That is the author, the author's friends and the players following the author.
+    """
+    return list({user.id, *graph.friends_of(user.id), *graph.followers_of(user.id)})
+
+
+def build_timeline(user):
+    """
+    Build the timeline of `user` from the database and store it in Redis.
+
+    Used when the timeline does not exist yet (new user, expired key, Redis flush).
+    """
+    friend_ids = graph.friends_of(user.id)
+    followed_academy_ids = graph.follows_of(user.id)
+    posts = (
+        Post.objects.filter(
+            Q(user=user) | Q(user__in=friend_ids) | Q(user__in=followed_academy_ids)
+        )
+        .order_by("-created_at")
+        .values_list("id", "created_at")[:TIMELINE_LENGTH]
+    )
+
+    key = timeline_key(user.id)
+    mapping = {TIMELINE_MARKER: 0}
+    mapping.update(
+        {
+            timeline_member(post_id): post_score(created_at)
+            for post_id, created_at in posts
+        }
+    )
+
+    pipe = get_redis_client().pipeline()
+    pipe.delete(key)
+    pipe.zadd(key, mapping)
+    pipe.expire(key, TIMELINE_TTL)
+    pipe.execute()
+
+
+def read_timeline(user, limit, after=None):
+    """
+    Return up to `limit + 1` post ids from the timeline of `user`, newest first,
+    together with the total number of posts in the timeline.
+
+    The extra id only tells the caller whether there is a next page.
+
+    Args:
+        user: The user whose timeline is read.
+        limit (int): Page size.
+        after (tuple, optional): (created_at, id) of the last post already
+            returned, only older posts are read.
+    """
+    client = get_redis_client()
+    key = timeline_key(user.id)
+    if not client.exists(key):
+        build_timeline(user)
+
+    pipe = client.pipeline()
+    if after is None:
+        pipe.zrevrange(key, 0, limit)
+    else:
+        # the posts sharing the cursor's score, then the older ones
+        score = post_score(after[0])
+        pipe.zrevrangebyscore(key, score, score)
+        pipe.zrevrangebyscore(key, f"({score}", "(0", start=0, num=limit + 1)
+    pipe.zcard(key)
+    pipe.expire(key, TIMELINE_TTL)
+    results = pipe.execute()
+
+    members = results[0]
+    if after is not None:
+        # same order as Redis: padded members compare like the ids they hold
+        tied = [member for member in results[0] if int(member) < after[1]]
+        members = tied + results[1]
+    post_ids = [
+        int(member) for member in members if member != TIMELINE_MARKER.encode()
+    ]
+    return post_ids[: limit + 1], results[-2] - 1
+
+
+def push_post(post_id, created_at, user_ids):
+    """
+    Add a post to the timelines of `user_ids`.
+
+    Only timelines that already exist are updated, a missing timeline will be
+    built from the database (including this post) on its next read.
+    """
+    client = get_redis_client()
+    keys = [timeline_key(user_id) for user_id in user_ids]
+
+    pipe = client.pipeline()
+    for key in keys:
+        pipe.exists(key)
+    existing = [key for key, exists in zip(keys, pipe.execute()) if exists]
+
+    score = post_score(created_at)
+    pipe = client.pipeline()
+    for key in existing:
+        pipe.zadd(key, {timeline_member(post_id): score})
+        # keep the newest TIMELINE_LENGTH posts plus the marker
+        pipe.zremrangebyrank(key, 1, -(TIMELINE_LENGTH + 1))
+    pipe.execute()
+
+
+def remove_post(post_id, user_ids):
+    """
+    Remove a post from the timelines of `user_ids`.
+    """
+    pipe = get_redis_client().pipeline()
+    for user_id in user_ids:
+        pipe.zrem(timeline_key(user_id), timeline_member(post_id))
+    pipe.execute()
+
+
+def remove_author(user_id, author_id):
+    """
+    Remove every post of `author_id` from the timeline of `user_id`.
+
+    Used after an unfollow or an unfriend.
+    """
+    post_ids = [
+        timeline_member(post_id)
+        for post_id in Post.objects.filter(user=author_id).values_list("id", flat=True)
+    ]
+    if post_ids:
+        get_redis_client().zrem(timeline_key(user_id), *post_ids)
+
+
+def merge_author(user_id, author_id):
+    """
+    Add the recent posts of `author_id` to the timeline of `user_id`.
+
+    Used after a follow or an accepted friend request.
+    """
+    client = get_redis_client()
+    key = timeline_key(user_id)
+    if not client.exists(key):
+        return
+
+    posts = (
+        Post.objects.filter(user=author_id)
+        .order_by("-created_at")
+        .values_list("id", "created_at")[:TIMELINE_LENGTH]
+    )
+    mapping = {
+        timeline_member(post_id): post_score(created_at)
+        for post_id, created_at in posts
+    }
+    if mapping:
+        pipe = client.pipeline()
+        pipe.zadd(key, mapping)
+        pipe.zremrangebyrank(key, 1, -(TIMELINE_LENGTH + 1))
+        pipe.execute()
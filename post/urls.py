@@ -1,11 +1,19 @@
 from django.urls import path
 
-from .views import AcademyDashBoard, PlayerHomePageView, PostViewSet
+from .views import (
+    AcademyDashBoard,
+    CommentRepliesView,
+    PlayerHomePageView,
+    PostStateView,
+    PostViewSet,
+)
 
 handle_like = PostViewSet.as_view({"post": "like"})
 
 add_comment = PostViewSet.as_view({"post": "comment"})
 
+post_comments = PostViewSet.as_view({"get": "comments"})
+
 urlpatterns = [
     path("post", PostViewSet.as_view({"get": "list", "post": "create"}), name="post"),
     path(
@@ -20,8 +28,13 @@ urlpatterns = [
         ),
         name="posts",
     ),
+    path("posts/state", PostStateView.as_view(), name="posts_state"),
     path("like/<int:id>", handle_like, name="like"),
     path("add_comment/<int:id>", add_comment, name="add_comment"),
+    path("post/<int:id>/comments", post_comments, name="post_comments"),
+    path(
+        "comment/<int:id>/replies", CommentRepliesView.as_view(), name="comment_replies"
+    ),
     path("home", PlayerHomePageView.as_view(), name="home"),
     path("academy_dashboard", AcademyDashBoard.as_view(), name="academy_dashboard"),
 ]
@@ -1,15 +1,22 @@
-from datetime import timedelta
-
-from django.db.models import Count, F, Q, Sum
+from common.custom_pagination_class import decode_cursor, encode_cursor
+from common.toggles import toggle
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
 from django.utils import timezone
 from rest_framework import response, status, views, viewsets
 from rest_framework.decorators import action
 from selection_trial.models import PlayersInTrial, Trial
-from user_profile.models import Achievements, Follow
+from user_profile import graph
+from user_profile.models import Achievements
 from users.models import Sport, UserProfile, Users
 
-from .models import Comment, Like, Post
+from . import timeline
+from .comments import comment_page
+from .dashboard import DASHBOARD_CACHE_KEY, DASHBOARD_CACHE_TIMEOUT
+from .models import Comment, Like, Post, TrendingPost
 from .serializers import CommentSerializer, PostSerializer
+from .tasks import remove_post_from_timelines
 
 
 class PostViewSet(viewsets.ModelViewSet):
@@ -59,25 +66,37 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(post)
         return response.Response(serializer.data, status=status.HTTP_200_OK)
 
+    def perform_destroy(self, instance):
+        """
+        Delete the post and trim it out of the timelines it was pushed to.
+        """
+        user_ids = timeline.audience_ids(instance.user)
+        post_id = instance.id
+        super().perform_destroy(instance)
+        remove_post_from_timelines.delay(post_id, user_ids)
+
     @action(detail=True, methods=["POST"])
     def like(self, request, id=None):
         """
-        Return a queryset of posts filtered by profile ID or the current user.
+        Like or unlike a Post, whichever undoes the current state.
+
+        The like row and the counter are toggled together, a double tap cannot
+        create two likes or count one twice.
         """
         try:
-            post = Post.objects.get(id=id)
-            user = request.user
-            if Like.objects.filter(user=user, post=post).exists():
-                like = Like.objects.get(user=user, post=post)
-                like.delete()
+            if not Post.objects.filter(id=id).exists():
+                raise Post.DoesNotExist(f"post {id} does not exist")
+            with transaction.atomic():
+                liked, changed = toggle(Like, user=request.user, post=id)
+                if changed:
+                    Post.objects.filter(id=id).update(
+                        like_count=F("like_count") + (1 if liked else -1)
+                    )
+            if liked:
                 return response.Response(
-                    {"status": "unliked"}, status=status.HTTP_200_OK
+                    {"status": "liked"}, status=status.HTTP_201_CREATED
                 )
-
-            Like.objects.create(user=user, post=post)
-            return response.Response(
-                {"status": "liked"}, status=status.HTTP_201_CREATED
-            )
+            return response.Response({"status": "unliked"}, status=status.HTTP_200_OK)
 
         except Exception as e:
             print(e, "some error in liking")
@@ -107,7 +126,11 @@ class PostViewSet(viewsets.ModelViewSet):
 
             serializer = CommentSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save(user=request.user, post=post, parent=parent)
+                with transaction.atomic():
+                    serializer.save(user=request.user, post=post, parent=parent)
+                    Post.objects.filter(id=post.id).update(
+                        comment_count=F("comment_count") + 1
+                    )
                 return response.Response(
                     serializer.data, status=status.HTTP_201_CREATED
                 )
@@ -119,15 +142,139 @@ class PostViewSet(viewsets.ModelViewSet):
             print(e, "error commenting")
             return response.Response(data=f"{str(e)}", status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=True, methods=["GET"])
+    def comments(self, request, id=None):
+        """
+        Return a page of the top level comments of a Post with their reply counts.
+
+        Pages are requested with the `cursor` parameter returned as `next_cursor`.
+        """
+        if not Post.objects.filter(id=id).exists():
+            return response.Response(
+                {"message": "No post found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            comments, next_cursor = comment_page(
+                Comment.objects.filter(post=id, parent=None),
+                request.query_params.get("cursor", None),
+            )
+        except ValueError:
+            return response.Response(
+                {"message": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return response.Response(
+            {
+                "comments": CommentSerializer(comments, many=True).data,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class CommentRepliesView(views.APIView):
+    """
+    A view to page through the direct replies of a comment.
+    """
+    def get(self, request, id):
+        if not Comment.objects.filter(id=id).exists():
+            return response.Response(
+                {"message": "No comment found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            replies, next_cursor = comment_page(
+                Comment.objects.filter(parent=id),
+                request.query_params.get("cursor", None),
+            )
+        except ValueError:
+            return response.Response(
+                {"message": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return response.Response(
+            {
+                "replies": CommentSerializer(replies, many=True).data,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class PostStateView(views.APIView):
+    """
+    A view to refresh the like state and counters of many posts at once.
+
+    Expects `post_ids`, a list of at most MAX_POSTS post ids, and runs two queries
+    whatever their number. Unknown ids are left out of the response.
+    """
+    MAX_POSTS = 200
+
+    def post(self, request):
+        post_ids = request.data.get("post_ids", None)
+        if not isinstance(post_ids, list) or len(post_ids) > self.MAX_POSTS:
+            return response.Response(
+                {"message": f"post_ids must be a list of at most {self.MAX_POSTS} ids"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            post_ids = {int(post_id) for post_id in post_ids}
+        except (TypeError, ValueError):
+            return response.Response(
+                {"message": "Invalid post id"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        liked = set(
+            Like.objects.filter(user=request.user, post__in=post_ids).values_list(
+                "post_id", flat=True
+            )
+        )
+        posts = Post.objects.filter(id__in=post_ids).values(
+            "id", "like_count", "comment_count"
+        )
+        return response.Response(
+            {
+                "posts": [
+                    {
+                        "id": post["id"],
+                        "likes_count": post["like_count"],
+                        "comment_count": post["comment_count"],
+                        "is_liked_by_current_user": post["id"] in liked,
+                    }
+                    for post in posts
+                ]
+            },
+            status=status.HTTP_200_OK,
+        )
+
 
 class PlayerHomePageView(views.APIView):
     """
     A view to retrieve the homepage data for a player, including posts, trials, and top academies.
+
+    Posts are paginated with an opaque `cursor` (returned as `next_cursor`). The old
+    `page` parameter is still accepted and returns every post up to that page.
     """
+    RECOMMENDED_POSTS = 50  # trending posts mixed into a short feed
+
     def get(self, request):
         user = request.user
-        page = int(request.query_params.get("page", 1))
         posts_per_page = 10
+        cursor = request.query_params.get("cursor", None)
+        legacy_paging = cursor is None and "page" in request.query_params
+        page = int(request.query_params.get("page", 1))
+        after = None
+        if legacy_paging:
+            limit = page * posts_per_page
+        else:
+            limit = posts_per_page
+            if cursor:
+                try:
+                    after = decode_cursor(cursor)
+                except ValueError:
+                    return response.Response(
+                        {"message": "Invalid cursor"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
         user_sports = Sport.objects.filter(user=user).values_list(
             "sport_name", flat=True
         )
@@ -139,41 +286,49 @@ class PlayerHomePageView(views.APIView):
             user_district = None
             user_state = None
 
-        friend_ids = user.friends.values_list("id", flat=True)
-        followed_academy_ids = Follow.objects.filter(player=user).values_list(
-            "academy__id", flat=True
-        )
-
-        personal_posts = Post.objects.filter(
-            Q(user=user) | Q(user__in=friend_ids) | Q(user__in=followed_academy_ids)
-        )
-
-        if personal_posts.count() < posts_per_page:
-            last_week = timezone.now() - timedelta(days=7)
-            recommended_posts = (
-                Post.objects.filter(created_at__gte=last_week)
-                .exclude(id__in=personal_posts)
-                .annotate(engagement=Count("likes") + Count("comments"))
-                .order_by("-engagement")
-            )
+        friend_ids = graph.friends_of(user.id)
+        followed_academy_ids = graph.follows_of(user.id)
 
-            if user_sports:
-                recommended_posts = recommended_posts.filter(
-                    Q(user__sport__sport_name__in=user_sports)
-                    | Q(user__userprofile__state=user_state)
-                    | Q(user__userprofile__district=user_district)
-                )
+        # Read the precomputed timeline, users with too few posts in their
+        # timeline also get recommended posts from the database
+        try:
+            post_ids, timeline_size = timeline.read_timeline(user, limit, after)
+        except Exception as e:
+            print(e, "timeline not available")
+            post_ids, timeline_size = None, 0
 
-            posts = (
-                (personal_posts | recommended_posts).distinct().order_by("-created_at")
+        if post_ids is not None and timeline_size >= posts_per_page:
+            posts_by_id = Post.objects.select_related("user__userprofile").in_bulk(
+                post_ids
             )
+            paginated_posts = [
+                posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id
+            ]
         else:
-            posts = personal_posts.distinct().order_by("-created_at")
-
-        # Pagination
-        start = 0
-        end = ((page - 1) * posts_per_page) + posts_per_page
-        paginated_posts = posts[start:end]
+            posts = self.get_feed_queryset(
+                user,
+                friend_ids,
+                followed_academy_ids,
+                user_sports,
+                user_state,
+                user_district,
+                posts_per_page,
+            )
+            if after:
+                posts = posts.filter(
+                    Q(created_at__lt=after[0])
+                    | Q(created_at=after[0], id__lt=after[1])
+                )
+            paginated_posts = list(posts[: limit + 1])
+
+        # One extra post is read to know whether there is a next page
+        has_more = len(paginated_posts) > limit
+        paginated_posts = paginated_posts[:limit]
+        next_cursor = (
+            encode_cursor(paginated_posts[-1].created_at, paginated_posts[-1].id)
+            if has_more
+            else None
+        )
 
         post_serializer = PostSerializer(
             paginated_posts, many=True, context={"request": request}
@@ -182,7 +337,7 @@ class PlayerHomePageView(views.APIView):
         # User detials for homepage
         user_details = {
             "username": user.username,
-            "friends_count": user.friends.all().count(),
+            "friends_count": len(friend_ids),
             "bio": user.userprofile.bio,
             "post_count": Post.objects.filter(user=user).count(),
             "achievements_count": Achievements.objects.filter(user=user).count(),
@@ -227,48 +382,98 @@ class PlayerHomePageView(views.APIView):
             )
             trials = list(trials) + list(additional_trials)
 
-        return response.Response(
-            {
-                "posts": post_serializer.data,
-                "has_more": posts.count() > end,
-                "page": page + 1,
-                "user": user_details,
-                "trials": trials,
-                "academies": top_academies,
-            },
-            status=status.HTTP_200_OK,
+        data = {
+            "posts": post_serializer.data,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+            "user": user_details,
+            "trials": trials,
+            "academies": top_academies,
+        }
+        if cursor is None:
+            # clients still paging by number read the next page from here
+            data["page"] = page + 1
+        return response.Response(data, status=status.HTTP_200_OK)
+
+    def get_feed_queryset(
+        self,
+        user,
+        friend_ids,
+        followed_academy_ids,
+        user_sports,
+        user_state,
+        user_district,
+        posts_per_page,
+    ):
+        """
+        Build the feed from the database, mixing in the top trending posts
+        when the user has fewer personal posts than one page.
+        """
+        personal_posts = Post.objects.filter(
+            Q(user=user) | Q(user__in=friend_ids) | Q(user__in=followed_academy_ids)
         )
 
+        if personal_posts[:posts_per_page].count() < posts_per_page:
+            trending = TrendingPost.objects.exclude(post__user=user)
+            if user_sports:
+                trending = trending.filter(
+                    Q(sport__in=user_sports)
+                    | Q(state=user_state)
+                    | Q(district=user_district)
+                )
+            # a post has one row per sport of its author, keep its best one
+            trending_ids = (
+                trending.values("post_id")
+                .annotate(best_score=Max("score"))
+                .order_by("-best_score")
+                .values_list("post_id", flat=True)[: self.RECOMMENDED_POSTS]
+            )
+            recommended_posts = Post.objects.filter(id__in=list(trending_ids))
+
+            return (
+                (personal_posts | recommended_posts)
+                .distinct()
+                .order_by("-created_at", "-id")
+            )
+        return personal_posts.distinct().order_by("-created_at", "-id")
+
 
 class AcademyDashBoard(views.APIView):
     """
     A view to retrieve the dashboard data for an academy.
+
+    The dashboard is cached per academy for DASHBOARD_CACHE_TIMEOUT seconds and
+    dropped when a trial, registration or follow of the academy changes
+    (see post.dashboard).
     """
     def get(self, request):
         academy = request.user
+        cache_key = DASHBOARD_CACHE_KEY.format(academy_id=academy.id)
+        dashboard_data = cache.get(cache_key)
+        if dashboard_data is not None:
+            return response.Response(dashboard_data)
+
         today = timezone.now()
 
-        # Trial statistics
-        total_trials = Trial.objects.filter(academy=academy).count()
-        completed_trials = Trial.objects.filter(
-            academy=academy, is_active=True, trial_date__lt=today
-        ).count()
-        upcoming_trials_count = Trial.objects.filter(
-            academy=academy, trial_date__gte=today, is_active=True
-        ).count()
-        cancelled_trails = Trial.objects.filter(
-            academy=academy, is_active=False
-        ).count()
+        # Trial statistics, counted in one query
+        trial_stats = Trial.objects.filter(academy=academy).aggregate(
+            total=Count("id"),
+            completed=Count("id", filter=Q(is_active=True, trial_date__lt=today)),
+            upcoming=Count("id", filter=Q(is_active=True, trial_date__gte=today)),
+            cancelled=Count("id", filter=Q(is_active=False)),
+        )
 
         # Followers and post interactions
-        followers = Follow.objects.filter(academy=academy).count()
+        followers = len(graph.followers_of(academy.id))
 
-        posts = Post.objects.filter(user=academy)
-        likes_count = Like.objects.filter(post__in=posts).count()
-        comments_count = Comment.objects.filter(post__in=posts).count()
-        total_interactions = likes_count + comments_count
+        interactions = Post.objects.filter(user=academy).aggregate(
+            likes=Sum("like_count"), comments=Sum("comment_count")
+        )
+        total_interactions = (interactions["likes"] or 0) + (
+            interactions["comments"] or 0
+        )
 
-        upcoming_trials = (
+        upcoming_trials = list(
             Trial.objects.filter(academy=academy, trial_date__gte=today)
             .order_by("trial_date")[:5]
             .values(
@@ -283,30 +488,21 @@ class AcademyDashBoard(views.APIView):
 
         popular_posts = (
             Post.objects.filter(user=academy)
-            .annotate(likes_count=Count("likes"))
-            .order_by("-likes_count")[:5]
-            .values("content", "likes_count", "id")
+            .order_by("-like_count")[:5]
+            .values("content", "id", likes_count=F("like_count"))
         )
 
-        total_participants = PlayersInTrial.objects.filter(
+        # Participants and revenue, in one query
+        paid = Q(payment_status="confirmed", trial__is_active=True)
+        participant_stats = PlayersInTrial.objects.filter(
             trial__academy=academy
-        ).count()
-
-        total_received_amount = (
-            PlayersInTrial.objects.filter(
-                trial__academy=academy,
-                payment_status="confirmed",
-                trial__is_active=True,
-            ).aggregate(total=Sum("trial__registration_fee"))["total"]
-            or 0
+        ).aggregate(
+            participants=Count("id"),
+            received=Sum("trial__registration_fee", filter=paid),
         )
 
         recent_payments = (
-            PlayersInTrial.objects.filter(
-                trial__academy=academy,
-                payment_status="confirmed",
-                trial__is_active=True,
-            )
+            PlayersInTrial.objects.filter(paid, trial__academy=academy)
             .annotate(
                 player__username=F("player__username"),
                 trial__name=F("trial__name"),
@@ -328,23 +524,24 @@ class AcademyDashBoard(views.APIView):
 
         dashboard_data = {
             "stats": {
-                "totalTrials": total_trials,
-                "completedTrials": completed_trials,
-                "upcomingTrials": upcoming_trials_count,
-                "cancelledTrials": cancelled_trails,
+                "totalTrials": trial_stats["total"],
+                "completedTrials": trial_stats["completed"],
+                "upcomingTrials": trial_stats["upcoming"],
+                "cancelledTrials": trial_stats["cancelled"],
             },
-            "recentTrials": list(upcoming_trials),
+            "recentTrials": upcoming_trials,
             "popularPosts": list(popular_posts),
             "playerEngagement": {
                 "followers": followers,
-                "trialParticipants": total_participants,
+                "trialParticipants": participant_stats["participants"],
                 "postInteractions": total_interactions,
             },
-            "upcomingTrials": list(upcoming_trials),
+            "upcomingTrials": upcoming_trials,
             "payments": {
-                "totalReceived": total_received_amount,
-                "recentPayments": recent_payments,
+                "totalReceived": participant_stats["received"] or 0,
+                "recentPayments": list(recent_payments),
             },
         }
+        cache.set(cache_key, dashboard_data, DASHBOARD_CACHE_TIMEOUT)
 
         return response.Response(dashboard_data)
@@ -1,5 +1,6 @@
 from django.db.models import Q
 from rest_framework import serializers
+from uploads.images import variant_url
 from user_profile.serializers.connection_serializer import FriendListSerializer
 
 from .models import Chat, Notification, Users
@@ -36,7 +37,7 @@ class ChatListUserSerializer(serializers.ModelSerializer):
     def get_profile_photo(self, obj):
         print(obj)
         if hasattr(obj, "userprofile") and obj.userprofile.profile_photo:
-            return obj.userprofile.profile_photo.url
+            return variant_url(obj.userprofile.profile_photo, "thumb")
         return None
 
 
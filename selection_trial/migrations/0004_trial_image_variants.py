@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('selection_trial', '0003_playersintrial_payment_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trial',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
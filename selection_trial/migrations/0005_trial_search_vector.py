@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('selection_trial', '0004_trial_image_variants'),
+        ('users', '0014_users_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trial',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='trial',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='trial_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trial',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='trial_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE selection_trial_trial AS t SET search_vector =
+                setweight(to_tsvector('english', coalesce(t.name, '')), 'A')
+                || setweight(to_tsvector('english', coalesce(t.sport, '')), 'B')
+                || setweight(to_tsvector('english', coalesce(
+                    (SELECT u.username FROM users_users AS u WHERE u.id = t.academy_id),
+                    ''
+                )), 'B')
+                || setweight(to_tsvector('english', coalesce(t.description, '')), 'C')
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
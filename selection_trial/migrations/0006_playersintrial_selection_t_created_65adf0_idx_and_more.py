@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('selection_trial', '0005_trial_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playersintrial',
+            index=models.Index(fields=['created_at'], name='selection_t_created_65adf0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trial',
+            index=models.Index(fields=['created_at'], name='selection_t_created_f49362_idx'),
+        ),
+    ]
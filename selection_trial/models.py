@@ -1,7 +1,11 @@
 import random
 
 from common.base_models import DataBaseModels
+from common.search import weighted_vector
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Value
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from users.models import Users
@@ -27,8 +31,11 @@ class Trial(DataBaseModels):
         is_registration_fee (bool): Whether there is a registration fee.
         registration_fee (int): The amount of the registration fee.
         image (ImageField): An image associated with the trial.
+        image_variants (JSONField): Resized copies of the image, filled in by the uploads app.
         description (TextField): A description of the trial.
         is_active (bool): Whether the trial is currently active.
+        search_vector (SearchVectorField): Name, sport, academy and description for
+            full text search, kept current by `update_trial_search_vector`.
     """
 
     academy = models.ForeignKey(
@@ -48,13 +55,37 @@ class Trial(DataBaseModels):
     is_registration_fee = models.BooleanField(default=True)
     registration_fee = models.IntegerField(null=True, blank=True)
     image = models.ImageField(upload_to="images/", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
     description = models.TextField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"]),
+            GinIndex(fields=["search_vector"], name="trial_search_vector_idx"),
+            GinIndex(
+                fields=["name"], name="trial_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name + " " + self.academy.username
 
 
+def trial_search_vector(academy_username):
+    """
+    Search vector of a trial, the academy username is passed in as it lives in
+    another table.
+    """
+    return weighted_vector(
+        ("name", "A"),
+        ("sport", "B"),
+        (Value(academy_username or ""), "B"),
+        ("description", "C"),
+    )
+
+
 class TrialRequirement(DataBaseModels):
     """
     Model representing additional requirements for a trial.
@@ -109,6 +140,9 @@ class PlayersInTrial(DataBaseModels):
     achievement = models.CharField(max_length=255, null=True, blank=True)
     payment_status = models.CharField(max_length=20, null=True, blank=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["created_at"])]
+
     def __str__(self) -> str:
         return self.name + " " + self.trial.name
 
@@ -162,3 +196,14 @@ def create_unique_id_on_joining_trials(sender, instance, created, *args, **kwarg
             instance.name.replace(" ", "") + str(instance.id) + str(num)
         )
         instance.save()
+
+
+@receiver(post_save, sender=Trial)
+def update_trial_search_vector(sender, instance, *args, **kwargs):
+    """
+    Signal to refresh the search vector of a trial whenever it is saved.
+    """
+    academy_username = instance.academy.username if instance.academy_id else None
+    Trial.objects.filter(pk=instance.pk).update(
+        search_vector=trial_search_vector(academy_username)
+    )
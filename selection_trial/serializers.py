@@ -1,6 +1,8 @@
+from django.db import transaction
 from real_time.task import send_notification
 from rest_framework import serializers
-from user_profile.models import Follow
+from uploads.fields import DirectUploadSerializerMixin, VariantImageField
+from user_profile import graph
 from user_profile.serializers.useracademy_serializer import \
     AcademyDetailSerialiezer
 
@@ -19,7 +21,7 @@ class TrialRequirementSerializer(serializers.ModelSerializer):
         fields = ["requirement"]
 
 
-class TrialSerializer(serializers.ModelSerializer):
+class TrialSerializer(DirectUploadSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Trial model.
 
@@ -43,6 +45,9 @@ class TrialSerializer(serializers.ModelSerializer):
         source="academy", read_only=True, required=False
     )
     player_count = serializers.IntegerField(read_only=True, required=False)
+    image = VariantImageField(
+        variant="medium", target="trial_image", required=False, allow_null=True
+    )
 
     class Meta:
         model = Trial
@@ -75,20 +80,22 @@ class TrialSerializer(serializers.ModelSerializer):
         requirement_data = validated_data.pop("additionalRequirements", [])
         user = self.context["request"].user
         validated_data.pop("is_active", None)
-        trial = Trial.objects.create(academy=user, is_active=True, **validated_data)
+        with transaction.atomic():
+            self.claim_direct_uploads(validated_data)
+            trial = Trial.objects.create(academy=user, is_active=True, **validated_data)
 
-        # Add additional requirements to the TrialRequirement model.
-        for requirement in requirement_data:
-            if requirement:
-                TrialRequirement.objects.create(trial=trial, requirement=requirement)
+            # Add additional requirements to the TrialRequirement model.
+            for requirement in requirement_data:
+                if requirement:
+                    TrialRequirement.objects.create(
+                        trial=trial, requirement=requirement
+                    )
 
         # send notification to all users following this academy
         notification_type = "new_trial"
         text = f"{user.username} added a new Trial"
         link = f"/trial_details/{trial.id}"
-        receivers_list = list(
-            Follow.objects.filter(academy=user).values_list("player__id", flat=True)
-        )
+        receivers_list = list(graph.followers_of(user.id))
 
         send_notification.delay(notification_type, text, link, user.id, receivers_list)
         return trial
@@ -1,3 +1,67 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import Users
+
+from .models import Trial
+
+
+class TrialSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.player = Users.objects.create_user(
+            email="player@example.com", username="player", password="testpass123"
+        )
+        token = RefreshToken.for_user(self.player).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.academy = Users.objects.create_user(
+            email="academy@example.com",
+            username="Kerala Blasters",
+            password="testpass123",
+            is_academy=True,
+        )
+        self.trial_date = timezone.localdate() + timedelta(days=10)
+        Trial.objects.create(
+            academy=self.academy,
+            name="Football selection",
+            sport="Football",
+            description="Open trial for strikers",
+            trial_date=self.trial_date,
+        )
+
+    def names(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [trial["name"] for trial in response.data["results"]]
+
+    def test_search_matches_description_and_academy(self):
+        self.assertEqual(
+            self.names(self.client.get("/trial", {"search": "striker"})),
+            ["Football selection"],
+        )
+        self.assertEqual(
+            self.names(self.client.get("/trial", {"search": "blasters"})),
+            ["Football selection"],
+        )
+
+    def test_search_results_are_cached_until_a_trial_changes(self):
+        self.client.get("/trial", {"search": "football"})
+        with self.assertNumQueries(1):  # auth
+            response = self.client.get("/trial", {"search": " Football"})
+        self.assertEqual(self.names(response), ["Football selection"])
 
-# Create your tests here.
+        with self.captureOnCommitCallbacks(execute=True):
+            Trial.objects.create(
+                academy=self.academy,
+                name="Football camp",
+                trial_date=self.trial_date,
+            )
+        self.assertCountEqual(
+            self.names(self.client.get("/trial", {"search": "football"})),
+            ["Football selection", "Football camp"],
+        )
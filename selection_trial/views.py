@@ -4,9 +4,10 @@ import stripe.error
 from common.custom_pagination_class import StandardResultsSetPagination
 from common.custom_permission_classes import (IsAcademy, IsAdmin, IsPlayer,
                                               IsUser)
+from common.search import cached_search, normalize_query, search
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Count, Q
+from django.db.models import Count
 from rest_framework import generics, response, status, viewsets
 
 from .models import PlayersInTrial, Trial
@@ -65,12 +66,8 @@ class TrialViewSet(viewsets.ModelViewSet):
         academy_id = self.request.query_params.get("id", None)
 
         if search_term:
-            queryset = queryset.filter(
-                Q(name__icontains=search_term)
-                | Q(description__icontains=search_term)
-                | Q(academy__username__icontains=search_term)
-                | Q(sport__icontains=search_term)
-            )
+            # name, description, academy and sport, best matches first
+            queryset = search(queryset, search_term, "name")
 
         if sport:
             queryset = queryset.filter(sport=sport)
@@ -83,7 +80,8 @@ class TrialViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(is_registration_fee=payment)
 
         if user.is_staff:
-            queryset = queryset.order_by("id")
+            if not search_term:
+                queryset = queryset.order_by("id")
             self.pagination_class = StandardResultsSetPagination
             return queryset
 
@@ -104,6 +102,33 @@ class TrialViewSet(viewsets.ModelViewSet):
         ).select_related("academy")
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """
+        List trials, searches are served from the search cache.
+
+        A search result only depends on the query params and on the role of the
+        user (academies see their own trials), see common.search.cached_search.
+        """
+        if not request.query_params.get("search", None):
+            return super().list(request, *args, **kwargs)
+
+        user = request.user
+        if user.is_staff:
+            scope = "staff"
+        elif user.is_academy:
+            scope = f"academy:{user.id}"
+        else:
+            scope = "player"
+        params = {key: request.query_params.get(key) for key in request.query_params}
+        params["search"] = normalize_query(params["search"])
+        data = cached_search(
+            "trials",
+            ["trials", "users"],
+            {"params": params, "scope": scope, "host": request.get_host()},
+            lambda: super(TrialViewSet, self).list(request, *args, **kwargs).data,
+        )
+        return response.Response(data)
+
     def retrieve(self,request, id):
         """
         Retrieve a specific trial by its ID.
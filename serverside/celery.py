@@ -14,6 +14,8 @@ app.conf.update(timezone="Asia/Kolkata")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks()
+# some apps keep their tasks in task.py
+app.autodiscover_tasks(related_name="task")
 
 
 @app.task(bind=True)
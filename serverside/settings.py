@@ -1,6 +1,7 @@
 import os
 from datetime import timedelta
 from pathlib import Path
+from celery.schedules import crontab
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -24,6 +25,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "rest_framework_simplejwt.token_blacklist",
@@ -37,6 +39,8 @@ INSTALLED_APPS = [
     "selection_trial",
     "post",
     "real_time",
+    "uploads",
+    "admin.apps.AdminConfig",
 ]
 
 AUTH_USER_MODEL = "users.Users"
@@ -121,6 +125,25 @@ if DEBUG:
 else:
     MEDIA_ROOT = "/app/media/"
 
+# uploads are stored once per content, see uploads.storage
+STORAGES = {
+    "default": {"BACKEND": "uploads.storage.ContentAddressedStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
+
+# With a bucket configured, uploads go to an S3 compatible object storage (AWS S3,
+# MinIO) and clients upload directly with presigned urls, see uploads.direct
+AWS_STORAGE_BUCKET_NAME = os.environ.get("AWS_STORAGE_BUCKET_NAME")
+if AWS_STORAGE_BUCKET_NAME:
+    AWS_S3_ENDPOINT_URL = os.environ.get("AWS_S3_ENDPOINT_URL")
+    AWS_S3_REGION_NAME = os.environ.get("AWS_S3_REGION_NAME")
+    AWS_S3_SIGNATURE_VERSION = "s3v4"
+    AWS_S3_FILE_OVERWRITE = False
+    AWS_QUERYSTRING_AUTH = False  # media is public, like /media/ on disk
+    STORAGES["default"] = {"BACKEND": "uploads.storage.DirectUploadStorage"}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -219,6 +242,46 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_SERIALIZER = "json"
 CELERY_TIMEZONE = "Asia/Kolkata"
 
+# Periodic tasks run by celery beat
+# image processing and upload finalizing run on their own worker, see the
+# celery-media service
+CELERY_TASK_ROUTES = {
+    "uploads.tasks.generate_image_variants": {"queue": "media"},
+    "uploads.tasks.finalize_upload": {"queue": "media"},
+}
+
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-post-counters": {
+        "task": "post.tasks.reconcile_post_counters",
+        "schedule": crontab(minute=30, hour=3),
+    },
+    "expire-upload-sessions": {
+        "task": "uploads.tasks.expire_upload_sessions",
+        "schedule": crontab(minute=0),
+    },
+    "expire-direct-uploads": {
+        "task": "uploads.tasks.expire_direct_uploads",
+        "schedule": crontab(minute=30),
+    },
+    "rebuild-trending-posts": {
+        "task": "post.tasks.rebuild_trending_posts",
+        "schedule": crontab(minute="*/5"),
+    },
+    "rebuild-friend-suggestions": {
+        "task": "user_profile.tasks.rebuild_friend_suggestions",
+        "schedule": crontab(minute=0, hour=4),
+    },
+    "rollup-daily-metrics": {
+        "task": "admin.task.rollup_daily_metrics",
+        "schedule": crontab(minute="*/15"),
+    },
+    "recount-daily-metrics": {
+        "task": "admin.task.rollup_daily_metrics",
+        "schedule": crontab(minute=45, hour=2),
+        "kwargs": {"full": True},
+    },
+}
+
 
 # Google OAuth settings
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
@@ -15,7 +15,7 @@ urlpatterns = [
     path("", include("selection_trial.urls")),
     path("", include("post.urls")),
     path("", include("real_time.urls")),
+    path("", include("uploads.urls")),
 ]
 
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,93 @@
+import os
+import uuid
+from datetime import timedelta
+
+from common.toggles import delete_returning
+from django.core.files.storage import default_storage
+
+from .models import DirectUpload
+from .serializers import MAX_UPLOAD_SIZE
+from .storage import PRESIGNED_URL_TTL
+
+MAX_IMAGE_SIZE = 20 * 1024 * 1024
+MAX_LICENSE_SIZE = 10 * 1024 * 1024
+
+# What files can be uploaded directly to the object storage: the folder of the
+# model field they end up in, the accepted content types (a type ending with "/"
+# accepts the whole family) and the largest accepted size, which the storage
+# enforces with the upload policy.
+DIRECT_UPLOAD_TARGETS = {
+    "post_image": ("post_images/", ["image/"], MAX_IMAGE_SIZE),
+    "post_video": ("post_vidoes/", ["video/"], MAX_UPLOAD_SIZE),
+    "trial_image": ("images/", ["image/"], MAX_IMAGE_SIZE),
+    "license": ("images/", ["application/pdf", "image/"], MAX_LICENSE_SIZE),
+}
+# served from the public bucket they could run scripts in the site's name
+BLOCKED_CONTENT_TYPES = {"image/svg+xml"}
+# keys not claimed by then are deleted with their object
+DIRECT_UPLOAD_TTL = timedelta(seconds=PRESIGNED_URL_TTL) + timedelta(hours=1)
+
+
+def direct_uploads_enabled():
+    return hasattr(default_storage, "presigned_post")
+
+
+def content_type_allowed(target, content_type):
+    content_type = content_type.lower()
+    if content_type in BLOCKED_CONTENT_TYPES:
+        return False
+    return any(
+        content_type.startswith(accepted) if accepted.endswith("/")
+        else content_type == accepted
+        for accepted in DIRECT_UPLOAD_TARGETS[target][1]
+    )
+
+
+def issue_direct_upload(user, target, filename, content_type):
+    """
+    Reserve an object key for `target` and return it with a presigned POST
+    upload limited to `content_type` and to the size accepted for `target`.
+
+    Args:
+        user (Users): The uploader, None for uploads made during signup.
+        target (str): One of DIRECT_UPLOAD_TARGETS.
+        filename (str): Original name of the file, only its extension is kept.
+        content_type (str): Content type the client will upload with.
+
+    Returns:
+        tuple: (key, {"url", "fields"}) the client POSTs the fields and the file to.
+    """
+    folder, _, max_size = DIRECT_UPLOAD_TARGETS[target]
+    extension = os.path.splitext(filename)[1].lower()
+    key = f"{folder}{uuid.uuid4().hex}{extension}"
+    DirectUpload.objects.create(user=user, key=key, target=target)
+    return key, default_storage.presigned_post(key, content_type, max_size)
+
+
+def _uploader(user):
+    return user if user and user.is_authenticated else None
+
+
+def direct_upload_ready(user, key, target):
+    """
+    Check that `key` was issued to `user` for `target`, is not claimed yet and
+    that its file has been uploaded.
+    """
+    issued = DirectUpload.objects.filter(
+        user=_uploader(user), key=key, target=target
+    ).exists()
+    return issued and default_storage.exists(key)
+
+
+def claim_direct_upload(user, key, target):
+    """
+    Accept `key` as the file of a `target` field if it was issued to `user`. A
+    key can only be claimed once, claim it in the transaction that saves the
+    file field so a failed save leaves it to be submitted again.
+
+    Returns:
+        bool: True if the key was claimed.
+    """
+    return bool(
+        delete_returning(DirectUpload, user=_uploader(user), key=key, target=target)
+    )
@@ -0,0 +1,90 @@
+from django.db import transaction
+from rest_framework import serializers
+
+from .direct import claim_direct_upload, direct_upload_ready
+from .images import variant_url
+
+
+def request_user(context):
+    request = context.get("request", None)
+    return request.user if request else None
+
+
+class DirectUploadMixin:
+    """
+    Mixin for file fields that also accept the object key of a file uploaded
+    with a presigned url (see uploads.direct) in place of the file itself.
+
+    Args:
+        target (str, optional): The DIRECT_UPLOAD_TARGETS entry keys are issued for.
+            Keys are not accepted when it is not set.
+    """
+    def __init__(self, *args, target=None, **kwargs):
+        self.target = target
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if self.target and isinstance(data, str) and data:
+            # only checked here, DirectUploadSerializerMixin claims it on save
+            if not direct_upload_ready(request_user(self.context), data, self.target):
+                raise serializers.ValidationError("Unknown or missing upload.")
+            return data
+        return super().to_internal_value(data)
+
+
+class DirectUploadSerializerMixin:
+    """
+    Mixin for model serializers with direct upload fields.
+
+    The keys passed to those fields are claimed by `claim_direct_uploads`, which
+    `create` implementations call in the transaction that writes the instance
+    (`update` does it here), so a key is only used up by a successful save.
+    """
+    def claim_direct_uploads(self, validated_data):
+        """
+        Claim the direct upload keys in `validated_data`.
+
+        Raises:
+            ValidationError: If a key was claimed by another request meanwhile.
+        """
+        user = request_user(self.context)
+        for name, field in self.fields.items():
+            if not isinstance(field, DirectUploadMixin) or not field.target:
+                continue
+            key = validated_data.get(field.source, None)
+            if not isinstance(key, str):
+                continue
+            if not claim_direct_upload(user, key, field.target):
+                raise serializers.ValidationError({name: "Unknown or missing upload."})
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self.claim_direct_uploads(validated_data)
+            return super().update(instance, validated_data)
+
+
+class DirectUploadFileField(DirectUploadMixin, serializers.FileField):
+    """
+    FileField that accepts a direct upload key.
+    """
+
+
+class VariantImageField(DirectUploadMixin, serializers.ImageField):
+    """
+    ImageField that represents an image by the url of one of its resized variants.
+
+    Args:
+        variant (str): The variant to return ("thumb", "medium" or "full").
+    """
+    def __init__(self, variant="thumb", **kwargs):
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = variant_url(value, self.variant)
+        request = self.context.get("request", None)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
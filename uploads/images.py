@@ -0,0 +1,101 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+# Image fields that get resized variants, by model label. The variants of every
+# field are stored in the `image_variants` JSON field of the same model:
+#   {"profile_photo": {"source": "images/a.jpg", "thumb": "variants/...", ...}}
+IMAGE_FIELDS = {
+    "post.Post": ["image"],
+    "users.UserProfile": ["profile_photo", "cover_photo"],
+    "selection_trial.Trial": ["image"],
+    "user_profile.Achievements": ["image"],
+}
+
+# longest side of every variant in pixels, smallest first
+VARIANT_SIZES = {
+    "thumb": 160,
+    "medium": 640,
+    "full": 1600,
+}
+VARIANTS_DIR = "variants"
+
+if features.check("webp"):
+    VARIANT_FORMAT, VARIANT_EXTENSION = "WEBP", "webp"
+else:
+    VARIANT_FORMAT, VARIANT_EXTENSION = "JPEG", "jpg"
+
+
+def needs_variants(instance, field_name):
+    """
+    Check if the image in `field_name` has no variants yet (new or replaced image).
+    """
+    image = getattr(instance, field_name)
+    recorded = (instance.image_variants or {}).get(field_name, {})
+    return bool(image) and recorded.get("source") != image.name
+
+
+def make_variants(image_file):
+    """
+    Create the resized variants of an image and save them to the default storage.
+
+    The image is rotated according to its EXIF orientation and saved without any
+    metadata, so location and camera details are stripped from the copies.
+
+    Args:
+        image_file (FieldFile): The uploaded image.
+
+    Returns:
+        dict: The source name and the storage path of every variant.
+    """
+    with image_file.open("rb") as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    if VARIANT_FORMAT == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    stem = os.path.splitext(os.path.basename(image_file.name))[0]
+    variants = {"source": image_file.name}
+    for name, size in VARIANT_SIZES.items():
+        variant = image.copy()
+        variant.thumbnail((size, size))
+        buffer = BytesIO()
+        variant.save(buffer, VARIANT_FORMAT, quality=80)
+        variants[name] = default_storage.save(
+            f"{VARIANTS_DIR}/{stem}_{name}.{VARIANT_EXTENSION}",
+            ContentFile(buffer.getvalue()),
+        )
+    return variants
+
+
+def variant_path(image_variants, field_name, source_name, size):
+    """
+    Return the storage path of the `size` variant of an image, or `source_name`
+    when its variants are not ready yet.
+
+    Works on raw values so it can also be used with `.values()` querysets.
+    """
+    variants = (image_variants or {}).get(field_name, {})
+    if variants.get("source") == source_name and size in variants:
+        return variants[size]
+    return source_name
+
+
+def variant_url(image_file, size):
+    """
+    Return the url of the `size` variant of `image_file`, falling back to the
+    original image.
+    """
+    return default_storage.url(
+        variant_path(
+            image_file.instance.image_variants,
+            image_file.field.name,
+            image_file.name,
+            size,
+        )
+    )
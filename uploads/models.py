@@ -0,0 +1,113 @@
+import os
+import uuid
+
+from common.base_models import DataBaseModels
+from django.conf import settings
+from django.db import models
+from users.models import Users
+
+UPLOAD_SESSION_DIR = "upload_sessions"  # partial uploads, inside MEDIA_ROOT
+
+
+class StoredFile(DataBaseModels):
+    """
+    Model representing a file kept by the content addressed storage.
+
+    Files are stored once per content, every upload of the same bytes adds a
+    reference instead of a new copy, and the file is removed when the last
+    reference is deleted.
+
+    Fields:
+    - digest: SHA-256 of the file content.
+    - name: Storage path of the file.
+    - size: Size of the file in bytes.
+    - ref_count: Number of uploads currently pointing to the file.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.ref_count} references)"
+
+
+class UploadSession(DataBaseModels):
+    """
+    Model representing a resumable upload sent in chunks.
+
+    Chunks are appended to a partial file until `offset` reaches `size`, then the
+    session is finalized into a Post by a background task.
+
+    Fields:
+    - id: Random identifier of the session, used in its urls.
+    - user: Foreign key to the Users model representing the uploader.
+    - filename: Original name of the file.
+    - size: Total size of the file in bytes.
+    - offset: Number of bytes received so far.
+    - checksum: Optional SHA-256 of the whole file, verified when finalizing.
+    - status: uploading, then finalizing once finalize is requested, and
+      finalized or failed when the task is done.
+    - content: Text of the post, sent with the finalize request.
+    - post: The created post once finalized.
+    """
+    UPLOADING = "uploading"
+    FINALIZING = "finalizing"
+    FINALIZED = "finalized"
+    FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (UPLOADING, "Uploading"),
+        (FINALIZING, "Finalizing"),
+        (FINALIZED, "Finalized"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        Users, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, null=True, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=UPLOADING
+    )
+    content = models.TextField(blank=True, default="")
+    post = models.ForeignKey(
+        "post.Post", on_delete=models.SET_NULL, null=True, blank=True
+    )
+
+    def __str__(self) -> str:
+        return f"{self.filename} {self.offset}/{self.size} by {self.user_id}"
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.MEDIA_ROOT, UPLOAD_SESSION_DIR, f"{self.id}.part")
+
+
+class DirectUpload(DataBaseModels):
+    """
+    Model representing an object key handed out with a presigned upload url.
+
+    The client uploads the file straight to the object storage and sends the key
+    instead of the file, the key is accepted once, by the user it was issued to.
+
+    Fields:
+    - user: Foreign key to the Users model, empty for uploads made before signup.
+    - key: Object key the file is uploaded to.
+    - target: What the file is uploaded for, one of DIRECT_UPLOAD_TARGETS.
+    """
+    user = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="direct_uploads",
+    )
+    key = models.CharField(max_length=255, unique=True)
+    target = models.CharField(max_length=50)
+
+    def __str__(self) -> str:
+        return f"{self.target} upload {self.key}"
@@ -0,0 +1,43 @@
+from rest_framework import serializers
+
+from .models import UploadSession
+
+MAX_UPLOAD_SIZE = 1024 * 1024 * 1024  # 1 GB
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for UploadSession model.
+
+    `filename`, `size` and the optional `checksum` are sent when starting an
+    upload, `offset` tells the client where to resume and `status` / `post`
+    how finalizing went.
+    """
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "filename",
+            "size",
+            "offset",
+            "checksum",
+            "status",
+            "post",
+            "created_at",
+        ]
+        read_only_fields = ["id", "offset", "status", "post", "created_at"]
+
+    def validate_size(self, value):
+        if value <= 0 or value > MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f"size must be between 1 and {MAX_UPLOAD_SIZE} bytes"
+            )
+        return value
+
+    def validate_checksum(self, value):
+        value = value.lower() if value else None
+        if value and (
+            len(value) != 64 or any(char not in "0123456789abcdef" for char in value)
+        ):
+            raise serializers.ValidationError("checksum must be a SHA-256 hex digest")
+        return value
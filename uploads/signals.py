@@ -0,0 +1,33 @@
+from functools import partial
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from .images import IMAGE_FIELDS, needs_variants
+from .tasks import generate_image_variants
+
+
+def queue_image_variants(sender, instance, **kwargs):
+    """
+    Queue the creation of variants for every new or replaced image of `instance`
+    once the upload is committed.
+    """
+    for field_name in IMAGE_FIELDS[sender._meta.label]:
+        if needs_variants(instance, field_name):
+            transaction.on_commit(
+                partial(
+                    generate_image_variants.delay,
+                    sender._meta.label,
+                    instance.pk,
+                    field_name,
+                )
+            )
+
+
+for model_label in IMAGE_FIELDS:
+    post_save.connect(
+        queue_image_variants,
+        sender=apps.get_model(model_label),
+        dispatch_uid=f"image_variants_{model_label}",
+    )
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import tempfile
+
+from common.toggles import insert_ignore
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+from .models import StoredFile
+
+CONTENT_DIR = "objects"
+PRESIGNED_URL_TTL = 15 * 60  # seconds a presigned upload url stays valid
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files by the SHA-256 of their content.
+
+    Uploads are hashed while they are streamed to a temporary file. An upload
+    whose content is already stored only adds a reference to the existing file,
+    and a file is removed when its last reference is deleted. Since a name
+    always maps to the same bytes, stored files never change.
+
+    Files saved before this storage was enabled keep their names and are
+    deleted directly.
+    """
+    def get_available_name(self, name, max_length=None):
+        # the final name is derived from the content in _save
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(CONTENT_DIR), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path(CONTENT_DIR), suffix=".upload")
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, "wb") as temp_file:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+
+            digest = digest.hexdigest()
+            name = f"{CONTENT_DIR}/{digest[:2]}/{digest}{extension}"
+            full_path = self.path(name)
+            # reference first, so a concurrent delete of the last reference
+            # either keeps the file or finishes before it is checked below
+            self.add_reference(digest, name, size)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def add_reference(self, digest, name, size):
+        """
+        Count one more upload of the file `digest`.
+        """
+        if StoredFile.objects.filter(digest=digest).update(
+            ref_count=F("ref_count") + 1
+        ):
+            return
+        if insert_ignore(StoredFile, digest=digest, name=name, size=size, ref_count=1):
+            return
+        # created by a concurrent upload of the same content
+        StoredFile.objects.filter(digest=digest).update(ref_count=F("ref_count") + 1)
+
+    def delete(self, name):
+        """
+        Drop one reference to the file `name`, removing the file with the last one.
+        """
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is not None and stored.ref_count > 1:
+                StoredFile.objects.filter(id=stored.id).update(
+                    ref_count=F("ref_count") - 1
+                )
+                return
+            if stored is not None:
+                stored.delete()
+            # removed while the row is locked, see _save
+            super().delete(name)
+
+
+class DirectUploadStorage(S3Storage):
+    """
+    S3 compatible object storage (AWS S3, MinIO) that clients can upload to
+    directly with presigned POST policies, so uploads do not pass through Django.
+
+    Configured with the AWS_* settings of django-storages.
+    """
+    def presigned_post(
+        self, name, content_type, max_size, expires_in=PRESIGNED_URL_TTL
+    ):
+        """
+        Return the url and form fields the client POSTs the file `name` with,
+        without credentials. The policy only accepts `content_type` and files of
+        at most `max_size` bytes.
+        """
+        return self.connection.meta.client.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=self._normalize_name(clean_name(name)),
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_size],
+            ],
+            ExpiresIn=expires_in,
+        )
@@ -0,0 +1,166 @@
+import hashlib
+import os
+from datetime import timedelta
+
+from celery import shared_task
+from common.toggles import delete_returning
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from post.models import Post
+from post.serializers import announce_post
+
+from .direct import DIRECT_UPLOAD_TTL
+from .images import VARIANT_SIZES, make_variants, needs_variants
+from .models import DirectUpload, UploadSession
+
+UPLOAD_SESSION_TTL = timedelta(days=1)  # abandoned uploads are dropped after this
+READ_SIZE = 64 * 1024
+
+
+def file_sha256(path):
+    """
+    Return the SHA-256 hex digest of the file at `path`, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def remove_partial_file(session):
+    if os.path.exists(session.temp_path):
+        os.remove(session.temp_path)
+
+
+@shared_task(bind=True)
+def generate_image_variants(self, model_label, pk, field_name):
+    """
+    Create the resized variants of an uploaded image and record them on its model.
+
+    Routed to the `media` queue, which is consumed by a separate prefork worker so
+    image processing never runs in the web workers.
+
+    Args:
+        model_label (str): Label of the model, e.g. "post.Post".
+        pk (int): Primary key of the instance.
+        field_name (str): Name of the image field.
+    """
+    model = apps.get_model(model_label)
+    try:
+        instance = model.objects.get(pk=pk)
+        if not needs_variants(instance, field_name):
+            return
+        variants = make_variants(getattr(instance, field_name))
+    except model.DoesNotExist:
+        print(f"{model_label} {pk} deleted before creating image variants")
+        return
+    except (OSError, ValueError) as e:
+        # unreadable or missing image, retrying would not help
+        print(e, "error creating image variants")
+        return
+
+    stale = variants
+    with transaction.atomic():
+        instance = model.objects.select_for_update().filter(pk=pk).first()
+        # the image may have been replaced while the variants were created
+        if instance and getattr(instance, field_name).name == variants["source"]:
+            image_variants = dict(instance.image_variants or {})
+            stale = image_variants.get(field_name, {})
+            image_variants[field_name] = variants
+            model.objects.filter(pk=pk).update(image_variants=image_variants)
+
+    for name in VARIANT_SIZES:
+        if name in stale:
+            default_storage.delete(stale[name])
+
+
+@shared_task
+def finalize_upload(session_id):
+    """
+    Turn a resumable upload whose finalize was requested into a Post.
+
+    Routed to the `media` queue with the image variants, so verifying and
+    storing files of up to MAX_UPLOAD_SIZE never runs in the web workers. The
+    session ends up finalized with its post, or failed, and the client reads
+    the outcome from the session.
+
+    Args:
+        session_id (str): ID of an UploadSession in the finalizing status.
+    """
+    session = (
+        UploadSession.objects.select_related("user")
+        .filter(id=session_id, status=UploadSession.FINALIZING)
+        .first()
+    )
+    if session is None:
+        return
+
+    post = None
+    try:
+        if session.checksum and file_sha256(session.temp_path) != session.checksum:
+            print(f"upload {session_id} does not match its checksum")
+        else:
+            with open(session.temp_path, "rb") as part:
+                post = Post.objects.create(
+                    user=session.user,
+                    content=session.content,
+                    video=File(part, name=session.filename),
+                )
+            announce_post(post)
+    except OSError as e:
+        print(e, "error finalizing upload")
+
+    UploadSession.objects.filter(id=session.id).update(
+        status=UploadSession.FINALIZED if post else UploadSession.FAILED,
+        post=post,
+        updated_at=timezone.now(),
+    )
+    remove_partial_file(session)
+
+
+@shared_task
+def expire_upload_sessions():
+    """
+    Periodic task that deletes resumable uploads not touched for
+    UPLOAD_SESSION_TTL together with their partial files.
+
+    Returns:
+        int: The number of deleted sessions.
+    """
+    expired = UploadSession.objects.filter(
+        updated_at__lt=timezone.now() - UPLOAD_SESSION_TTL
+    )
+    count = 0
+    for session in expired:
+        remove_partial_file(session)
+        session.delete()
+        count += 1
+    print(f"expired {count} upload sessions")
+    return count
+
+
+@shared_task
+def expire_direct_uploads():
+    """
+    Periodic task that deletes the direct upload keys not claimed within
+    DIRECT_UPLOAD_TTL and the files uploaded to them, so abandoned uploads do
+    not stay on the public bucket.
+
+    Returns:
+        int: The number of expired keys.
+    """
+    expired = DirectUpload.objects.filter(
+        created_at__lt=timezone.now() - DIRECT_UPLOAD_TTL
+    ).values_list("key", flat=True)
+    count = 0
+    for key in expired.iterator():
+        # a key claimed meanwhile is kept, and so is its file
+        if delete_returning(DirectUpload, key=key):
+            default_storage.delete(key)
+            count += 1
+    print(f"expired {count} direct uploads")
+    return count
@@ -0,0 +1,344 @@
+import base64
+import hashlib
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+import boto3
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from moto import mock_aws
+from PIL import Image
+from post.models import Post
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import Users
+
+from .direct import DIRECT_UPLOAD_TTL, MAX_IMAGE_SIZE
+from .images import VARIANT_SIZES, variant_url
+from .models import DirectUpload, StoredFile, UploadSession
+from .tasks import expire_direct_uploads, finalize_upload, generate_image_variants
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_upload(name="photo.jpg", size=(2000, 1000)):
+    exif = Image.Exif()
+    exif[0x010F] = "camera maker"
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "JPEG", exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageVariantTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = Users.objects.create_user(
+            email="player@example.com", username="player", password="testpass123"
+        )
+
+    def test_variants_are_queued_and_recorded(self):
+        with patch.object(generate_image_variants, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(user=self.user, image=image_upload())
+        delay.assert_called_once_with("post.Post", post.id, "image")
+
+        # run the queued task here, the media worker runs it in production
+        generate_image_variants(*delay.call_args.args)
+        post.refresh_from_db()
+
+        variants = post.image_variants["image"]
+        self.assertEqual(variants["source"], post.image.name)
+        for name, size in VARIANT_SIZES.items():
+            with default_storage.open(variants[name]) as variant:
+                image = Image.open(variant)
+                self.assertEqual(max(image.size), size)
+                self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(
+            variant_url(post.image, "thumb"), default_storage.url(variants["thumb"])
+        )
+
+    def test_replaced_image_falls_back_to_original(self):
+        post = Post.objects.create(user=self.user, image=image_upload())
+        generate_image_variants("post.Post", post.id, "image")
+        post.refresh_from_db()
+        post.image = image_upload("new.jpg", size=(300, 300))
+        post.save()
+
+        self.assertEqual(variant_url(post.image, "thumb"), post.image.url)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ServeMediaTest(TestCase):
+    def setUp(self):
+        self.name = default_storage.save(
+            "post_vidoes/clip.mp4", BytesIO(bytes(range(100)))
+        )
+        self.url = reverse("media", args=[self.name])
+
+    def tearDown(self):
+        default_storage.delete(self.name)
+
+    def test_full_file_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(100)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("immutable", response["Cache-Control"])
+
+        etag = response["ETag"]
+        for if_none_match in [etag, f'"other", W/{etag}', "*"]:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=if_none_match)
+            self.assertEqual(response.status_code, 304)
+        # an ETag containing the current one is a different ETag
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{etag[1:-1]}-1"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(95, 100)))
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=200-")
+        self.assertEqual(response.status_code, 416)
+
+        response = self.client.get(
+            self.url, HTTP_RANGE="bytes=10-19", HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_paths_outside_media_root(self):
+        response = self.client.get(reverse("media", args=["../manage.py"]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        self.user = Users.objects.create_user(
+            email="player@example.com", username="player", password="testpass123"
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        first = Post.objects.create(user=self.user, image=image_upload("a.jpg"))
+        second = Post.objects.create(user=self.user, image=image_upload("b.jpg"))
+        other = Post.objects.create(user=self.user, image=image_upload(size=(10, 10)))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertEqual(StoredFile.objects.get(name=first.image.name).ref_count, 2)
+
+        default_storage.delete(first.image.name)
+        self.assertTrue(default_storage.exists(second.image.name))
+        default_storage.delete(second.image.name)
+        self.assertFalse(default_storage.exists(second.image.name))
+        self.assertFalse(StoredFile.objects.filter(name=first.image.name).exists())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ChunkedUploadTest(TestCase):
+    def setUp(self):
+        self.user = Users.objects.create_user(
+            email="player@example.com", username="player", password="testpass123"
+        )
+        self.client = APIClient()
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.video = bytes(range(256)) * 40
+
+    def start(self, **data):
+        response = self.client.post(
+            reverse("upload_session"),
+            {"filename": "clip.mp4", "size": len(self.video), **data},
+        )
+        self.assertEqual(response.status_code, 201)
+        return reverse("upload_session_detail", args=[response.data["id"]])
+
+    def send(self, url, offset, chunk, checksum=None):
+        headers = {"HTTP_UPLOAD_OFFSET": str(offset)}
+        if checksum:
+            headers["HTTP_UPLOAD_CHECKSUM"] = checksum
+        return self.client.put(
+            url, chunk, content_type="application/offset+octet-stream", **headers
+        )
+
+    def test_upload_resumes_and_creates_post(self):
+        url = self.start(checksum=hashlib.sha256(self.video).hexdigest())
+        self.assertEqual(self.send(url, 0, self.video[:4000]).data["offset"], 4000)
+
+        response = self.send(url, 0, self.video[:4000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["offset"], 4000)
+        response = self.send(url, 4000, self.video[4000:], checksum="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).data["offset"], 4000)
+
+        self.send(url, 4000, self.video[4000:])
+        with patch.object(finalize_upload, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f"{url}/finalize", {"content": "my video"})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], UploadSession.FINALIZING)
+        # finalizing twice, or sending more chunks, is refused
+        self.assertEqual(self.client.post(f"{url}/finalize").status_code, 409)
+        self.assertEqual(self.send(url, 0, self.video[:10]).status_code, 409)
+
+        finalize_upload(*delay.call_args.args)
+        post = Post.objects.get()
+        self.assertEqual(post.content, "my video")
+        self.assertEqual(post.video.read(), self.video)
+        response = self.client.get(url)
+        self.assertEqual(response.data["status"], UploadSession.FINALIZED)
+        self.assertEqual(response.data["post"], post.id)
+
+    def test_checksum_mismatch_fails_the_upload(self):
+        url = self.start(checksum="0" * 64)
+        self.send(url, 0, self.video)
+        with patch.object(finalize_upload, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f"{url}/finalize")
+
+        finalize_upload(*delay.call_args.args)
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(self.client.get(url).data["status"], UploadSession.FAILED)
+
+    def test_incomplete_upload_cannot_be_finalized(self):
+        url = self.start()
+        self.send(url, 0, self.video[:100])
+        response = self.client.post(f"{url}/finalize")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["offset"], 100)
+
+
+@mock_aws
+@override_settings(
+    STORAGES={"default": {"BACKEND": "uploads.storage.DirectUploadStorage"}},
+    AWS_STORAGE_BUCKET_NAME="media",
+    AWS_S3_REGION_NAME="us-east-1",
+    AWS_S3_SIGNATURE_VERSION="s3v4",
+)
+class DirectUploadTest(TestCase):
+    def setUp(self):
+        cache.clear()  # upload throttles
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket="media")
+        self.user = Users.objects.create_user(
+            email="player@example.com", username="player", password="testpass123"
+        )
+        self.client = APIClient()
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def request_upload(self, target="post_image", content_type="image/jpeg"):
+        return self.client.post(
+            reverse("upload_url"),
+            {"target": target, "filename": "photo.JPG", "content_type": content_type},
+        )
+
+    def test_presigned_url_and_key_is_claimed_once(self):
+        response = self.request_upload()
+        self.assertEqual(response.status_code, 201)
+        key = response.data["key"]
+        self.assertTrue(key.startswith("post_images/") and key.endswith(".jpg"))
+        self.assertEqual(response.data["method"], "POST")
+        fields = response.data["fields"]
+        self.assertEqual(fields["key"], key)
+        self.assertEqual(fields["Content-Type"], "image/jpeg")
+        policy = json.loads(base64.b64decode(fields["policy"]))
+        self.assertIn(
+            ["content-length-range", 1, MAX_IMAGE_SIZE], policy["conditions"]
+        )
+
+        response = self.client.post(reverse("post"), {"content": "hi", "image": key})
+        self.assertEqual(response.status_code, 400)  # not uploaded yet
+
+        self.s3.put_object(Bucket="media", Key=key, Body=b"image")
+        response = self.client.post(reverse("post"), {"content": "hi", "image": key})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.get().image.name, key)
+        self.assertFalse(DirectUpload.objects.exists())
+
+        response = self.client.post(reverse("post"), {"content": "hi", "image": key})
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_saves_keep_the_key(self):
+        from users.serializers.user_serializer import CustomUsersSerializer
+
+        key = self.request_upload().data["key"]
+        self.s3.put_object(Bucket="media", Key=key, Body=b"image")
+        with patch("post.serializers.Post.objects.create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse("post"), {"content": "hi", "image": key})
+        self.assertTrue(DirectUpload.objects.filter(key=key).exists())
+
+        self.client.credentials()
+        key = self.request_upload("license", "application/pdf").data["key"]
+        self.s3.put_object(Bucket="media", Key=key, Body=b"pdf")
+        serializer = CustomUsersSerializer(
+            data={
+                "username": "academy",
+                "email": self.user.email,  # taken
+                "password": "testpass123",
+                "license": key,
+            }
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("email", serializer.errors)
+        self.assertTrue(DirectUpload.objects.filter(key=key).exists())
+
+    def test_content_type_and_authentication_are_checked(self):
+        self.assertEqual(
+            self.request_upload(content_type="text/html").status_code, 400
+        )
+        self.assertEqual(
+            self.request_upload(content_type="image/svg+xml").status_code, 400
+        )
+        self.client.credentials()
+        self.assertEqual(self.request_upload().status_code, 401)
+        self.assertEqual(
+            self.request_upload("license", "application/pdf").status_code, 201
+        )
+        self.assertEqual(self.request_upload("license", "text/html").status_code, 400)
+
+    def test_anonymous_uploads_are_throttled(self):
+        self.client.credentials()
+        for _ in range(10):
+            self.request_upload("license", "application/pdf")
+        self.assertEqual(
+            self.request_upload("license", "application/pdf").status_code, 429
+        )
+
+    def test_unclaimed_uploads_expire_with_their_file(self):
+        old = self.request_upload().data["key"]
+        claimed = self.request_upload().data["key"]
+        recent = self.request_upload().data["key"]
+        for key in (old, claimed, recent):
+            self.s3.put_object(Bucket="media", Key=key, Body=b"image")
+        self.client.post(reverse("post"), {"content": "hi", "image": claimed})
+        DirectUpload.objects.exclude(key=recent).update(
+            created_at=timezone.now() - DIRECT_UPLOAD_TTL
+        )
+
+        self.assertEqual(expire_direct_uploads(), 1)
+        self.assertEqual(
+            list(DirectUpload.objects.values_list("key", flat=True)), [recent]
+        )
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(claimed))
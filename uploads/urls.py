@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.urls import path, re_path
+
+from .views import (
+    DirectUploadView,
+    FinalizeUploadView,
+    UploadSessionDetailView,
+    UploadSessionView,
+    serve_media,
+)
+
+urlpatterns = [
+    path("upload_url", DirectUploadView.as_view(), name="upload_url"),
+    path("upload_session", UploadSessionView.as_view(), name="upload_session"),
+    path(
+        "upload_session/<uuid:id>",
+        UploadSessionDetailView.as_view(),
+        name="upload_session_detail",
+    ),
+    path(
+        "upload_session/<uuid:id>/finalize",
+        FinalizeUploadView.as_view(),
+        name="upload_session_finalize",
+    ),
+    re_path(
+        rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", serve_media, name="media"
+    ),
+]
@@ -0,0 +1,425 @@
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from rest_framework import status, views
+from rest_framework.response import Response
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+from .direct import (DIRECT_UPLOAD_TARGETS, content_type_allowed,
+                     direct_uploads_enabled, issue_direct_upload)
+from .models import UPLOAD_SESSION_DIR, UploadSession
+from .serializers import UploadSessionSerializer
+from .storage import PRESIGNED_URL_TTL
+from .tasks import READ_SIZE, finalize_upload, remove_partial_file
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# uploads are never overwritten (a new upload gets a new name), so clients and
+# proxies can keep them for a year without revalidating
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 8 * 1024 * 1024  # largest chunk accepted by a single request
+
+
+class FileRange:
+    """
+    File-like object that reads at most `length` bytes of `file` from its
+    current position.
+
+    It exposes the file descriptor, so WSGI servers that support sendfile
+    (gunicorn) send the range zero-copy using the response Content-Length.
+    """
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Parse a single range `Range` header.
+
+    Returns:
+        tuple: (start, end) inclusive byte positions, or None if the header is
+        not a single byte range and the whole file should be sent.
+
+    Raises:
+        ValueError: If the range is outside of the file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # suffix range: the last `end` bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Check an If-None-Match header against `etag`: each listed ETag is compared
+    exactly, with weak comparison (a W/ prefix is ignored), and "*" matches any.
+    """
+    etags = parse_etags(if_none_match)
+    if etags == ["*"]:
+        return True
+    return etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in etags)
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an uploaded file from MEDIA_ROOT.
+
+    Supports conditional requests (ETag / Last-Modified) and single byte ranges
+    (Range / If-Range), so video players can seek and resume without
+    downloading the whole file again.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found")
+    if path.startswith(f"{UPLOAD_SESSION_DIR}/") or not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    stat = os.stat(full_path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = http_date(stat.st_mtime)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": MEDIA_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("If-None-Match")
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since"))
+    if (if_none_match and etag_matches(if_none_match, etag)) or (
+        not if_none_match
+        and if_modified_since
+        and int(stat.st_mtime) <= if_modified_since
+    ):
+        return HttpResponse(status=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    # a Range with a stale If-Range validator gets the whole new file
+    if range_header and (not if_range or if_range in (etag, last_modified)):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return HttpResponse(status=416, headers=headers)
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+    file = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(
+            FileRange(file, end - start + 1), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    if encoding:
+        response["Content-Encoding"] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def remove_session(session):
+    """
+    Delete an upload session and its partial file.
+    """
+    remove_partial_file(session)
+    session.delete()
+
+
+def already_finalized(session):
+    return Response(
+        {"message": "Upload is already finalized", "status": session.status},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def receive_chunk(request, directory, length):
+    """
+    Write the next `length` bytes of the request body to a temporary file in
+    `directory`, hashing them on the way.
+
+    Returns:
+        tuple: (path of the file, number of bytes received, SHA-256 hex digest)
+    """
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".chunk")
+    digest = hashlib.sha256()
+    received = 0
+    with os.fdopen(fd, "wb") as chunk:
+        while received < length:
+            block = request.stream.read(min(READ_SIZE, length - received))
+            if not block:
+                break
+            digest.update(block)
+            chunk.write(block)
+            received += len(block)
+    return path, received, digest.hexdigest()
+
+
+class UploadSessionView(views.APIView):
+    """
+    Start a resumable upload.
+
+    The client then sends the file in chunks of at most `chunk_size` bytes to
+    UploadSessionDetailView and finalizes it with FinalizeUploadView.
+    """
+    def post(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        if serializer.is_valid():
+            session = serializer.save(user=request.user)
+            os.makedirs(os.path.dirname(session.temp_path), exist_ok=True)
+            open(session.temp_path, "wb").close()
+            data = dict(serializer.data)
+            data["chunk_size"] = CHUNK_SIZE
+            return Response(data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class UploadSessionDetailView(views.APIView):
+    """
+    Check, continue or cancel a resumable upload.
+    """
+    def get(self, request, id):
+        """
+        Return the upload session, its `offset` is where the upload resumes.
+        """
+        session = UploadSession.objects.filter(id=id, user=request.user).first()
+        if session is None:
+            return Response(
+                {"message": "Upload not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(
+            UploadSessionSerializer(session).data, status=status.HTTP_200_OK
+        )
+
+    def put(self, request, id):
+        """
+        Append the request body to the upload.
+
+        Headers:
+        - Upload-Offset: Position of the chunk, must be the current offset.
+        - Upload-Checksum (optional): SHA-256 hex digest of the chunk.
+
+        A chunk that is incomplete or does not match its checksum is discarded,
+        the client resends it from the returned offset.
+        """
+        session = UploadSession.objects.filter(id=id, user=request.user).first()
+        if session is None:
+            return Response(
+                {"message": "Upload not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.headers.get("Content-Length", 0))
+        except ValueError:
+            return Response(
+                {"message": "Upload-Offset header is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if session.status != UploadSession.UPLOADING:
+            return already_finalized(session)
+        if offset != session.offset:
+            return Response(
+                {"message": "Offset mismatch", "offset": session.offset},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if length <= 0 or length > CHUNK_SIZE or offset + length > session.size:
+            return Response(
+                {"message": "Invalid chunk size", "offset": session.offset},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # read the chunk from the client before locking the session, a slow
+        # client must not hold the lock
+        chunk_path, received, digest = receive_chunk(
+            request, os.path.dirname(session.temp_path), length
+        )
+        try:
+            expected = request.headers.get("Upload-Checksum", None)
+            if received != length or (expected and expected.lower() != digest):
+                return Response(
+                    {"message": "Chunk is incomplete or corrupted", "offset": offset},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            with transaction.atomic():
+                session = (
+                    UploadSession.objects.select_for_update()
+                    .filter(id=id, user=request.user)
+                    .first()
+                )
+                # checked again, another request may have sent the same chunk
+                # or finalized the upload meanwhile
+                if session is None:
+                    return Response(
+                        {"message": "Upload not found"},
+                        status=status.HTTP_404_NOT_FOUND,
+                    )
+                if session.status != UploadSession.UPLOADING:
+                    return already_finalized(session)
+                if offset != session.offset:
+                    return Response(
+                        {"message": "Offset mismatch", "offset": session.offset},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                with open(chunk_path, "rb") as chunk, open(
+                    session.temp_path, "r+b"
+                ) as part:
+                    part.seek(offset)
+                    shutil.copyfileobj(chunk, part, READ_SIZE)
+                session.offset = offset + received
+                session.save(update_fields=["offset", "updated_at"])
+        finally:
+            os.remove(chunk_path)
+        return Response({"offset": session.offset}, status=status.HTTP_200_OK)
+
+    def delete(self, request, id):
+        """
+        Cancel the upload and delete what was received.
+        """
+        session = UploadSession.objects.filter(id=id, user=request.user).first()
+        if session is None:
+            return Response(
+                {"message": "Upload not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        remove_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FinalizeUploadView(views.APIView):
+    """
+    Finish a resumable upload. Accepts the post `content`.
+
+    The Post is created by the finalize_upload task, the response is the session
+    in the finalizing status and the client polls it until it is finalized (with
+    its `post`) or failed.
+    """
+    def post(self, request, id):
+        with transaction.atomic():
+            session = (
+                UploadSession.objects.select_for_update()
+                .filter(id=id, user=request.user)
+                .first()
+            )
+            if session is None:
+                return Response(
+                    {"message": "Upload not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+            if session.status != UploadSession.UPLOADING:
+                return already_finalized(session)
+            if session.offset != session.size:
+                return Response(
+                    {"message": "Upload is not complete", "offset": session.offset},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            session.status = UploadSession.FINALIZING
+            session.content = request.data.get("content", "")
+            session.save(update_fields=["status", "content", "updated_at"])
+            transaction.on_commit(partial(finalize_upload.delay, str(session.id)))
+        return Response(
+            UploadSessionSerializer(session).data, status=status.HTTP_202_ACCEPTED
+        )
+
+
+class DirectUploadAnonThrottle(AnonRateThrottle):
+    scope = "direct_upload_anon"
+    rate = "10/hour"
+
+
+class DirectUploadUserThrottle(UserRateThrottle):
+    scope = "direct_upload_user"
+    rate = "120/hour"
+
+
+class DirectUploadView(views.APIView):
+    """
+    Hand out a presigned upload to send a file straight to the object storage.
+
+    Expects `target` (one of DIRECT_UPLOAD_TARGETS), `filename` and `content_type`.
+    The client POSTs the returned `fields` and then the file to the returned
+    `url`, and sends the returned `key` in place of the file. Only academy
+    licenses can be uploaded before login, they are sent with the signup.
+    Keys are rate limited per user (or address before login) and expire
+    unclaimed, see expire_direct_uploads.
+    """
+    throttle_classes = [DirectUploadAnonThrottle, DirectUploadUserThrottle]
+
+    def post(self, request):
+        if not direct_uploads_enabled():
+            return Response(
+                {"message": "Direct uploads are not enabled"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        target = request.data.get("target", None)
+        filename = request.data.get("filename", None)
+        content_type = request.data.get("content_type", None)
+        if target not in DIRECT_UPLOAD_TARGETS or not filename or not content_type:
+            return Response(
+                {"message": "target, filename and content_type are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not content_type_allowed(target, content_type):
+            return Response(
+                {"message": "Unsupported content type"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        user = request.user if request.user.is_authenticated else None
+        if user is None and target != "license":
+            return Response(
+                {"message": "Authentication required"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        key, upload = issue_direct_upload(user, target, filename, content_type)
+        return Response(
+            {
+                "key": key,
+                "url": upload["url"],
+                "method": "POST",
+                "fields": upload["fields"],
+                "expires_in": PRESIGNED_URL_TTL,
+            },
+            status=status.HTTP_201_CREATED,
+        )
@@ -0,0 +1,296 @@
+from common.redis_client import get_redis_client
+from django.db.models import Count
+from redis.exceptions import WatchError
+from users.models import Users
+
+from .models import Follow
+
+# Social graph adjacency cache.
+#
+# The friends of a user, the academies a player follows and the players following
+# an academy are kept as Redis sets, so the feed, search, profiles, suggestions
+# and notifications read them without querying the M2M and Follow tables. A set
+# is built from the database on its first read and dropped once a change to its
+# rows is committed (see user_profile.signals), to be built again on the next
+# read. A built set always contains GRAPH_MARKER, which tells an empty set apart
+# from one that was never built or has expired. Every drop also bumps the
+# version of the set, and a reader only stores the set it loaded if the version
+# did not move meanwhile, so a set read before a change cannot be stored after
+# the change dropped it. Without Redis every call falls back to the database.
+GRAPH_KEY = "graph:{kind}:{user_id}"
+GRAPH_TTL = 60 * 60 * 24 * 7  # drop the sets of users inactive for a week
+GRAPH_MARKER = "0"  # user ids start at 1
+# a version only has to outlive the reads running when its set is dropped
+VERSION_TTL = 60 * 5
+STORE_ATTEMPTS = 3
+FRIENDS, FOLLOWS, FOLLOWERS = "friends", "follows", "followers"
+MUTUAL_PREVIEW = 3  # mutual friends shown on a profile
+
+
+def graph_key(kind, user_id):
+    return GRAPH_KEY.format(kind=kind, user_id=user_id)
+
+
+def version_key(kind, user_id):
+    return graph_key(kind, user_id) + ":version"
+
+
+def load_many(kind, user_ids):
+    """
+    Read the adjacency sets of `user_ids` from the database in one query.
+
+    Returns:
+        dict: user id -> set of ids, empty for users without any.
+    """
+    if kind == FRIENDS:
+        pairs = Users.friends.through.objects.filter(
+            from_users_id__in=user_ids
+        ).values_list("from_users_id", "to_users_id")
+    elif kind == FOLLOWS:
+        pairs = Follow.objects.filter(player_id__in=user_ids).values_list(
+            "player_id", "academy_id"
+        )
+    else:
+        pairs = Follow.objects.filter(academy_id__in=user_ids).values_list(
+            "academy_id", "player_id"
+        )
+    sets = {user_id: set() for user_id in user_ids}
+    for user_id, member_id in pairs:
+        sets[user_id].add(member_id)
+    return sets
+
+
+def load(kind, user_id):
+    """
+    Read an adjacency set from the database.
+    """
+    return load_many(kind, [user_id])[user_id]
+
+
+def _client():
+    """
+    Return the Redis client, or None when the cache is not backed by Redis.
+    """
+    try:
+        return get_redis_client()
+    except NotImplementedError:
+        return None
+
+
+def _store(pipe, kind, user_id, ids):
+    key = graph_key(kind, user_id)
+    pipe.delete(key)
+    pipe.sadd(key, GRAPH_MARKER, *ids)
+    pipe.expire(key, GRAPH_TTL)
+
+
+def _ensure(client, kind, user_ids):
+    """
+    Build the sets of `user_ids` that are not in Redis yet.
+
+    Raises:
+    - WatchError: If the sets kept changing while they were read.
+    """
+    keys = [graph_key(kind, user_id) for user_id in user_ids]
+    for attempt in range(STORE_ATTEMPTS):
+        with client.pipeline() as pipe:
+            pipe.watch(*[version_key(kind, user_id) for user_id in user_ids])
+            check = client.pipeline(transaction=False)
+            for key in keys:
+                check.exists(key)
+            missing = [
+                user_id
+                for user_id, built in zip(user_ids, check.execute())
+                if not built
+            ]
+            if not missing:
+                return
+            sets = load_many(kind, missing)
+            pipe.multi()
+            for user_id, ids in sets.items():
+                _store(pipe, kind, user_id, ids)
+            try:
+                pipe.execute()
+                return
+            except WatchError:
+                continue
+    raise WatchError(f"graph sets of {kind} {missing} changed while read")
+
+
+def _members(kind, user_id):
+    client = _client()
+    if client is None:
+        return load(kind, user_id)
+    try:
+        _ensure(client, kind, [user_id])
+        members = client.smembers(graph_key(kind, user_id))
+    except Exception as e:
+        print(e, "graph cache not available")
+        return load(kind, user_id)
+    return {int(member) for member in members if member != GRAPH_MARKER.encode()}
+
+
+def friends_of(user_id):
+    """
+    Return the ids of the friends of `user_id`.
+    """
+    return _members(FRIENDS, user_id)
+
+
+def follows_of(user_id):
+    """
+    Return the ids of the academies followed by the player `user_id`.
+    """
+    return _members(FOLLOWS, user_id)
+
+
+def followers_of(user_id):
+    """
+    Return the ids of the players following the academy `user_id`.
+    """
+    return _members(FOLLOWERS, user_id)
+
+
+def is_friend(user_id, other_id):
+    client = _client()
+    if client is None:
+        return other_id in load(FRIENDS, user_id)
+    try:
+        _ensure(client, FRIENDS, [user_id])
+        return bool(client.sismember(graph_key(FRIENDS, user_id), other_id))
+    except Exception as e:
+        print(e, "graph cache not available")
+        return other_id in load(FRIENDS, user_id)
+
+
+def mutual_friend_ids(user_id, other_id):
+    """
+    Return the ids of the friends `user_id` and `other_id` have in common.
+    """
+    client = _client()
+    if client is None:
+        return load(FRIENDS, user_id) & load(FRIENDS, other_id)
+    try:
+        _ensure(client, FRIENDS, [user_id, other_id])
+        common = client.sinter(
+            graph_key(FRIENDS, user_id), graph_key(FRIENDS, other_id)
+        )
+    except Exception as e:
+        print(e, "graph cache not available")
+        return load(FRIENDS, user_id) & load(FRIENDS, other_id)
+    return {int(member) for member in common if member != GRAPH_MARKER.encode()}
+
+
+def mutual_count(user_id, other_id):
+    """
+    Return the number of friends `user_id` and `other_id` have in common.
+    """
+    return mutual_counts(user_id, [other_id]).get(other_id, 0)
+
+
+def _mutual_counts_from_database(user_id, other_ids):
+    # one grouped query: the friendships of `other_ids` with a friend of `user_id`
+    friendships = Users.friends.through.objects
+    counts = dict(
+        friendships.filter(
+            from_users_id__in=other_ids,
+            to_users_id__in=friendships.filter(from_users_id=user_id).values(
+                "to_users_id"
+            ),
+        )
+        .values("from_users_id")
+        .annotate(total=Count("to_users_id"))
+        .values_list("from_users_id", "total")
+    )
+    return {other_id: counts.get(other_id, 0) for other_id in other_ids}
+
+
+def mutual_counts(user_id, other_ids):
+    """
+    Return the number of mutual friends of `user_id` with each of `other_ids`,
+    for a page of results in one Redis round trip (or one query without Redis).
+
+    Returns:
+        dict: other id -> number of mutual friends.
+    """
+    other_ids = [other_id for other_id in set(other_ids) if other_id != user_id]
+    if not other_ids:
+        return {}
+    client = _client()
+    if client is None:
+        return _mutual_counts_from_database(user_id, other_ids)
+    try:
+        _ensure(client, FRIENDS, [user_id, *other_ids])
+        pipe = client.pipeline(transaction=False)
+        for other_id in other_ids:
+            # SINTERCARD counts the intersection without sending it back
+            pipe.sintercard(
+                2, [graph_key(FRIENDS, user_id), graph_key(FRIENDS, other_id)]
+            )
+        results = pipe.execute()
+    except Exception as e:
+        print(e, "graph cache not available")
+        return _mutual_counts_from_database(user_id, other_ids)
+    # both sets hold the marker, so it is in every intersection
+    return {other_id: count - 1 for other_id, count in zip(other_ids, results)}
+
+
+def mutual_friends(user_id, other_id, limit=MUTUAL_PREVIEW):
+    """
+    Return the number of mutual friends of `user_id` and `other_id` and the
+    first `limit` of them, with their profiles loaded.
+    """
+    ids = sorted(mutual_friend_ids(user_id, other_id))
+    friends = Users.objects.filter(id__in=ids[:limit]).select_related("userprofile")
+    return len(ids), list(friends.order_by("id"))
+
+
+def invalidate(changes):
+    """
+    Drop the sets of (kind, user_id) `changes`, to be called once a change to
+    their rows is committed. They are built again on their next read.
+    """
+    client = _client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline()
+        for kind, user_id in changes:
+            pipe.delete(graph_key(kind, user_id))
+            pipe.incr(version_key(kind, user_id))
+            pipe.expire(version_key(kind, user_id), VERSION_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(e, "error invalidating graph cache")
+
+
+def rebuild():
+    """
+    Drop every cached set and store the sets of every user with at least one
+    friend or follow.
+
+    Returns:
+        int: The number of sets stored.
+    """
+    client = get_redis_client()
+    for key in client.scan_iter(match=GRAPH_KEY.format(kind="*", user_id="*")):
+        client.delete(key)
+
+    sets = {}
+    friendships = Users.friends.through.objects.values_list(
+        "from_users_id", "to_users_id"
+    )
+    for user_id, friend_id in friendships.iterator(chunk_size=5000):
+        sets.setdefault((FRIENDS, user_id), set()).add(friend_id)
+    follows = Follow.objects.values_list("player_id", "academy_id")
+    for player_id, academy_id in follows.iterator(chunk_size=5000):
+        sets.setdefault((FOLLOWS, player_id), set()).add(academy_id)
+        sets.setdefault((FOLLOWERS, academy_id), set()).add(player_id)
+
+    pipe = client.pipeline(transaction=False)
+    for count, ((kind, user_id), ids) in enumerate(sets.items(), start=1):
+        _store(pipe, kind, user_id, ids)
+        if count % 1000 == 0:
+            pipe.execute()
+    pipe.execute()
+    return len(sets)
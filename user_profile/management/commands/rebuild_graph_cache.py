@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from user_profile.graph import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the friend and follow sets of every user in Redis."
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} adjacency sets"))
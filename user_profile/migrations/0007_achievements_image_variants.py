@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0006_alter_friendrequest_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievements',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -52,6 +52,7 @@ class Achievements(DataBaseModels):
         issued_month: The month when the achievement was issued.
         issued_year: The year when the achievement was issued.
         image: An image representing the achievement.
+        image_variants: Resized copies of the image, filled in by the uploads app.
         description: A description of the achievement.
     """
 
@@ -63,6 +64,7 @@ class Achievements(DataBaseModels):
     issued_month = models.CharField(max_length=20, null=True, blank=True)
     issued_year = models.CharField(max_length=10, null=True, blank=True)
     image = models.ImageField(upload_to="images/", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
     description = models.TextField(null=True)
 
     def __str__(self) -> str:
@@ -127,3 +129,26 @@ class Follow(DataBaseModels):
 
     class Meta:
         unique_together = ("player", "academy")
+
+
+class SuggestedFriend(DataBaseModels):
+    """
+    A precomputed friend suggestion, see user_profile.suggestions.
+
+    Attributes:
+        user: The player the suggestion is shown to.
+        suggested: The suggested player.
+        score: Ranking of the suggestion, higher first.
+        mutual_friends: Number of friends `user` and `suggested` have in common.
+    """
+
+    user = models.ForeignKey(
+        Users, related_name="friend_suggestions", on_delete=models.CASCADE
+    )
+    suggested = models.ForeignKey(Users, related_name="+", on_delete=models.CASCADE)
+    score = models.PositiveIntegerField(default=0)
+    mutual_friends = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "suggested")
+        indexes = [models.Index(fields=["user", "-score"])]
@@ -0,0 +1,111 @@
+from django.db.models import Q
+from post.models import Like
+
+from . import graph
+from .models import FriendRequest
+
+
+class RelationshipContext:
+    """
+    Relationships between a viewer and a batch of users, loaded up front.
+
+    Serializers and views that show follow/friend status or like state for many
+    users or posts read them from this object instead of querying per row, so a
+    page costs a fixed number of queries whatever its size.
+
+    Args:
+        viewer (Users): The user looking at the page.
+        user_ids (iterable): IDs of the users shown on the page.
+        post_ids (iterable, optional): IDs of the posts shown on the page.
+    """
+
+    def __init__(self, viewer, user_ids, post_ids=()):
+        self.viewer = viewer
+        user_ids = set(user_ids) - {viewer.id}
+        post_ids = set(post_ids)
+
+        self.following = set()  # academies followed by the viewer
+        self.followers = set()  # players following the viewer
+        self.sent_requests = {}  # to_user id -> request status
+        self.received_requests = {}  # from_user id -> request status
+        self.friends = set()
+        self.liked_posts = set()
+
+        if user_ids:
+            self.following = graph.follows_of(viewer.id) & user_ids
+            self.followers = graph.followers_of(viewer.id) & user_ids
+            friend_requests = FriendRequest.objects.filter(
+                Q(from_user=viewer, to_user__in=user_ids)
+                | Q(to_user=viewer, from_user__in=user_ids)
+            ).values_list("from_user_id", "to_user_id", "status")
+            for from_user_id, to_user_id, request_status in friend_requests:
+                if from_user_id == viewer.id:
+                    self.sent_requests[to_user_id] = request_status
+                else:
+                    self.received_requests[from_user_id] = request_status
+            self.friends = graph.friends_of(viewer.id) & user_ids
+
+        if post_ids:
+            self.liked_posts = set(
+                Like.objects.filter(user=viewer, post__in=post_ids).values_list(
+                    "post_id", flat=True
+                )
+            )
+
+    def relationship_status(self, user):
+        """
+        Return the relationship between the viewer and `user`.
+
+        Possible statuses:
+        - "self" if `user` is the viewer
+        - "following" / "follow" if `user` is an academy the viewer follows or not
+        - "follower" / "notfollower" if the viewer is an academy followed by `user` or not
+        - "received" / "sent" if there is a friend request between them
+        - "friends" if they are friends
+        - "none" if none of the above
+        """
+        if user.id == self.viewer.id:
+            return "self"
+        if user.is_academy:
+            return "following" if user.id in self.following else "follow"
+        if self.viewer.is_academy:
+            return "follower" if user.id in self.followers else "notfollower"
+        if user.id in self.received_requests:
+            return "received"
+        if user.id in self.sent_requests:
+            return "sent"
+        if user.id in self.friends:
+            return "friends"
+        return "none"
+
+    def friend_status(self, user_id):
+        """
+        Return the friendship between the viewer and `user_id` as shown in search
+        results: "self", "request_sent", "request_received", "friends" or "none".
+        """
+        if user_id == self.viewer.id:
+            return "self"
+        if self.sent_requests.get(user_id) == "pending":
+            return "request_sent"
+        if self.received_requests.get(user_id) == "pending":
+            return "request_received"
+        if user_id in self.friends:
+            return "friends"
+        return "none"
+
+    def follow_status(self, user_id, is_academy):
+        """
+        Return "following" if `user_id` is an academy the viewer follows,
+        "follower" if it is a player following the viewer, else "not_following".
+        """
+        if is_academy and user_id in self.following:
+            return "following"
+        if not is_academy and user_id in self.followers:
+            return "follower"
+        return "not_following"
+
+    def is_liked(self, post_id):
+        """
+        Check if the viewer has liked the post.
+        """
+        return post_id in self.liked_posts
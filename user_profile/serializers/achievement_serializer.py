@@ -1,5 +1,3 @@
-import os
-
 from rest_framework.serializers import ModelSerializer
 
 from ..models import Achievements
@@ -56,7 +54,7 @@ class AchievementSerializer(ModelSerializer):
         Update an existing `Achievements` instance.
 
         If the `image` field is being updated and a new image is provided, 
-        the old image file is deleted from the filesystem.
+        the old image file is released from the storage.
 
         Args:
             instance (Achievements): The existing `Achievements` instance to update.
@@ -65,6 +63,6 @@ class AchievementSerializer(ModelSerializer):
         Returns:
             Achievements: The updated `Achievements` instance.
         """
-        if instance.image and os.path.exists(instance.image.path):
-            os.remove(instance.image.path)
+        if instance.image and validated_data.get("image", None):
+            instance.image.delete(save=False)
         return super().update(instance, validated_data)
@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from uploads.images import variant_url
+
 from ..models import Follow, FriendRequest
 
 User = get_user_model()
@@ -42,10 +44,10 @@ class FriendListSerializer(serializers.ModelSerializer):
             obj (User): The user instance.
 
         Returns:
-            str or None: URL of the profile photo or None if not available.
+            str or None: URL of the profile photo thumbnail or None if not available.
         """
         if hasattr(obj, "userprofile") and obj.userprofile.profile_photo:
-            return obj.userprofile.profile_photo.url
+            return variant_url(obj.userprofile.profile_photo, "thumb")
         return None
 
     def get_bio(self, obj):
@@ -0,0 +1,40 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from users.models import Users
+
+from . import graph
+from .models import Follow
+
+
+def invalidate_graph(*changes):
+    """
+    Drop the cached (kind, user_id) graph sets once the transaction is committed,
+    so they are built again from the committed rows.
+    """
+    transaction.on_commit(partial(graph.invalidate, changes))
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    invalidate_graph(
+        (graph.FOLLOWS, instance.player_id), (graph.FOLLOWERS, instance.academy_id)
+    )
+
+
+@receiver(m2m_changed, sender=Users.friends.through)
+def friends_changed(sender, instance, action, pk_set, **kwargs):
+    """
+    Signal to drop the friends sets of both sides of added or removed
+    friendships. A clear is handled before it runs, while the friends it removes
+    can still be read.
+    """
+    if action in ("post_add", "post_remove"):
+        user_ids = {instance.pk, *pk_set}
+    elif action == "pre_clear":
+        user_ids = {instance.pk, *instance.friends.values_list("id", flat=True)}
+    else:
+        return
+    invalidate_graph(*[(graph.FRIENDS, user_id) for user_id in user_ids])
@@ -0,0 +1,126 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from users.models import Sport, UserProfile, Users
+
+from . import graph
+from .models import SuggestedFriend
+
+# Precomputed friend suggestions.
+#
+# The players suggested to a user are scored by mutual friends, shared sports and
+# living in the same district, and the best SUGGESTIONS_PER_USER are stored in
+# SuggestedFriend so the endpoint reads a few indexed rows. A user's list is
+# recomputed when the user or one of their friends gains or loses a friend (see
+# refresh_friend_suggestions) and every night for everyone. A user without any
+# candidate gets a cache marker instead of rows, so the endpoint does not score
+# them again on every request.
+SUGGESTIONS_PER_USER = 20
+NO_SUGGESTIONS_KEY = "no_friend_suggestions_{user_id}"
+NO_SUGGESTIONS_TTL = 60 * 60 * 24
+# candidates read from each source (sports, district) before scoring
+CANDIDATES_PER_SOURCE = 200
+MUTUAL_FRIEND_WEIGHT = 3
+SHARED_SPORT_WEIGHT = 2
+SAME_DISTRICT_WEIGHT = 1
+
+
+def players():
+    return Users.objects.filter(is_academy=False, is_staff=False, is_active=True)
+
+
+def score_suggestions(user):
+    """
+    Score the players that could be suggested to `user`.
+
+    Returns:
+        list: (score, mutual friends, user id) tuples, best first.
+    """
+    friend_ids = graph.friends_of(user.id)
+    excluded = friend_ids | {user.id}
+
+    mutual = Counter(
+        dict(
+            players()
+            .filter(friends__in=friend_ids)
+            .exclude(id__in=excluded)
+            .values("id")
+            .annotate(total=Count("id"))
+            .values_list("id", "total")
+        )
+    )
+
+    sports = Sport.objects.filter(user=user).values_list("sport_name", flat=True)
+    shared_sports = dict(
+        players()
+        .filter(sport__sport_name__in=sports)
+        .exclude(id__in=excluded)
+        .annotate(total=Count("sport__sport_name", distinct=True))
+        .order_by("-total", "-id")
+        .values_list("id", "total")[:CANDIDATES_PER_SOURCE]
+    )
+
+    district = (
+        UserProfile.objects.filter(user=user).values_list("district", flat=True).first()
+    )
+    same_district = set()
+    if district:
+        same_district = set(
+            players()
+            .filter(userprofile__district=district)
+            .exclude(id__in=excluded)
+            .order_by("-id")
+            .values_list("id", flat=True)[:CANDIDATES_PER_SOURCE]
+        )
+
+    scored = []
+    for candidate in set(mutual) | set(shared_sports) | same_district:
+        score = (
+            mutual[candidate] * MUTUAL_FRIEND_WEIGHT
+            + shared_sports.get(candidate, 0) * SHARED_SPORT_WEIGHT
+            + (SAME_DISTRICT_WEIGHT if candidate in same_district else 0)
+        )
+        scored.append((score, mutual[candidate], candidate))
+    scored.sort(reverse=True)
+    return scored[:SUGGESTIONS_PER_USER]
+
+
+def compute_friend_suggestions(user):
+    """
+    Replace the stored suggestions of `user` with freshly scored ones.
+    """
+    rows = [
+        SuggestedFriend(
+            user=user, suggested_id=candidate, score=score, mutual_friends=mutual
+        )
+        for score, mutual, candidate in score_suggestions(user)
+    ]
+    with transaction.atomic():
+        SuggestedFriend.objects.filter(user=user).delete()
+        SuggestedFriend.objects.bulk_create(rows)
+    if not rows:
+        cache.set(NO_SUGGESTIONS_KEY.format(user_id=user.id), True, NO_SUGGESTIONS_TTL)
+    return rows
+
+
+def suggestions_computed(user):
+    """
+    Check if the suggestions of `user` were computed, with or without results.
+    """
+    return (
+        SuggestedFriend.objects.filter(user=user).exists()
+        or cache.get(NO_SUGGESTIONS_KEY.format(user_id=user.id)) is not None
+    )
+
+
+def affected_users(user_ids):
+    """
+    Return the users whose suggestions change when `user_ids` gain or lose a
+    friend: themselves and their friends (their mutual friend counts change).
+    """
+    friend_ids = Users.friends.through.objects.filter(
+        from_users_id__in=user_ids
+    ).values_list("to_users_id", flat=True)
+    return players().filter(id__in={*user_ids, *friend_ids})
@@ -0,0 +1,32 @@
+from celery import shared_task
+
+from .suggestions import affected_users, compute_friend_suggestions, players
+
+REBUILD_BATCH_SIZE = 500
+
+
+@shared_task(bind=True)
+def refresh_friend_suggestions(self, user_ids):
+    """
+    Recompute the friend suggestions of `user_ids` and of their friends after
+    a friendship between them was made or removed.
+
+    Args:
+        user_ids (list): IDs of the users whose friends changed.
+    """
+    try:
+        for user in affected_users(user_ids):
+            compute_friend_suggestions(user)
+    except Exception as e:
+        print(e, "error refreshing friend suggestions")
+        self.retry(exc=e, countdown=30, max_retries=3)
+
+
+@shared_task
+def rebuild_friend_suggestions():
+    """
+    Recompute the friend suggestions of every player, catching up with profile,
+    sport and signup changes that do not trigger a refresh.
+    """
+    for user in players().order_by("id").iterator(chunk_size=REBUILD_BATCH_SIZE):
+        compute_friend_suggestions(user)
@@ -1,3 +1,417 @@
+from unittest import mock
+
+import fakeredis
+from common.toggles import delete_returning, insert_ignore, toggle
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
 from django.test import TestCase
+from django.urls import reverse
+from post.models import Like, Post
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import Sport, UserProfile, Users
+
+from . import graph
+from .models import Follow, FriendRequest, SuggestedFriend
+from .relationships import RelationshipContext
+from .suggestions import compute_friend_suggestions
+from .tasks import refresh_friend_suggestions
+
+
+class RelationshipContextTest(TestCase):
+    def setUp(self):
+        self.viewer = self.create_user("viewer")
+        self.friend = self.create_user("friend")
+        self.requester = self.create_user("requester")
+        self.requested = self.create_user("requested")
+        self.stranger = self.create_user("stranger")
+        self.academy = self.create_user("academy", is_academy=True)
+
+        self.viewer.friends.add(self.friend)
+        FriendRequest.objects.create(from_user=self.requester, to_user=self.viewer)
+        FriendRequest.objects.create(from_user=self.viewer, to_user=self.requested)
+        Follow.objects.create(player=self.viewer, academy=self.academy)
+
+    def create_user(self, username, **extra_fields):
+        return Users.objects.create_user(
+            email=f"{username}@example.com",
+            username=username,
+            password="testpass123",
+            **extra_fields,
+        )
+
+    def test_statuses_are_loaded_in_a_fixed_number_of_queries(self):
+        users = [
+            self.viewer,
+            self.friend,
+            self.requester,
+            self.requested,
+            self.stranger,
+            self.academy,
+        ]
+        post = Post.objects.create(user=self.friend, content="post")
+        Like.objects.create(user=self.viewer, post=post)
+
+        with self.assertNumQueries(5):
+            context = RelationshipContext(
+                self.viewer, [user.id for user in users], [post.id]
+            )
+            statuses = [context.relationship_status(user) for user in users]
+
+        self.assertEqual(
+            statuses, ["self", "friends", "received", "sent", "none", "following"]
+        )
+        self.assertTrue(context.is_liked(post.id))
+
+    def test_academy_viewer_sees_followers(self):
+        context = RelationshipContext(self.academy, [self.viewer.id, self.stranger.id])
+        self.assertEqual(context.relationship_status(self.viewer), "follower")
+        self.assertEqual(context.relationship_status(self.stranger), "notfollower")
+
+
+class ToggleTest(TestCase):
+    def setUp(self):
+        self.player = Users.objects.create_user(
+            email="player@example.com", username="player", password="testpass123"
+        )
+        self.academy = Users.objects.create_user(
+            email="academy@example.com",
+            username="academy",
+            password="testpass123",
+            is_academy=True,
+        )
+
+    def test_insert_ignore_skips_existing_rows(self):
+        with self.assertNumQueries(1):
+            follow = insert_ignore(Follow, player=self.player, academy=self.academy)
+        self.assertEqual(Follow.objects.get().id, follow.id)
+        self.assertIsNotNone(follow.created_at)
+        self.assertIsNone(
+            insert_ignore(Follow, player=self.player, academy=self.academy.id)
+        )
+
+    @mock.patch("user_profile.views.async_to_sync")
+    def test_friend_request_endpoint_fills_python_defaults(self, async_to_sync):
+        other = Users.objects.create_user(
+            email="other@example.com", username="other", password="testpass123"
+        )
+        client = APIClient()
+        token = RefreshToken.for_user(self.player).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        response = client.post(reverse("friend_request"), {"to_user": other.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], FriendRequest.PENDING)
+        self.assertEqual(
+            FriendRequest.objects.get(from_user=self.player, to_user=other).status,
+            FriendRequest.PENDING,
+        )
+
+        response = client.post(reverse("friend_request"), {"to_user": other.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_returning_and_toggle(self):
+        self.assertEqual(
+            delete_returning(Follow, player=self.player, academy=self.academy.id), []
+        )
+        self.assertEqual(
+            tuple(toggle(Follow, player=self.player, academy=self.academy)),
+            (True, True),
+        )
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            tuple(toggle(Follow, player=self.player, academy=self.academy)),
+            (False, True),
+        )
+        self.assertFalse(Follow.objects.exists())
+
+    def test_writes_send_model_signals(self):
+        saved, deleted = mock.Mock(), mock.Mock()
+        post_save.connect(saved, sender=Follow)
+        post_delete.connect(deleted, sender=Follow)
+        self.addCleanup(post_save.disconnect, saved, sender=Follow)
+        self.addCleanup(post_delete.disconnect, deleted, sender=Follow)
+
+        follow = insert_ignore(Follow, player=self.player, academy=self.academy)
+        insert_ignore(Follow, player=self.player, academy=self.academy)
+        delete_returning(Follow, player=self.player, academy=self.academy.id)
+        toggle(Follow, player=self.player, academy=self.academy)
+        toggle(Follow, player=self.player, academy=self.academy)
+
+        self.assertEqual(saved.call_count, 2)
+        self.assertEqual(deleted.call_count, 2)
+        instance = deleted.call_args_list[0].kwargs["instance"]
+        self.assertEqual(
+            (instance.pk, instance.player_id, instance.academy_id),
+            (follow.id, self.player.id, self.academy.id),
+        )
+        self.assertTrue(saved.call_args_list[0].kwargs["created"])
+
+    def test_follow_written_without_the_orm_drops_cached_sets(self):
+        with mock.patch(
+            "user_profile.graph.get_redis_client", return_value=fakeredis.FakeRedis()
+        ):
+            self.assertEqual(graph.followers_of(self.academy.id), set())
+            with self.captureOnCommitCallbacks(execute=True):
+                insert_ignore(Follow, player=self.player, academy=self.academy)
+            self.assertEqual(graph.followers_of(self.academy.id), {self.player.id})
+
+
+class FriendSuggestionTest(TestCase):
+    def setUp(self):
+        self.user = self.create_user("user", district="Kochi", sport="Football")
+        self.friend = self.create_user("friend")
+        self.user.friends.add(self.friend)
+        # two mutual friends beat a shared sport and district
+        self.mutual = self.create_user("mutual")
+        self.mutual.friends.add(self.friend)
+        self.other_friend = self.create_user("other_friend")
+        self.user.friends.add(self.other_friend)
+        self.mutual.friends.add(self.other_friend)
+        self.teammate = self.create_user("teammate", district="Kochi", sport="Football")
+        self.neighbour = self.create_user("neighbour", district="Kochi")
+        self.create_user("academy", district="Kochi", is_academy=True)
+
+        cache.clear()
+        patcher = mock.patch(
+            "user_profile.graph.get_redis_client", return_value=fakeredis.FakeRedis()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_user(self, username, district=None, sport=None, **extra_fields):
+        user = Users.objects.create_user(
+            email=f"{username}@example.com",
+            username=username,
+            password="testpass123",
+            **extra_fields,
+        )
+        UserProfile.objects.create(user=user, district=district)
+        if sport:
+            Sport.objects.create(user=user, sport_name=sport)
+        return user
+
+    def test_suggestions_are_ranked_by_score(self):
+        compute_friend_suggestions(self.user)
+        suggestions = SuggestedFriend.objects.filter(user=self.user).order_by("-score")
+        self.assertEqual(
+            [suggestion.suggested for suggestion in suggestions],
+            [self.mutual, self.teammate, self.neighbour],
+        )
+        self.assertEqual(suggestions[0].mutual_friends, 2)
+
+    def test_refresh_updates_users_and_their_friends(self):
+        compute_friend_suggestions(self.user)
+        compute_friend_suggestions(self.friend)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.friends.add(self.teammate)
+        refresh_friend_suggestions([self.user.id, self.teammate.id])
+
+        self.assertFalse(
+            SuggestedFriend.objects.filter(
+                user=self.user, suggested=self.teammate
+            ).exists()
+        )
+        # a friend of the user now has the teammate as a friend of a friend
+        suggestion = SuggestedFriend.objects.get(
+            user=self.friend, suggested=self.teammate
+        )
+        self.assertEqual(suggestion.mutual_friends, 1)
+
+    def test_endpoint_reads_precomputed_suggestions(self):
+        compute_friend_suggestions(self.user)
+        client = APIClient()
+        token = RefreshToken.for_user(self.user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        # auth, exists, suggestions (the friends are in the graph cache)
+        with self.assertNumQueries(3):
+            response = client.get(reverse("friend_suggestion"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [user["username"] for user in response.data],
+            ["mutual", "teammate", "neighbour"],
+        )
+
+    def test_users_without_candidates_are_not_scored_again(self):
+        loner = self.create_user("loner")
+        client = APIClient()
+        token = RefreshToken.for_user(loner).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        with mock.patch(
+            "user_profile.views.compute_friend_suggestions",
+            wraps=compute_friend_suggestions,
+        ) as compute:
+            for _ in range(2):
+                response = client.get(reverse("friend_suggestion"))
+                self.assertEqual(response.data, [])
+        compute.assert_called_once_with(loner)
+
+
+class GraphCacheTest(TestCase):
+    def setUp(self):
+        self.player, self.friend, self.other, self.academy = [
+            Users.objects.create_user(
+                email=f"{username}@example.com",
+                username=username,
+                password="testpass123",
+                is_academy=username == "academy",
+            )
+            for username in ["player", "friend", "other", "academy"]
+        ]
+        self.player.friends.add(self.friend, self.other)
+        self.friend.friends.add(self.other)
+        Follow.objects.create(player=self.player, academy=self.academy)
+
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch(
+            "user_profile.graph.get_redis_client", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_match_the_database(self):
+        for _ in range(2):  # built from the database, then read from Redis
+            self.assertEqual(
+                graph.friends_of(self.player.id), {self.friend.id, self.other.id}
+            )
+            self.assertEqual(graph.follows_of(self.player.id), {self.academy.id})
+            self.assertEqual(graph.followers_of(self.academy.id), {self.player.id})
+            self.assertTrue(graph.is_friend(self.friend.id, self.player.id))
+            self.assertFalse(graph.is_friend(self.academy.id, self.player.id))
+            self.assertEqual(graph.mutual_count(self.player.id, self.friend.id), 1)
+
+    @mock.patch("user_profile.graph._client", return_value=None)
+    def test_reads_fall_back_to_database(self, _client):
+        self.assertEqual(
+            graph.friends_of(self.player.id), {self.friend.id, self.other.id}
+        )
+        self.assertEqual(graph.follows_of(self.player.id), {self.academy.id})
+        self.assertEqual(graph.followers_of(self.academy.id), {self.player.id})
+        self.assertTrue(graph.is_friend(self.friend.id, self.player.id))
+        self.assertFalse(graph.is_friend(self.academy.id, self.player.id))
+        self.assertEqual(graph.mutual_count(self.player.id, self.friend.id), 1)
+
+    def test_mutual_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = graph.mutual_counts(
+                self.friend.id, [self.player.id, self.other.id, self.academy.id]
+            )
+        self.assertEqual(
+            counts, {self.player.id: 1, self.other.id: 1, self.academy.id: 0}
+        )
+
+    def test_mutual_friends_on_profile_and_endpoint(self):
+        client = APIClient()
+        token = RefreshToken.for_user(self.friend).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        response = client.get(reverse("profile_with_id", args=[self.player.id]))
+        mutual = response.data["user_details"]["mutual_friends"]
+        self.assertEqual(mutual["count"], 1)
+        self.assertEqual(mutual["friends"][0]["username"], "other")
+
+        response = client.get(reverse("mutual_friends", args=[self.player.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(
+            [user["id"] for user in response.data["results"]], [self.other.id]
+        )
+
+    def test_mutual_friends_endpoint_is_paginated(self):
+        mutual = [
+            Users.objects.create_user(
+                email=f"mutual{index}@example.com",
+                username=f"mutual{index}",
+                password="testpass123",
+            )
+            for index in range(5)
+        ]
+        self.player.friends.add(*mutual)
+        self.friend.friends.add(*mutual)
+        client = APIClient()
+        token = RefreshToken.for_user(self.friend).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        response = client.get(reverse("mutual_friends", args=[self.player.id]))
+        self.assertEqual(response.data["count"], 6)
+        self.assertEqual(
+            [user["id"] for user in response.data["results"]],
+            [self.other.id] + [user.id for user in mutual[:3]],
+        )
+        response = client.get(response.data["next"])
+        self.assertEqual(
+            [user["id"] for user in response.data["results"]],
+            [user.id for user in mutual[3:]],
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_mutual_counts_in_redis(self):
+        others = [self.player.id, self.other.id, self.academy.id]
+        graph.mutual_counts(self.friend.id, others)  # builds the sets
+        with self.assertNumQueries(0):
+            counts = graph.mutual_counts(self.friend.id, others)
+        self.assertEqual(
+            counts, {self.player.id: 1, self.other.id: 1, self.academy.id: 0}
+        )
+
+    def test_committed_changes_drop_the_cached_sets(self):
+        self.assertEqual(graph.followers_of(self.academy.id), {self.player.id})
+        self.assertEqual(graph.friends_of(self.friend.id), {self.player.id, self.other.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(player=self.other, academy=self.academy)
+            self.friend.friends.remove(self.player)
+        self.assertEqual(
+            graph.followers_of(self.academy.id), {self.player.id, self.other.id}
+        )
+        self.assertEqual(graph.friends_of(self.friend.id), {self.other.id})
+        self.assertEqual(graph.friends_of(self.player.id), {self.other.id})
+
+        graph.friends_of(self.other.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.friends.clear()
+        self.assertEqual(graph.friends_of(self.player.id), set())
+        self.assertEqual(graph.friends_of(self.other.id), set())
+
+    def test_reads_do_not_refresh_the_expiry(self):
+        key = graph.graph_key(graph.FOLLOWS, self.player.id)
+        graph.follows_of(self.player.id)
+        self.redis.expire(key, 10)
+        graph.follows_of(self.player.id)
+        self.assertLessEqual(self.redis.ttl(key), 10)
+
+    def test_set_read_before_a_change_is_not_stored(self):
+        load_many = graph.load_many
+        calls = []
+
+        def load_during_change(kind, user_ids):
+            calls.append(user_ids)
+            if len(calls) > 1:
+                return load_many(kind, user_ids)
+            # the rows read so far miss a follow that commits now
+            graph.invalidate([(kind, self.academy.id)])
+            return {self.academy.id: set()}
+
+        with mock.patch.object(graph, "load_many", side_effect=load_during_change):
+            self.assertEqual(graph.followers_of(self.academy.id), {self.player.id})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(graph.followers_of(self.academy.id), {self.player.id})
+
+    def test_unfollow_endpoint_drops_the_cached_sets(self):
+        client = APIClient()
+        token = RefreshToken.for_user(self.player).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(graph.follows_of(self.player.id), {self.academy.id})
 
-# Create your tests here.
+        with mock.patch("user_profile.views.remove_author_from_timeline"), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                reverse("unfollow"), {"academy": self.academy.id}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(graph.follows_of(self.player.id), set())
+        self.assertEqual(graph.followers_of(self.academy.id), set())
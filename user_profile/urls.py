@@ -59,4 +59,5 @@ urlpatterns = [
     ),
     path("unfollow", unfollow, name="unfollow"),
     path("friend_suggestion", FriendSuggestion.as_view(), name="friend_suggestion"),
+    path("mutual_friends/<int:id>", MutualFriends.as_view(), name="mutual_friends"),
 ]
@@ -1,11 +1,12 @@
-import os
-
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from common.custom_pagination_class import StandardResultsSetPagination
 from common.custom_permission_classes import (IsPlayer,
                                               IsUser)
+from common.toggles import delete_returning, insert_ignore
 from django.core.cache import cache
-from django.db.models import Q
+from django.core.files.storage import default_storage
+from post.tasks import merge_author_into_timeline, remove_author_from_timeline
 from real_time.models import Notification
 from rest_framework import generics, status, views, viewsets
 from rest_framework.decorators import action
@@ -16,13 +17,18 @@ from users.serializers.user_serializer import (CustomUsersSerializer,
                                                SportSerializer,
                                                UserProfileSerializer)
 
-from .models import Achievements, Follow, FriendRequest, UserAcademy
+from . import graph
+from .models import (Achievements, Follow, FriendRequest, SuggestedFriend,
+                     UserAcademy)
+from .relationships import RelationshipContext
 from .serializers.about_serializer import AboutSerializer
 from .serializers.achievement_serializer import AchievementSerializer
 from .serializers.connection_serializer import (FollowSerializer,
                                                 FriendListSerializer,
                                                 FriendRequestSerializer)
 from .serializers.useracademy_serializer import UserAcademySerializer
+from .suggestions import compute_friend_suggestions, suggestions_computed
+from .tasks import refresh_friend_suggestions
 
 
 class ProfileData(views.APIView):
@@ -60,44 +66,19 @@ class ProfileData(views.APIView):
 
             friend_status = None
             if user.is_academy:
-                followers = Follow.objects.filter(academy=user).count()
+                followers = len(graph.followers_of(user.id))
 
+            mutual_friends = None
             if not own_profile:
-                if user.is_academy:
-                    print("if user is acadey")
-                    following = Follow.objects.filter(
-                        player=request.user, academy=user
-                    ).first()
-                    if following:
-                        friend_status = "following"
-                    else:
-                        friend_status = "follow"
-                elif request.user.is_academy:
-                    print("if requested user is academy")
-                    following = Follow.objects.filter(
-                        player=user, academy=request.user
-                    ).first()
-                    if following:
-                        friend_status = "follower"
-                    else:
-                        friend_status = "notfollower"
-                else:
-                    friend_request = FriendRequest.objects.filter(
-                        from_user=user, to_user=request.user
-                    ).first()
-                    if friend_request:
-                        friend_status = "received"
-                    else:
-                        friend_request = FriendRequest.objects.filter(
-                            from_user=request.user, to_user=user
-                        ).first()
-                        if friend_request:
-                            friend_status = "sent"
-                        else:
-                            if user.friends.filter(id=request.user.id).exists():
-                                friend_status = "friends"
-                            else:
-                                friend_status = "none"
+                friend_status = RelationshipContext(
+                    request.user, [user.id]
+                ).relationship_status(user)
+                if not user.is_academy and not request.user.is_academy:
+                    count, friends = graph.mutual_friends(request.user.id, user.id)
+                    mutual_friends = {
+                        "count": count,
+                        "friends": FriendListSerializer(friends, many=True).data,
+                    }
 
             #  if there is no cached data fetch new datas
             if not user_data:
@@ -136,6 +117,7 @@ class ProfileData(views.APIView):
 
             user_data["own_profile"] = own_profile
             user_data["friend_status"] = friend_status
+            user_data["mutual_friends"] = mutual_friends
             if user.is_academy:
                 user_data["followers"] = (
                     followers  # add followers count with responce if user is academy
@@ -245,8 +227,8 @@ class UpdatePhoto(views.APIView):
                     "profile_photo", None
                 ):  # check whether data has profile photo or cover photo
                     new_photo = serializer.validated_data.get("profile_photo", None)
-                    oldpath = (
-                        profile.profile_photo.path
+                    old_photo = (
+                        profile.profile_photo.name
                         if (profile.profile_photo and new_photo)
                         else None
                     )
@@ -255,8 +237,8 @@ class UpdatePhoto(views.APIView):
 
                 elif serializer.validated_data.get("cover_photo", None):
                     new_photo = serializer.validated_data.get("cover_photo", None)
-                    oldpath = (
-                        profile.cover_photo.path
+                    old_photo = (
+                        profile.cover_photo.name
                         if (profile.cover_photo and new_photo)
                         else None
                     )
@@ -271,8 +253,8 @@ class UpdatePhoto(views.APIView):
                     )
                 profile.save()
                 serializer.save()
-                if oldpath and os.path.exists(oldpath):
-                    os.remove(oldpath)
+                if old_photo:
+                    default_storage.delete(old_photo)
 
                 cache_key = f"profile_{user.id}"
                 cache.delete(cache_key)  # Invalidate cache after update
@@ -305,13 +287,13 @@ class UpdatePhoto(views.APIView):
             user = request.user
             data = request.data
             profile = UserProfile.objects.get(user=user)
-            oldpath = None
+            old_photo = None
             if "type" in data and data["type"] == "profile":
-                oldpath = profile.profile_photo.path if profile.profile_photo else None
+                old_photo = profile.profile_photo.name if profile.profile_photo else None
                 profile.profile_photo = None
                 message = "Profile Photo deleted successfully"
             elif "type" in data and data["type"] == "cover":
-                oldpath = profile.cover_photo.path if profile.cover_photo else None
+                old_photo = profile.cover_photo.name if profile.cover_photo else None
                 profile.cover_photo = None
                 message = "Cover Photo deleted successfully"
             else:
@@ -321,8 +303,8 @@ class UpdatePhoto(views.APIView):
                     },status.HTTP_400_BAD_REQUEST
                 )
             profile.save()
-            if oldpath and os.path.exists(oldpath):
-                os.remove(oldpath)
+            if old_photo:
+                default_storage.delete(old_photo)
 
             cache_key = f"profile_{user.id}"
             cache.delete(cache_key)  # Invalidate cache after delete
@@ -478,15 +460,14 @@ class FriendRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if FriendRequest.objects.filter(from_user=from_user, to_user=to_user).exists():
+        friend_request = insert_ignore(
+            FriendRequest, from_user=from_user, to_user=to_user
+        )
+        if friend_request is None:
             return Response(
                 {"message": "Friend Request already sent.."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        friend_request = FriendRequest.objects.create(
-            from_user=from_user, to_user=to_user
-        )
         serializer = self.get_serializer(friend_request)
         cache_key1 = f"profile_{from_user.id}"
         cache_key2 = f"profile_{to_user.id}"
@@ -550,6 +531,9 @@ class FriendRequestViewSet(viewsets.ModelViewSet):
             )
 
         friend_request.accept()  # Use the model method to establish friendship
+        merge_author_into_timeline.delay(friend_request.from_user.id, request.user.id)
+        merge_author_into_timeline.delay(request.user.id, friend_request.from_user.id)
+        refresh_friend_suggestions.delay([request.user.id, friend_request.from_user.id])
 
         notification_type = "friend_request_accept"
         text = f"{friend_request.to_user.username} accepted your friend request"
@@ -641,6 +625,9 @@ class FriendViewSet(viewsets.ModelViewSet):
 
             user.friends.remove(friend)
             friend.friends.remove(user)
+            remove_author_from_timeline.delay(user.id, friend.id)
+            remove_author_from_timeline.delay(friend.id, user.id)
+            refresh_friend_suggestions.delay([user.id, friend.id])
 
             cache_key1 = f"profile_{id}"
             cache_key2 = f"profile_{user.id}"
@@ -686,13 +673,13 @@ class FollowViewSet(viewsets.ModelViewSet):
         academy_id = data["academy"]
         academy = Users.objects.get(id=academy_id)
 
-        if Follow.objects.filter(player=player, academy=academy).exists():
+        follow = insert_ignore(Follow, player=player, academy=academy)
+        if follow is None:
             return Response(
                 {"message": "Already following this academy"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        follow = Follow.objects.create(player=player, academy=academy)
+        merge_author_into_timeline.delay(player.id, academy.id)
 
         # Notify the academy about the new follower
         notification_type = "follow"
@@ -742,9 +729,8 @@ class FollowViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        follow = Follow.objects.filter(player=player, academy=academy_id).first()
-        if follow:
-            follow.delete()
+        if delete_returning(Follow, player=player, academy=academy_id):
+            remove_author_from_timeline.delay(player.id, academy_id)
             cache_key1 = f"profile_{player.id}"
             cache_key2 = f"profile_{academy_id}"
             cache.delete(cache_key1)
@@ -757,33 +743,48 @@ class FollowViewSet(viewsets.ModelViewSet):
 
 
 class FriendSuggestion(views.APIView):
+    """
+    Suggest players the user may know, read from the precomputed suggestions
+    (best mutual friends, shared sports and district first).
+    """
+    SUGGESTION_COUNT = 7
+
     def get(self, request, *args, **kwargs):
         user = request.user
 
-        user_profile = UserProfile.objects.get(user=user)
+        suggestions = SuggestedFriend.objects.filter(user=user)
+        if not suggestions_computed(user):
+            # not computed yet (new user), the refresh tasks keep it current after
+            compute_friend_suggestions(user)
 
-        friends = user.friends.all()
+        friend_ids = graph.friends_of(user.id)
+        suggested = [
+            suggestion.suggested
+            for suggestion in suggestions.exclude(suggested__in=friend_ids)
+            .select_related("suggested__userprofile")
+            .order_by("-score", "suggested_id")[: self.SUGGESTION_COUNT]
+        ]
+        serializer = FriendListSerializer(suggested, many=True)
 
-        friends_of_friends = Users.objects.filter(friends__in=friends)
+        return Response(serializer.data)
 
-        suggestions = (
-            (
-                friends_of_friends
-                | Users.objects.filter(
-                    Q(userprofile__district=user_profile.district)
-                    | Q(
-                        sport__sport_name__in=user.sport_set.values_list(
-                            "sport_name", flat=True
-                        )
-                    )
-                )
-            )
-            .exclude(is_academy=True)
-            .distinct()
-        )
 
-        suggestions = suggestions.exclude(Q(id=user.id) | Q(id__in=friends))
+class MutualFriends(views.APIView):
+    """
+    List the friends the current user has in common with another player, a
+    page at a time.
+    """
 
-        serializer = FriendListSerializer(suggestions[:7], many=True)
+    permission_classes = [IsPlayer, IsAuthenticated]
 
-        return Response(serializer.data)
+    def get(self, request, id):
+        ids = sorted(graph.mutual_friend_ids(request.user.id, id))
+        paginator = StandardResultsSetPagination()
+        page_ids = paginator.paginate_queryset(ids, request, view=self)
+        friends = (
+            Users.objects.filter(id__in=page_ids)
+            .select_related("userprofile")
+            .order_by("id")
+        )
+        serializer = FriendListSerializer(friends, many=True)
+        return paginator.get_paginated_response(serializer.data)
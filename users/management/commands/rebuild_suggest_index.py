@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.suggest import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search-as-you-type index of users and trials in Redis."
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} users and trials"))
@@ -38,10 +38,12 @@ class JWTAuthenticationMiddleware:
             "/resend_otp",
             "/forget_pass",
             "/google",
+            "/upload_url",  # academy licenses are uploaded before signup
         ]
 
         print(request.path, "path in middleware")
         # Skip authentication for public URLs and certain path prefixes
+        # (uploads are served by uploads.views.serve_media)
         if (
             request.path in public_urls
             or request.path.startswith("/media/")
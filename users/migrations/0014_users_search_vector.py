@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0013_userprofile_image_variants'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='users',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='users',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='users_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='users',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['username'], name='users_username_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE users_users AS u SET search_vector =
+                setweight(to_tsvector('english', coalesce(u.username, '')), 'A')
+                || setweight(to_tsvector('english', coalesce(
+                    (SELECT p.bio FROM users_userprofile AS p WHERE p.user_id = u.id),
+                    ''
+                )), 'B')
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
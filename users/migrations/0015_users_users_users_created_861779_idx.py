@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0014_users_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='users',
+            index=models.Index(fields=['created_at'], name='users_users_created_861779_idx'),
+        ),
+    ]
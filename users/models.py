@@ -1,5 +1,7 @@
 from common.base_models import DataBaseModels
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 
@@ -81,6 +83,8 @@ class Users(AbstractUser):
         friends (ManyToManyField): Many-to-many relationship with other users.
         created_at (datetime): Timestamp when the user was created.
         updated_at (datetime): Timestamp when the user was last updated.
+        search_vector (SearchVectorField): Username and bio for full text search,
+            kept current by users.signals.
     """
 
     username = models.CharField(max_length=255, blank=True, null=True, db_index=True)
@@ -95,6 +99,7 @@ class Users(AbstractUser):
     friends = models.ManyToManyField("self", symmetrical=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = [
@@ -106,7 +111,16 @@ class Users(AbstractUser):
         return f"{self.username}user instance"
 
     class Meta:
-        indexes = [models.Index(fields=["username"])]
+        indexes = [
+            models.Index(fields=["username"]),
+            models.Index(fields=["created_at"]),
+            GinIndex(fields=["search_vector"], name="users_search_vector_idx"),
+            GinIndex(
+                fields=["username"],
+                name="users_username_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
 
 class Sport(DataBaseModels):
@@ -139,6 +153,7 @@ class UserProfile(DataBaseModels):
         district (str): User's district.
         profile_photo (ImageField): Profile photo of the user.
         cover_photo (ImageField): Cover photo of the user.
+        image_variants (JSONField): Resized copies of the photos, filled in by the uploads app.
     """
     user = models.OneToOneField(
         Users, on_delete=models.CASCADE, null=True, related_name="userprofile"
@@ -149,6 +164,7 @@ class UserProfile(DataBaseModels):
     district = models.CharField(max_length=255, null=True, blank=True)
     profile_photo = models.ImageField(upload_to="images/", null=True, blank=True)
     cover_photo = models.ImageField(upload_to="images/", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return str(self.user.username) + "profile instance" + str(self.bio)
@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
+from uploads.fields import DirectUploadFileField, DirectUploadSerializerMixin
 from users.models import Academy, Sport, UserProfile, Users
 
 
@@ -15,7 +17,7 @@ class SportSerializer(ModelSerializer):
         fields = ["sport_name"]
 
 
-class CustomUsersSerializer(ModelSerializer):
+class CustomUsersSerializer(DirectUploadSerializerMixin, ModelSerializer):
     """
     Serializer for the Users model with additional fields and nested serializers.
 
@@ -23,7 +25,7 @@ class CustomUsersSerializer(ModelSerializer):
         sport (ListField): List of sport names associated with the user.
         district (str): User's district.
         state (str): User's state.
-        license (FileField): Academy license file.
+        license (FileField): Academy license file, or the key of a direct upload.
         friends (PrimaryKeyRelatedField): List of user IDs representing friends.
     """
     sport = serializers.ListField(
@@ -31,7 +33,7 @@ class CustomUsersSerializer(ModelSerializer):
     )
     district = serializers.CharField(max_length=255, required=False)
     state = serializers.CharField(max_length=255, required=False)
-    license = serializers.FileField(required=False)
+    license = DirectUploadFileField(target="license", required=False)
     friends = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Users.objects.all(), required=False
     )
@@ -59,18 +61,20 @@ class CustomUsersSerializer(ModelSerializer):
         sports = validated_data.pop("sport")
         state = validated_data.pop("state")
         district = validated_data.pop("district")
-        license = validated_data.pop("license", None)
         password = validated_data.pop("password")
-        instance = super().create(validated_data)
-        instance.set_password(password)
-        instance.save()
-        """create a new instance of sport and userprofile to store sportname 
-         district and state """
-        for sport in sports:
-            Sport.objects.create(user=instance, sport_name=sport)
-        UserProfile.objects.create(user=instance, district=district, state=state)
-        if license:
-            Academy.objects.create(user=instance, license=license)
+        with transaction.atomic():
+            self.claim_direct_uploads(validated_data)
+            license = validated_data.pop("license", None)
+            instance = super().create(validated_data)
+            instance.set_password(password)
+            instance.save()
+            """create a new instance of sport and userprofile to store sportname 
+             district and state """
+            for sport in sports:
+                Sport.objects.create(user=instance, sport_name=sport)
+            UserProfile.objects.create(user=instance, district=district, state=state)
+            if license:
+                Academy.objects.create(user=instance, license=license)
         return instance
 
 
@@ -1,3 +1,149 @@
+from common.search import invalidate_search, weighted_vector
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from selection_trial.models import Trial, trial_search_vector
+
+from . import suggest
+from .models import UserProfile, Users
+
+
+def update_user_search_vector(user):
+    """
+    Refresh the search vector of a user from the username and profile bio.
+    """
+    bio = (
+        UserProfile.objects.filter(user=user).values_list("bio", flat=True).first()
+    )
+    Users.objects.filter(pk=user.pk).update(
+        search_vector=weighted_vector(("username", "A"), (Value(bio or ""), "B"))
+    )
+
+
+@receiver(post_save, sender=Users)
+def update_search_vector_on_user_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal to refresh the search vectors of a user, and of the trials of an
+    academy (they include its username), when the username may have changed.
+    """
+    if update_fields is not None and "username" not in update_fields:
+        return
+    update_user_search_vector(instance)
+    if instance.is_academy:
+        Trial.objects.filter(academy=instance).update(
+            search_vector=trial_search_vector(instance.username)
+        )
+
+
+@receiver(post_save, sender=UserProfile)
+def update_search_vector_on_profile_save(sender, instance, **kwargs):
+    """
+    Signal to refresh the search vector of a user when the bio may have changed.
+    """
+    if instance.user_id:
+        update_user_search_vector(instance.user)
+
+
+def update_suggest_index(update, *args):
+    """
+    Apply a change to the autocomplete index once the transaction is committed.
+    A failure only leaves the index stale until the next change or rebuild.
+    """
+    def apply():
+        try:
+            update(*args)
+        except Exception as e:
+            print(e, "error in updating suggest index")
+
+    transaction.on_commit(apply)
+
+
+# fields of a user that appear in suggestions (see suggest.user_item)
+SUGGESTED_USER_FIELDS = {"username", "is_active", "is_staff", "is_academy"}
+
+
+@receiver(post_save, sender=Users)
+def index_user_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SUGGESTED_USER_FIELDS & set(update_fields):
+        return
+    update_suggest_index(suggest.index_user, instance)
+
+
+@receiver(post_save, sender=UserProfile)
+def index_user_on_profile_save(sender, instance, **kwargs):
+    if instance.user_id:
+        update_suggest_index(suggest.index_user, instance.user)
+
+
+@receiver(post_delete, sender=Users)
+def remove_user_from_index(sender, instance, **kwargs):
+    update_suggest_index(suggest.index_item, "user", instance.id, None)
+
+
+@receiver(post_save, sender=Trial)
+def index_trial_on_save(sender, instance, **kwargs):
+    update_suggest_index(suggest.index_trial, instance)
+
+
+@receiver(post_delete, sender=Trial)
+def remove_trial_from_index(sender, instance, **kwargs):
+    update_suggest_index(suggest.index_item, "trial", instance.id, None)
+
+
+# fields of a user that appear in search results
+SEARCHED_USER_FIELDS = {"username", "is_academy", "is_staff"}
+
+
+@receiver(post_save, sender=Users)
+def invalidate_search_on_user_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or SEARCHED_USER_FIELDS & set(update_fields):
+        invalidate_search("users")
+
+
+# fields of a profile that appear in search results
+SEARCHED_PROFILE_FIELDS = ("user_id", "bio", "profile_photo")
+
+
+@receiver(pre_save, sender=UserProfile)
+def check_searched_profile_fields(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal to remember if a profile save changes what search results show, most
+    profile edits (about, state, cover photo) keep the cached results.
+    """
+    if update_fields is not None:
+        instance._search_changed = bool(
+            {"user", *SEARCHED_PROFILE_FIELDS} & set(update_fields)
+        )
+        return
+    old = (
+        UserProfile.objects.filter(pk=instance.pk)
+        .values_list(*SEARCHED_PROFILE_FIELDS)
+        .first()
+        if instance.pk
+        else None
+    )
+    new = (instance.user_id, instance.bio, instance.profile_photo.name or "")
+    instance._search_changed = old is None or (old[0], old[1], old[2] or "") != new
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_search_on_profile_save(sender, instance, **kwargs):
+    if getattr(instance, "_search_changed", True):
+        invalidate_search("users")
+
+
+@receiver(post_delete, sender=Users)
+def invalidate_search_on_user_delete(sender, instance, **kwargs):
+    invalidate_search("users")
+
+
+@receiver(post_save, sender=Trial)
+@receiver(post_delete, sender=Trial)
+def invalidate_search_on_trial_change(sender, instance, **kwargs):
+    invalidate_search("trials")
+
+
 # from django.db.models.signals import post_save
 # from django.dispatch import receiver
 # from .models import Users
@@ -0,0 +1,273 @@
+import itertools
+import json
+
+from common.redis_client import get_redis_client
+from redis.exceptions import WatchError
+from selection_trial.models import Trial
+from uploads.images import variant_path
+
+from .models import UserProfile, Users
+
+# Search-as-you-type index.
+#
+# Every searchable name (players, academies, active trials) is stored in Redis
+# sorted sets where all members have score 0, so Redis keeps them in
+# lexicographic order and ZRANGEBYLEX returns the names starting with a prefix in
+# O(log n). A member is "<term>\0<item json>", the term being the lowercased name
+# or one of its later words (so "kochi strikers" is found by "kochi" and by
+# "strik") and the item what the suggestion shows, so a lookup reads two ranges:
+# the users, and the trials players see or the ones of the academy searching.
+# SUGGEST_ITEMS remembers the sets and members of every item to replace them on
+# changes, and SUGGEST_READY tells a built index apart from a missing one.
+USERS_INDEX = "suggest:users"
+TRIALS_INDEX = "suggest:trials"
+ACADEMY_TRIALS_INDEX = "suggest:trials:{academy}"
+SUGGEST_ITEMS = "suggest:entries"
+SUGGEST_READY = "suggest:ready"
+SUGGEST_LIMIT = 8
+# matches read from each set before picking the closest SUGGEST_LIMIT
+SUGGEST_FETCH = 32
+SEPARATOR = "\0"
+REBUILD_BATCH = 2000
+REBUILD_SUFFIX = ":rebuild"
+# cache key held while a rebuild queued by a missing index runs
+REBUILD_LOCK = "suggest:rebuild-queued"
+REBUILD_LOCK_TTL = 600
+# tries of an entry update racing other updates of the index
+REPLACE_ATTEMPTS = 3
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def name_terms(name):
+    """
+    Return the terms `name` is found by: the whole name from every word on.
+    """
+    words = normalize(name).split(" ")
+    return [" ".join(words[index:]) for index in range(len(words)) if words[index]]
+
+
+def item_key(kind, item_id):
+    return f"{kind}:{item_id}"
+
+
+def user_item(user, profile=None):
+    """
+    Return the suggestion shown for a user, or None if the user is not searchable.
+    """
+    if user.is_staff or not user.is_active or not user.username:
+        return None
+    photo = ""
+    if profile is not None and profile.profile_photo:
+        photo = variant_path(
+            profile.image_variants, "profile_photo", profile.profile_photo.name, "thumb"
+        )
+    return {
+        "id": user.id,
+        "name": user.username,
+        "type": "Academy" if user.is_academy else "Player",
+        "photo": photo,
+    }
+
+
+def trial_item(trial):
+    """
+    Return the suggestion shown for a trial, or None if the trial is not searchable.
+    """
+    if not trial.is_active or not trial.name:
+        return None
+    photo = ""
+    if trial.image:
+        photo = variant_path(trial.image_variants, "image", trial.image.name, "thumb")
+    return {
+        "id": trial.id,
+        "name": trial.name,
+        "type": "Trial",
+        "photo": photo,
+        "academy": trial.academy_id,
+    }
+
+
+def item_indexes(item):
+    """
+    Return the sorted sets `item` is stored in.
+    """
+    if item["type"] != "Trial":
+        return [USERS_INDEX]
+    return [TRIALS_INDEX, ACADEMY_TRIALS_INDEX.format(academy=item["academy"])]
+
+
+def _members(item):
+    data = json.dumps(item, separators=(",", ":"))
+    return [f"{term}{SEPARATOR}{data}" for term in name_terms(item["name"])]
+
+
+def _add(pipe, key, item, suffix=""):
+    entry = {"indexes": item_indexes(item), "members": _members(item)}
+    for index in entry["indexes"]:
+        pipe.zadd(index + suffix, dict.fromkeys(entry["members"], 0))
+    pipe.hset(SUGGEST_ITEMS + suffix, key, json.dumps(entry))
+
+
+def _replace(pipe, key, item):
+    """
+    Replace the members of `key` with those of `item` (None removes it from the
+    index). `pipe` watches SUGGEST_ITEMS, so the replacement is dropped if
+    another change of the index committed since the old entry was read.
+    """
+    old_entry = pipe.hget(SUGGEST_ITEMS, key)
+    pipe.multi()
+    if old_entry:
+        old_entry = json.loads(old_entry)
+        for index in old_entry["indexes"]:
+            pipe.zrem(index, *old_entry["members"])
+    if item is None:
+        pipe.hdel(SUGGEST_ITEMS, key)
+    else:
+        _add(pipe, key, item)
+    pipe.execute()
+
+
+def index_item(kind, item_id, item):
+    """
+    Add, update (or with `item` None, remove) one entry of the index.
+
+    Raises:
+    - WatchError: If the index kept changing while the old entry was read.
+    """
+    key = item_key(kind, item_id)
+    client = get_redis_client()
+    for attempt in range(REPLACE_ATTEMPTS):
+        with client.pipeline() as pipe:
+            pipe.watch(SUGGEST_ITEMS)
+            try:
+                _replace(pipe, key, item)
+                return
+            except WatchError:
+                continue
+    raise WatchError(f"suggest index changed while replacing {key}")
+
+
+def index_user(user):
+    profile = UserProfile.objects.filter(user=user).first()
+    index_item("user", user.id, user_item(user, profile))
+
+
+def index_trial(trial):
+    index_item("trial", trial.id, trial_item(trial))
+
+
+def rebuild_index():
+    """
+    Rebuild the whole index from the database.
+
+    The new index is written next to the live one and swapped in at the end, so
+    suggestions keep working during the rebuild.
+
+    Returns:
+        int: The number of indexed users and trials.
+    """
+    client = get_redis_client()
+    for key in client.scan_iter(match=f"suggest:*{REBUILD_SUFFIX}"):
+        client.delete(key)
+
+    users = Users.objects.filter(is_staff=False, is_active=True).select_related(
+        "userprofile"
+    )
+    entries = (
+        (item_key("user", user.id), user_item(user, getattr(user, "userprofile", None)))
+        for user in users.iterator(chunk_size=REBUILD_BATCH)
+    )
+    trials = Trial.objects.filter(is_active=True)
+    trial_entries = (
+        (item_key("trial", trial.id), trial_item(trial))
+        for trial in trials.iterator(chunk_size=REBUILD_BATCH)
+    )
+
+    count = 0
+    indexes = set()
+    pipe = client.pipeline(transaction=False)
+    for key, item in itertools.chain(entries, trial_entries):
+        if item is None:
+            continue
+        _add(pipe, key, item, REBUILD_SUFFIX)
+        indexes.update(item_indexes(item))
+        count += 1
+        if count % REBUILD_BATCH == 0:
+            pipe.execute()
+    pipe.execute()
+
+    # sets left without members (e.g. academies with no active trial) are dropped
+    academy_indexes = {
+        key.decode()
+        for key in client.scan_iter(match=ACADEMY_TRIALS_INDEX.format(academy="*"))
+        if not key.endswith(REBUILD_SUFFIX.encode())
+    }
+    stale = (academy_indexes | {USERS_INDEX, TRIALS_INDEX}) - indexes
+    pipe = client.pipeline()
+    for index in indexes:
+        pipe.rename(index + REBUILD_SUFFIX, index)
+    if count:
+        pipe.rename(SUGGEST_ITEMS + REBUILD_SUFFIX, SUGGEST_ITEMS)
+    else:
+        stale.add(SUGGEST_ITEMS)
+    if stale:
+        pipe.delete(*stale)
+    pipe.set(SUGGEST_READY, 1)
+    pipe.execute()
+    return count
+
+
+def suggest(prefix, limit=SUGGEST_LIMIT, academy=None):
+    """
+    Return up to `limit` items whose name, or a later word of it, starts with
+    `prefix`, shortest names first, or None if the index is not built (new
+    deploy, Redis flush) and the caller should fall back to the database.
+
+    Args:
+        academy (int, optional): Only suggest the trials of this academy,
+            academies search their own trials only.
+    """
+    prefix = normalize(prefix)
+    if not prefix:
+        return []
+    trials_index = TRIALS_INDEX
+    if academy is not None:
+        trials_index = ACADEMY_TRIALS_INDEX.format(academy=academy)
+    start = b"[" + prefix.encode()
+
+    pipe = get_redis_client().pipeline(transaction=False)
+    pipe.exists(SUGGEST_READY)
+    for index in (USERS_INDEX, trials_index):
+        pipe.zrangebylex(index, start, start + b"\xff", start=0, num=SUGGEST_FETCH)
+    ready, users, trials = pipe.execute()
+    if not ready:
+        return None
+
+    items = {}
+    for member in users + trials:
+        term, data = member.decode().split(SEPARATOR, 1)
+        item = json.loads(data)
+        items.setdefault((item["type"], item["id"]), item)
+    return sorted(items.values(), key=lambda item: len(item["name"]))[:limit]
+
+
+def suggest_from_database(prefix, limit=SUGGEST_LIMIT, academy=None):
+    """
+    Same as `suggest` straight from the database, used when Redis or the index
+    is unavailable. Only matches the start of the whole name.
+    """
+    prefix = normalize(prefix)
+    if not prefix:
+        return []
+    users = Users.objects.filter(
+        username__istartswith=prefix, is_staff=False, is_active=True
+    ).select_related("userprofile")[:limit]
+    trials = Trial.objects.filter(name__istartswith=prefix, is_active=True)
+    if academy is not None:
+        trials = trials.filter(academy=academy)
+    items = [user_item(user, getattr(user, "userprofile", None)) for user in users]
+    items.extend(trial_item(trial) for trial in trials[:limit])
+    return sorted(items, key=lambda item: len(item["name"]))[:limit]
@@ -2,8 +2,10 @@ import random
 
 from celery import shared_task
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import send_mail
 
+from . import suggest
 from .models import Users
 
 
@@ -58,3 +60,16 @@ def delete_otp(id):
         user.save()
     except Exception as e:
         print(f"error deletin otp{e} eror")
+
+
+@shared_task
+def rebuild_suggest_index():
+    """
+    Rebuilds the search-as-you-type index, queued by SearchSuggest when the
+    index is missing (new deploy, Redis flush).
+    """
+    try:
+        count = suggest.rebuild_index()
+        print(count, "users and trials indexed")
+    finally:
+        cache.delete(suggest.REBUILD_LOCK)
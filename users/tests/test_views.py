@@ -1,11 +1,14 @@
+import fakeredis
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from django.core.exceptions import ValidationError
 from rest_framework import status
 from rest_framework.test import APIClient
 from users.models import Users, Academy,UserProfile, Sport
+from users.views import SearchResult
 from real_time.models import Notification
-from unittest.mock import patch
+from unittest.mock import MagicMock, call, patch
 
 class SignupViewTest(TestCase):
     def setUp(self):
@@ -333,3 +336,320 @@ class ForgetPasswordViewTestCase(TestCase):
         response = self.client.post(self.forget_password_url, {'email': 'testuser@example.com'})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data['message'], 'Internal Server Error')
+
+
+class SearchResultTest(TestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from selection_trial.models import Trial
+
+        cache.clear()
+        self.client = APIClient()
+        self.user = Users.objects.create_user(
+            email='searcher@example.com', username='searcher', password='testpass123'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.sachin = Users.objects.create_user(
+            email='sachin@example.com', username='sachin', password='testpass123'
+        )
+        UserProfile.objects.create(user=self.sachin, bio='Opening batsman from Mumbai')
+        self.academy = Users.objects.create_user(
+            email='academy@example.com',
+            username='Kochi Strikers',
+            password='testpass123',
+            is_academy=True,
+        )
+        Trial.objects.create(
+            academy=self.academy, name='Under 19 selection', sport='Cricket'
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            (result['type'], result['name']) for result in response.json()['results']
+        ]
+
+    def test_search_matches_bio_words(self):
+        self.assertIn(('Player', 'sachin'), self.search('opens Mumbai'))
+
+    def test_search_tolerates_typos_and_partial_names(self):
+        self.assertIn(('Player', 'sachin'), self.search('sachn'))
+        self.assertIn(('Player', 'sachin'), self.search('sach'))
+
+    def test_trials_match_sport_and_academy(self):
+        self.assertIn(('Trial', 'Under 19 selection'), self.search('cricket'))
+        self.assertIn(('Trial', 'Under 19 selection'), self.search('strikers'))
+
+    def test_academy_rename_updates_trial_vector(self):
+        self.academy.username = 'Calicut Kings'
+        self.academy.save()
+        self.assertNotIn(('Trial', 'Under 19 selection'), self.search('strikers'))
+        self.assertIn(('Trial', 'Under 19 selection'), self.search('kings'))
+
+    def test_statuses_cost_a_fixed_number_of_queries(self):
+        from user_profile.models import Follow, FriendRequest
+
+        for index in range(5):
+            player = Users.objects.create_user(
+                email=f'sachin{index}@example.com',
+                username=f'sachin{index}',
+                password='testpass123',
+            )
+            FriendRequest.objects.create(from_user=self.user, to_user=player)
+        Follow.objects.create(player=self.user, academy=self.academy)
+        self.user.friends.add(player)
+        player.friends.add(self.sachin)
+
+        # auth, users, trials, follows, followers, friend requests, friends,
+        # mutual friends: the graph sets are built from the database on this
+        # request, in a Redis of their own so none is cached yet
+        with patch('user_profile.graph.get_redis_client', return_value=fakeredis.FakeRedis()), \
+                self.assertNumQueries(8):
+            response = self.client.get(reverse('search'), {'q': 'sachin'})
+        results = response.json()['results']
+        self.assertEqual(len(results), 6)
+        statuses = {result['name']: result['friend_status'] for result in results}
+        self.assertEqual(statuses['sachin0'], 'request_sent')
+        self.assertEqual(statuses['sachin'], 'none')
+        mutual = {result['name']: result['mutual_friends'] for result in results}
+        self.assertEqual(mutual['sachin'], 1)
+        self.assertEqual(mutual['sachin0'], 0)
+
+        response = self.client.get(reverse('search'), {'q': 'strikers'})
+        academy = response.json()['results'][0]
+        self.assertEqual(academy['follow_status'], 'following')
+
+    def test_identical_searches_are_cached_with_viewer_statuses(self):
+        from user_profile.models import FriendRequest
+
+        self.search('Sachin ')
+        other = Users.objects.create_user(
+            email='other@example.com', username='other', password='testpass123'
+        )
+        FriendRequest.objects.create(from_user=other, to_user=self.sachin)
+        from rest_framework_simplejwt.tokens import RefreshToken
+        token = RefreshToken.for_user(other).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        # auth, follows, followers, friend requests, friends, mutual friends:
+        # no search queries (the graph is read from the database, the number of
+        # queries with Redis depends on the sets already cached)
+        with patch('user_profile.graph._client', return_value=None), \
+                self.assertNumQueries(6):
+            response = self.client.get(reverse('search'), {'q': 'sachin'})
+        result = response.json()['results'][0]
+        self.assertEqual(result['name'], 'sachin')
+        self.assertEqual(result['friend_status'], 'request_sent')
+
+    def test_saving_a_trial_invalidates_cached_searches(self):
+        from selection_trial.models import Trial
+
+        self.assertNotIn(('Trial', 'Cricket camp'), self.search('cricket'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Trial.objects.create(academy=self.academy, name='Cricket camp')
+        self.assertIn(('Trial', 'Cricket camp'), self.search('cricket'))
+
+    def test_only_searched_profile_fields_invalidate_cached_searches(self):
+        from common.search import SEARCH_TAG_KEY
+
+        key = SEARCH_TAG_KEY.format(tag='users')
+        self.search('sachin')
+        version = cache.get(key)
+        profile = self.sachin.userprofile
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.about = 'Right handed'
+            profile.save()
+        self.assertEqual(cache.get(key), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.bio = 'Captain'
+            profile.save()
+        self.assertNotEqual(cache.get(key), version)
+
+    def test_results_are_paginated(self):
+        for index in range(SearchResult.PAGE_SIZE + 5):
+            Users.objects.create_user(
+                email=f'runner{index}@example.com',
+                username=f'runner{index}',
+                password='testpass123',
+            )
+        response = self.client.get(reverse('search'), {'q': 'runner'})
+        self.assertEqual(len(response.json()['results']), SearchResult.PAGE_SIZE)
+        self.assertEqual(response.json()['next_page'], 2)
+
+        response = self.client.get(reverse('search'), {'q': 'runner', 'page': 2})
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertIsNone(response.json()['next_page'])
+
+
+class SearchSuggestTest(TestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from selection_trial.models import Trial
+
+        self.client = APIClient()
+        self.user = Users.objects.create_user(
+            email='searcher@example.com', username='searcher', password='testpass123'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.academy = Users.objects.create_user(
+            email='academy@example.com',
+            username='Kochi Strikers',
+            password='testpass123',
+            is_academy=True,
+        )
+        self.trial = Trial.objects.create(academy=self.academy, name='Kochi Open')
+
+    def test_name_terms_cover_every_word(self):
+        from users.suggest import name_terms
+
+        self.assertEqual(name_terms('  Kochi  Strikers '), ['kochi strikers', 'strikers'])
+
+    def test_suggest_reads_lexicographic_range(self):
+        from users import suggest
+
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+        pipe.execute.return_value = [
+            1,
+            [member.encode() for member in suggest._members(suggest.user_item(self.academy))],
+            [member.encode() for member in suggest._members(suggest.trial_item(self.trial))],
+        ]
+        with patch('users.suggest.get_redis_client', return_value=client):
+            response = self.client.get(reverse('search_suggest'), {'q': 'Kochi'})
+
+        pipe.exists.assert_called_once_with(suggest.SUGGEST_READY)
+        self.assertEqual(
+            pipe.zrangebylex.call_args_list,
+            [
+                call(index, b'[kochi', b'[kochi\xff', start=0, num=suggest.SUGGEST_FETCH)
+                for index in (suggest.USERS_INDEX, suggest.TRIALS_INDEX)
+            ],
+        )
+        self.assertEqual(
+            [(item['type'], item['name']) for item in response.json()['results']],
+            [('Trial', 'Kochi Open'), ('Academy', 'Kochi Strikers')],
+        )
+
+    def test_missing_index_falls_back_to_database_and_queues_rebuild(self):
+        cache.delete('suggest:rebuild-queued')
+        with patch('users.suggest.get_redis_client', return_value=fakeredis.FakeRedis()), \
+                patch('users.views.rebuild_suggest_index.delay') as rebuild:
+            for _ in range(2):
+                response = self.client.get(reverse('search_suggest'), {'q': 'koc'})
+                self.assertEqual(
+                    [item['name'] for item in response.json()['results']],
+                    ['Kochi Open', 'Kochi Strikers'],
+                )
+        # one rebuild for both requests
+        rebuild.assert_called_once_with()
+
+    def test_suggest_falls_back_to_database(self):
+        with patch('users.suggest.get_redis_client', side_effect=ConnectionError):
+            response = self.client.get(reverse('search_suggest'), {'q': 'koc'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['name'] for item in response.json()['results']],
+            ['Kochi Open', 'Kochi Strikers'],
+        )
+
+    def test_index_is_kept_up_to_date_in_redis(self):
+        from selection_trial.models import Trial
+        from users.task import rebuild_suggest_index
+
+        with patch('users.suggest.get_redis_client', return_value=fakeredis.FakeRedis()):
+            rebuild_suggest_index()
+            with self.captureOnCommitCallbacks(execute=True):
+                Trial.objects.create(academy=self.academy, name='Kochi Cup')
+                self.trial.delete()
+            response = self.client.get(reverse('search_suggest'), {'q': 'koc'})
+
+        self.assertEqual(
+            [item['name'] for item in response.json()['results']],
+            ['Kochi Cup', 'Kochi Strikers'],
+        )
+
+    def test_academy_suggestions_include_its_trials(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from selection_trial.models import Trial
+        from users import suggest
+
+        other = Users.objects.create_user(
+            email='other@example.com', username='other', password='testpass123',
+            is_academy=True,
+        )
+        Trial.objects.bulk_create(
+            Trial(academy=other, name=f'Kochi camp {index}')
+            for index in range(suggest.SUGGEST_FETCH)
+        )
+        token = RefreshToken.for_user(self.academy).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with patch('users.suggest.get_redis_client', return_value=fakeredis.FakeRedis()):
+            suggest.rebuild_index()
+            response = self.client.get(reverse('search_suggest'), {'q': 'koc'})
+
+        self.assertEqual(
+            [item['name'] for item in response.json()['results']],
+            ['Kochi Open', 'Kochi Strikers'],
+        )
+
+    def test_saves_update_the_index_on_commit(self):
+        from users import suggest
+
+        client = fakeredis.FakeRedis()
+        with patch('users.suggest.get_redis_client', return_value=client):
+            suggest.rebuild_index()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.trial.name = 'Kochi Cup'
+                self.trial.save()
+        for index in ('suggest:trials', f'suggest:trials:{self.academy.id}'):
+            members = [member.decode() for member in client.zrange(index, 0, -1)]
+            self.assertTrue(any(m.startswith('kochi cup\0') for m in members))
+            self.assertFalse(any(m.startswith('kochi open\0') for m in members))
+
+    def test_replacing_an_entry_retries_when_the_index_changes(self):
+        import json
+
+        from redis.exceptions import WatchError
+        from users import suggest
+
+        client = fakeredis.FakeRedis()
+        replace = suggest._replace
+
+        def racing_replace(pipe, key, item):
+            # another save of the trial commits between the read and the write
+            if racing_replace.calls == 0:
+                entry = json.dumps({'indexes': [], 'members': []})
+                client.hset(suggest.SUGGEST_ITEMS, key, entry)
+            racing_replace.calls += 1
+            replace(pipe, key, item)
+
+        racing_replace.calls = 0
+        with patch('users.suggest.get_redis_client', return_value=client), \
+                patch('users.suggest._replace', side_effect=racing_replace):
+            suggest.index_trial(self.trial)
+        self.assertEqual(racing_replace.calls, 2)
+        entry = json.loads(client.hget(suggest.SUGGEST_ITEMS, f'trial:{self.trial.id}'))
+        self.assertEqual(entry['indexes'][0], suggest.TRIALS_INDEX)
+
+        with patch('users.suggest.get_redis_client', return_value=client), \
+                patch('users.suggest._replace', side_effect=WatchError):
+            with self.assertRaises(WatchError):
+                suggest.index_trial(self.trial)
+
+    def test_login_saves_keep_the_index(self):
+        from django.utils import timezone
+
+        with patch('users.signals.suggest.index_user') as index_user:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.academy.last_login = timezone.now()
+                self.academy.save(update_fields=['last_login'])
+            index_user.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.academy.username = 'Kochi Rangers'
+                self.academy.save(update_fields=['username'])
+            index_user.assert_called_once_with(self.academy)
@@ -1,7 +1,7 @@
 from django.urls import path
 
 from .views import (ForgetPassword, GoogleSignIn, Login, Logout, ResendOtp,
-                    SearchResult, Signup, VerifyOtp)
+                    SearchResult, SearchSuggest, Signup, VerifyOtp)
 
 urlpatterns = [
     path("signup", Signup.as_view(), name="signup"),
@@ -12,4 +12,5 @@ urlpatterns = [
     path("resend_otp", ResendOtp.as_view(), name="resend_otp"),
     path("forget_pass", ForgetPassword.as_view(), name="forget_pass"),
     path("search", SearchResult.as_view(), name="search"),
+    path("search/suggest", SearchSuggest.as_view(), name="search_suggest"),
 ]
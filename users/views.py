@@ -1,6 +1,8 @@
+from common.search import cached_search, normalize_query, search
 from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import validate_email
-from django.db.models import Count, Q
+from django.db.models import Count
 from django.http import JsonResponse
 from real_time.models import Notification
 from rest_framework import status
@@ -9,13 +11,16 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from selection_trial.models import Trial
-from user_profile.models import Follow, FriendRequest
+from uploads.images import variant_path
+from user_profile import graph
+from user_profile.relationships import RelationshipContext
 from users.serializers.google_serializer import GoogleSignInSerializer
 from users.serializers.user_serializer import (CustomUsersSerializer,
                                                UserProfileSerializer)
 
+from . import suggest
 from .models import Academy, Users
-from .task import send_otp
+from .task import rebuild_suggest_index, send_otp
 
 
 class Signup(APIView):
@@ -413,138 +418,224 @@ class SearchResult(APIView):
     provided in the request. The search results include additional 
     information like friend and follow status, allowing for a more 
     detailed and contextual response.
+
+    Results are returned `PAGE_SIZE` at a time, best matches first, for at
+    most `MAX_PAGES` pages (`page` query param, `next_page` in the response).
     """
+    PAGE_SIZE = 20
+    MAX_PAGES = 5
+
     def get(self, request):
         current_user = request.user
-        query = request.GET.get("q", "")
+        query = normalize_query(request.GET.get("q", ""))
         if query:
-            # search for user based on username or bio content
-            users = (
-                Users.objects.filter(
-                    Q(username__icontains=query) | Q(userprofile__bio__icontains=query),
-                )
-                .select_related("userprofile")
-                .exclude(is_staff=True)
-                .annotate(
-                    friends_count=Count("friends", distinct=True),
-                    followers_count=Count("followers", distinct=True),
-                    is_friend=Count(
-                        "friends", filter=Q(friends__id=current_user.id), distinct=True
-                    ),
-                )
-                .values(
-                    "id",
-                    "username",
-                    "is_academy",
-                    "userprofile__profile_photo",
-                    "userprofile__bio",
-                    "friends_count",
-                    "followers_count",
-                    "is_friend",
-                )
+            try:
+                page = min(max(int(request.GET.get("page", 1)), 1), self.MAX_PAGES)
+            except ValueError:
+                page = 1
+            academy = current_user.id if current_user.is_academy else None
+            base_url = request.build_absolute_uri(settings.MEDIA_URL)
+
+            # the results are the same for every player (and for every visit of
+            # an academy), only the statuses below depend on the viewer
+            suggestions, has_more = cached_search(
+                "search",
+                ["users", "trials"],
+                {"q": query, "page": page, "academy": academy, "base_url": base_url},
+                lambda: self.search_page(query, page, academy, base_url),
             )
 
-            # Search  for trials based on the current user's role (academy/player)
-            if current_user.is_academy:
-                trials = (
-                    Trial.objects.filter(name__icontains=query, academy=current_user)
-                    .annotate(registered_players_count=Count("trial", distinct=True))
-                    .values("id", "name", "image", "sport", "registered_players_count")
-                )
-            else:
-                trials = (
-                    Trial.objects.filter(name__icontains=query)
-                    .annotate(registered_players_count=Count("trial", distinct=True))
-                    .values("id", "name", "image", "sport", "registered_players_count")
+            # friend and follow status and mutual friends of the whole page in a
+            # fixed number of queries
+            user_ids = [
+                result["id"] for result in suggestions if result["type"] != "Trial"
+            ]
+            relationships = RelationshipContext(current_user, user_ids)
+            mutual_friends = {}
+            if not current_user.is_academy:
+                mutual_friends = graph.mutual_counts(
+                    current_user.id,
+                    [
+                        result["id"]
+                        for result in suggestions
+                        if result["type"] == "Player"
+                    ],
                 )
+            for result in suggestions:
+                if result["type"] != "Trial":
+                    result["friend_status"] = relationships.friend_status(result["id"])
+                    result["follow_status"] = relationships.follow_status(
+                        result["id"], result["isAcademy"]
+                    )
+                    result["mutual_friends"] = mutual_friends.get(result["id"], 0)
 
-            # posts = Post.objects.filter(title__icontains=query).values('id', 'title')
+            return JsonResponse(
+                {
+                    "results": suggestions,
+                    "next_page": page + 1 if has_more else None,
+                }
+            )
 
-            # Fetch friend requests related to the current user
-            friend_requests = FriendRequest.objects.filter(
-                Q(from_user_id=current_user) | Q(to_user_id=current_user)
-            ).values("from_user", "to_user", "status")
+        return JsonResponse({"message": "No query provided."}, status=status.HTTP_200_OK)
 
-            # Fetch academies followed by the current user
-            follows = Follow.objects.filter(player=current_user).values_list(
-                "academy", flat=True
-            )
-            followers = Follow.objects.filter(academy=current_user).values_list(
-                "player", flat=True
+    def search_page(self, query, page, academy, base_url):
+        """
+        Search users and trials and return one page of results without the
+        viewer's friend and follow status, and whether there is a next page.
+
+        Args:
+            academy (int): The viewing academy, academies only see their own trials.
+        """
+        # a page is cut from the best `limit` users and trials together
+        limit = page * self.PAGE_SIZE + 1
+
+        # search for user based on username or bio content
+        users = (
+            search(Users.objects.all(), query, "username")
+            .select_related("userprofile")
+            .exclude(is_staff=True)
+            .annotate(
+                friends_count=Count("friends", distinct=True),
+                followers_count=Count("followers", distinct=True),
             )
+            .values(
+                "id",
+                "username",
+                "is_academy",
+                "userprofile__profile_photo",
+                "userprofile__image_variants",
+                "userprofile__bio",
+                "friends_count",
+                "followers_count",
+                "rank",
+            )[:limit]
+        )
 
-            base_url = request.build_absolute_uri(settings.MEDIA_URL)
-            suggestions = []
-
-            # Using user results determine friend adn follow status
-            for user in users:
-                friend_status = "none"
-
-                if user["id"] == current_user.id:
-                    friend_status = "self"
-                elif friend_requests.filter(
-                    from_user=current_user, to_user=user["id"], status="pending"
-                ).exists():
-                    friend_status = "request_sent"
-                elif friend_requests.filter(
-                    from_user=user["id"], to_user=current_user, status="pending"
-                ).exists():
-                    friend_status = "request_received"
-                elif current_user.friends.filter(id=user["id"]).exists():
-                    friend_status = "friends"
-
-                follow_status = "not_following"
-                if (
-                    user["is_academy"] and user["id"] in follows
-                ):  # Player following the academy
-                    follow_status = "following"
-
-                if (
-                    not user["is_academy"] and user["id"] in followers
-                ):  # Academy followed by the player
-                    follow_status = "follower"
-
-                # Compile the user data
-                suggestions.append(
-                    {
-                        "id": user["id"],
-                        "name": user["username"],
-                        "isAcademy": user["is_academy"],
-                        "photoUrl": (
-                            base_url + user["userprofile__profile_photo"]
-                            if user["userprofile__profile_photo"]
-                            else ""
-                        ),
-                        "bio": user["userprofile__bio"],
-                        "type": "Academy" if user["is_academy"] else "Player",
-                        "count": (
-                            user["friends_count"]
-                            if not user["is_academy"]
-                            else user["followers_count"]
-                        ),
-                        "friend_status": friend_status,
-                        "follow_status": follow_status,
-                    }
+        # Search  for trials based on the current user's role (academy/player)
+        trials = Trial.objects.all()
+        if academy is not None:
+            trials = trials.filter(academy=academy)
+        trials = (
+            search(trials, query, "name")
+            .annotate(registered_players_count=Count("trial", distinct=True))
+            .values(
+                "id",
+                "name",
+                "image",
+                "image_variants",
+                "sport",
+                "registered_players_count",
+                "rank",
+            )[:limit]
+        )
+
+        # posts = Post.objects.filter(title__icontains=query).values('id', 'title')
+
+        suggestions = [self.user_result(user, base_url) for user in users]
+        suggestions.extend(self.trial_result(trial, base_url) for trial in trials)
+
+        # best matches first, the most popular first among equal matches
+        suggestions.sort(key=lambda x: (x["rank"], x["count"]), reverse=True)
+        start = (page - 1) * self.PAGE_SIZE
+        has_more = len(suggestions) > start + self.PAGE_SIZE and page < self.MAX_PAGES
+        suggestions = suggestions[start : start + self.PAGE_SIZE]
+        for result in suggestions:
+            del result["rank"]
+
+        # suggestions.extend([
+        #     {'id': post['id'], 'name': post['title'], 'type': 'Post'}
+        #     for post in posts
+        # ])
+        return suggestions, has_more
+
+    def user_result(self, user, base_url):
+        """
+        Compile the search result of a user, the friend and follow status are
+        added once the page is known.
+        """
+        return {
+            "id": user["id"],
+            "name": user["username"],
+            "isAcademy": user["is_academy"],
+            "photoUrl": (
+                base_url
+                + variant_path(
+                    user["userprofile__image_variants"],
+                    "profile_photo",
+                    user["userprofile__profile_photo"],
+                    "thumb",
+                )
+                if user["userprofile__profile_photo"]
+                else ""
+            ),
+            "bio": user["userprofile__bio"],
+            "type": "Academy" if user["is_academy"] else "Player",
+            "count": (
+                user["friends_count"]
+                if not user["is_academy"]
+                else user["followers_count"]
+            ),
+            "rank": user["rank"],
+        }
+
+    def trial_result(self, trial, base_url):
+        """
+        Compile the search result of a trial.
+        """
+        return {
+            "id": trial["id"],
+            "name": trial["name"],
+            "photoUrl": (
+                base_url
+                + variant_path(
+                    trial["image_variants"], "image", trial["image"], "thumb"
                 )
+                if trial["image"]
+                else ""
+            ),
+            "bio": trial["sport"],
+            "type": "Trial",
+            "count": trial["registered_players_count"],
+            "rank": trial["rank"],
+        }
 
-            suggestions.extend(
-                [
+
+class SearchSuggest(APIView):
+    """
+    View for search-as-you-type suggestions.
+
+    Returns the names of up to 8 users and trials starting with `q`, read from
+    the Redis autocomplete index (see users.suggest), without the counts and
+    statuses of the full search. While the index is missing the names come
+    from the database and a rebuild is queued.
+    """
+    def get(self, request):
+        query = request.GET.get("q", "")
+        academy = request.user.id if request.user.is_academy else None
+        try:
+            items = suggest.suggest(query, academy=academy)
+        except Exception as e:
+            print(e, "suggest index unavailable")
+            items = None
+        else:
+            if items is None and cache.add(
+                suggest.REBUILD_LOCK, True, suggest.REBUILD_LOCK_TTL
+            ):
+                rebuild_suggest_index.delay()
+        if items is None:
+            items = suggest.suggest_from_database(query, academy=academy)
+
+        base_url = request.build_absolute_uri(settings.MEDIA_URL)
+        return JsonResponse(
+            {
+                "results": [
                     {
-                        "id": trial["id"],
-                        "name": trial["name"],
-                        "photoUrl": base_url + trial["image"] if trial["image"] else "",
-                        "bio": trial["sport"],
-                        "type": "Trial",
-                        "count": trial["registered_players_count"],
+                        "id": item["id"],
+                        "name": item["name"],
+                        "type": item["type"],
+                        "photoUrl": base_url + item["photo"] if item["photo"] else "",
                     }
-                    for trial in trials
+                    for item in items
                 ]
-            )
-            # suggestions.extend([
-            #     {'id': post['id'], 'name': post['title'], 'type': 'Post'}
-            #     for post in posts
-            # ])
-            suggestions.sort(key=lambda x: x["count"], reverse=True)
-            return JsonResponse(suggestions, safe=False)
-
-        return JsonResponse({"message": "No query provided."}, status=status.HTTP_200_OK)
+            }
+        )